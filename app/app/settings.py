@@ -53,6 +53,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.HarakiriMiddleware',  # uWSGI time limit of the route class (UWSGI_HARAKIRI_ROUTES)
+    'core.middleware.MetricsMiddleware',  # Times everything below it
+    'core.middleware.CompressionMiddleware',  # Before anything that reads / changes the body
+    'core.middleware.ProfilingMiddleware',  # Staff only, on request (X-Profile header)
+    'core.middleware.SlowQueryMiddleware',  # Tags slow queries with their view
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,10 +91,14 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.postgresql')
+# ^Postgresql everywhere we deploy. Set to `django.db.backends.sqlite3` to run locally
+# against plain files (DB_NAME / DB_REPLICAS are then file paths instead of names / hosts)
+
 DATABASES = {
     'default': {
         # Configuring Postgresql Database
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': DB_ENGINE,
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
@@ -98,6 +107,107 @@ DATABASES = {
     }
 }
 
+# Read replicas (Comma separated list of hosts) i.e. DB_REPLICAS=replica1,replica2
+# Each replica gets its own alias (`replica_1`, `replica_2`, ...) with the same credentials as `default`.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+    filter(None, os.environ.get('DB_REPLICAS', '').split(',')),
+    start=1,
+):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(DATABASES['default'])
+    if DB_ENGINE.endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = replica  # Separate file, so tests can tell replica reads apart
+    else:
+        DATABASES[alias]['HOST'] = replica
+        DATABASES[alias]['TEST'] = {'MIRROR': 'default'}  # Replication doesn't exist in the test database
+    DATABASE_REPLICAS.append(alias)
+
+# User shards (Comma separated list of hosts) i.e. DB_SHARDS=shard1,shard2
+# Every user's recipes, tags & ingredients live on one shard (`shard_1`, `shard_2`, ...) picked by a consistent
+# hash of the user ID, users & everything else stay on `default` (core/sharding.py). `manage.py rebalance_shards`
+# moves the users a new shard takes over. Shards only ever get appended (the aliases are part of the hash)
+DATABASE_SHARDS = []
+for index, shard in enumerate(
+    filter(None, os.environ.get('DB_SHARDS', '').split(',')),
+    start=1,
+):
+    alias = f'shard_{index}'
+    DATABASES[alias] = dict(DATABASES['default'])
+    if DB_ENGINE.endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = shard
+    else:
+        DATABASES[alias]['HOST'] = shard
+    DATABASE_SHARDS.append(alias)
+
+SHARD_VIRTUAL_NODES = int(os.environ.get('DB_SHARD_VIRTUAL_NODES') or 64)
+# ^Points of every shard on the hash ring, more >> more even spread of the users
+
+DATABASE_ROUTERS = [
+    'core.db_routers.ShardRouter',  # Recipes, tags & ingredients (only with shards)
+    'core.db_routers.PrimaryReplicaRouter',
+]
+
+DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS') or 10)
+# ^After a write, the same client keeps reading from `default` for this many seconds (read-your-writes)
+
+DB_PARTITIONS = int(os.environ.get('DB_PARTITIONS') or 16)
+# ^PostgreSQL: hash partitions of the recipe & link tables, used when they get converted (core/partitioning.py)
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 200)
+# ^Queries slower than this are logged to `SlowQuery` (`manage.py slow_queries`). Set to -1 to disable
+if SLOW_QUERY_THRESHOLD_MS < 0:
+    SLOW_QUERY_THRESHOLD_MS = None
+SLOW_QUERY_ASYNC = True  # Record slow queries from a background thread (tests record them inline)
+
+# uWSGI (core/uwsgi.py). Workers, threads, cheaper, reload-on-rss & listen come from the container's
+# limits at startup (`manage.py uwsgi_config`), see the APP_* variables there
+UWSGI_HARAKIRI = int(os.environ.get('APP_HARAKIRI') or 30)  # Seconds before a stuck request's worker is killed
+UWSGI_HARAKIRI_ROUTES = [  # (path regex, seconds), first match wins
+    (r'^/api/recipe/recipes/export/$', int(os.environ.get('APP_HARAKIRI_EXPORT') or 300)),  # Streams every recipe
+    (r'^/api/recipe/recipes/\d+/upload-image/$', int(os.environ.get('APP_HARAKIRI_UPLOAD') or 60)),
+    (r'^/admin/', int(os.environ.get('APP_HARAKIRI_ADMIN') or 60)),
+]
+PRELOAD_APP = os.environ.get('APP_PRELOAD', 'true').lower() != 'false'
+# ^Warm up & gc.freeze() the app in the uWSGI master before the workers are forked (core/preload.py)
+UWSGI_STATS = os.environ.get('APP_STATS') or '127.0.0.1:9191'  # Stats socket (JSON), scraped by `/metrics`
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS') or 16)
+# ^ASGI mode: requests running Django code at the same time, per process (each holds a thread & a DB connection)
+
+# Similar recipes (core/similarity.py)
+SIMILARITY_TOP_K = 10  # Recipes returned without `?k=`
+SIMILARITY_MAX_K = 50
+SIMILARITY_MAX_AGE = int(os.environ.get('SIMILARITY_MAX_AGE_HOURS') or 24) * 3600
+# ^Indexes older than this are rebuilt in the background (catches writes that bypassed the serializer, i.e. the admin)
+SIMILARITY_WATCH_SECONDS = 60  # `manage.py similarity_index --watch` looks for indexes to rebuild this often
+SIMILARITY_CACHE_USERS = 256  # Indexes kept in memory per process
+
+# "What can I cook" (core/pantry.py)
+PANTRY_MAX_MISSING = 5  # Highest `?missing=`
+PANTRY_MAX_RESULTS = 100  # Recipes returned, fewest missing ingredients first
+PANTRY_CACHE_BYTES = int(os.environ.get('PANTRY_CACHE_MB') or 64) * 2 ** 20
+# ^Bitset indexes kept in memory per process, the least recently used users' are evicted past this
+
+FACETS_TOP_N = 20  # `?facets=`: most frequent tags / ingredients counted per facet (core/facets.py)
+FACETS_CACHE_SIZE = 1024  # Counted (user, filters) kept in memory per process
+
+SHOPPING_LIST_MAX_RECIPES = 5000  # Recipe IDs per `POST /api/recipe/shopping-list/` (one query whatever the number)
+
+# Response compression (core/compression.py). Measure with `manage.py benchmark compression`
+COMPRESSION_MIN_SIZE = 1024  # Bytes. Smaller responses are sent as they are
+COMPRESSION_GZIP_LEVEL = 5  # 1000 recipes (577 KiB): 43 KiB in 7ms, level 9 saves 7 KiB more for 6x the CPU
+COMPRESSION_BROTLI_QUALITY = 5  # Only used when the `brotli` package is installed
+COMPRESSION_CONTENT_TYPES = [  # API responses only
+    'application/json',
+    'application/x-ndjson',  # Streaming recipe export
+    'application/msgpack',
+    'application/vnd.oai.openapi',
+    'application/vnd.oai.openapi+json',
+]
+# ^NOT text/html: Browsable API & Admin pages hold CSRF tokens, compressed they would be open to BREACH
+# (static CSS / JS are compressed at build time & sent by nginx)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -137,11 +247,28 @@ USE_TZ = True
 
 
 STATIC_URL = '/static/static/'
-MEDIA_URL = '/static/media/'
+MEDIA_URL = '/media/'  # Recipe images are private >> served by core/media.py (NOT nginx's public /static)
 
 MEDIA_ROOT = '/vol/web/media/'
 STATIC_ROOT = '/vol/web/static/'
 
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# ^`collectstatic` adds a content hash to file names (nginx caches them forever) & writes .gz / .br siblings
+STATIC_PRECOMPRESS_EXTENSIONS = ['.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot']
+
+MEDIA_ACCEL_REDIRECT_PREFIX = None if DEBUG else '/protected-media/'
+# ^Internal nginx location sending the images (X-Accel-Redirect). None >> Django sends them (no nginx in development)
+MEDIA_CACHE_SECONDS = 3600  # Browsers may keep an image this long (names never change, access can)
+
+PROFILE_ROOT = '/vol/profiles/'
+# ^Stored request profiles (NOT public, downloaded through the API). Outside /vol/web: nginx serves that volume at /static
+PROFILE_MAX_STORED = int(os.environ.get('PROFILE_MAX_STORED') or 100)  # Older profiles are deleted beyond this many
+PROFILE_MAX_AGE = int(os.environ.get('PROFILE_MAX_AGE_HOURS') or 24) * 3600  # ... & once they're this old (seconds)
+PROFILE_TOP_FUNCTIONS = 40  # Functions listed in inline profile reports
+
+SCHEMA_ROOT = os.path.join(STATIC_ROOT, 'openapi')
+# ^Pre-generated OpenAPI schema (`manage.py build_schema`). Inside STATIC_ROOT so nginx can serve it directly
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -150,8 +277,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+API_JSON = os.environ.get('API_JSON') or 'fast'
+# ^`fast` >> orjson renderer & parser (core/renderers.py, stdlib fallback if not installed), `stdlib` >> DRF defaults
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer' if API_JSON == 'fast' else 'rest_framework.renderers.JSONRenderer',
+        'core.renderers.MessagePackRenderer',  # `Accept: application/msgpack` (mobile clients)
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser' if API_JSON == 'fast' else 'rest_framework.parsers.JSONParser',
+        'core.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
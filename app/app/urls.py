@@ -14,31 +14,37 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
+from drf_spectacular.views import SpectacularSwaggerView
 
 from django.contrib import admin
 from django.urls import path
 from django.urls import include  # allow to include URLs from different APP
 
-from django.conf.urls.static import static
 from django.conf import settings  # to access settings.py file
 
+from core.media import protected_media_view
+from core.metrics import metrics_view
+from core.profiling import profile_download_view
+from core.schema import CachedSchemaView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),  # YAML File that describes the API 
+    path('api/schema/', CachedSchemaView.as_view(), name='api-schema'),  # YAML File that describes the API (pre-generated by `build_schema`)
     path(
         'api/docs',  # Serve Swagger to use our Schema to generate GUI
         SpectacularSwaggerView.as_view(url_name='api-schema'),
         name='api-docs',),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),  
-]
-
-if settings.DEBUG:  # to access media files
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT,
-    )
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint
+    path(
+        'api/profiles/<uuid:profile_id>/',  # Profiles stored with `X-Profile: download` (staff only)
+        profile_download_view,
+        name='profile-download',
+    ),
+    path(
+        f"{settings.MEDIA_URL.strip('/')}/<path:path>",  # Recipe images, owner only (sent by nginx in production)
+        protected_media_view,
+        name='protected-media',
+    ),
+]
\ No newline at end of file
@@ -2,15 +2,31 @@
 WSGI config for app project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+Under uWSGI it is loaded once, in the master, and preloaded before the
+workers are forked (see core/preload.py).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
 
+try:
+    import uwsgi
+except ImportError:  # Not running under uWSGI
+    uwsgi = None
+
+if uwsgi is not None and not uwsgi.opt.get('lazy-apps'):
+    gc.disable()
+    # ^No collections in the master until the fork: no freed "holes" in the pages the workers share  # noqa: E501
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+from core import preload  # noqa: E402 (needs the settings)
+
+preload.install()  # Warm up, freeze & re-enable the GC in every worker
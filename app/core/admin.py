@@ -2,11 +2,17 @@
 Django Admin customization
 """
 
+from contextlib import nullcontext
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _  # To translate strings in Django Admin
 
 from core import models  # To import custom models that we want to register with Django Admin
+from core import sharding, similarity
 
 # Adding functionality to UserAdmin Class
 class UserAdmin(BaseUserAdmin):
@@ -57,6 +63,129 @@ class UserAdmin(BaseUserAdmin):
 
 # Making Models manageable through Django Admin Interface
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+
+
+def selected_shard(value):
+    return value if value in sharding.all_aliases() else 'default'
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Database the list shows (`default` holds the data of users not moved to a shard)"""
+    title = _('shard')
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        counts = sharding.fan_out(
+            lambda alias: model_admin.model._default_manager.using(alias).count()
+        )
+        # ^Every database counted at the same time
+        return [(alias, f'{alias} ({count})') for alias, count in counts.items()]
+
+    def queryset(self, request, queryset):
+        return queryset  # ShardedModelAdmin.get_queryset already picked the database
+
+    def choices(self, changelist):
+        for alias, title in self.lookup_choices:  # No "All": a list can't span databases
+            yield {
+                'selected': selected_shard(self.value()) == alias,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+
+class ShardedModelAdmin(admin.ModelAdmin):
+    """Admin pages of a model spread over the shards (core/sharding.py)"""
+
+    def get_list_filter(self, request):
+        return [ShardFilter] if settings.DATABASE_SHARDS else []
+
+    def shard(self, request):
+        """Database of the page: the edited object's or the one picked in the list."""
+        return getattr(request, 'admin_shard', None) or selected_shard(request.GET.get(ShardFilter.parameter_name))
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(self.shard(request))
+
+    def get_object(self, request, object_id, from_field=None):
+        """Look the object up on every database at the same time."""
+        queryset = self.get_queryset(request)
+        field = queryset.model._meta.pk if from_field is None else queryset.model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+
+        found = sharding.fan_out(
+            lambda alias: queryset.using(alias).filter(**{field.name: object_id}).first()
+        )
+        obj = next((obj for obj in found.values() if obj is not None), None)
+        if obj is not None:
+            request.admin_shard = obj._state.db  # Choices of its form come from the same database
+        return obj
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        kwargs.setdefault('using', self.shard(request))  # i.e. the recipe's tags are on the recipe's shard
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+    def has_add_permission(self, request):
+        return not settings.DATABASE_SHARDS and super().has_add_permission(request)
+        # ^With shards, new rows come through the API (on their user's shard)
+
+    # The rows of a user being moved to another shard are read only (core/sharding.py)
+
+    def fenced(self, request):
+        return bool(settings.DATABASE_SHARDS) and request.method == 'POST'
+
+    def changeform_view(self, request, *args, **kwargs):
+        with transaction.atomic(using='default') if self.fenced(request) else nullcontext():
+            return super().changeform_view(request, *args, **kwargs)
+
+    def delete_view(self, request, *args, **kwargs):
+        with transaction.atomic(using='default') if self.fenced(request) else nullcontext():
+            return super().delete_view(request, *args, **kwargs)
+
+    def moving(self, request, obj):
+        return obj is not None and self.fenced(request) and sharding.lock_user(obj.user_id).moving
+        # ^Locked until the view returns: a move of the user waits for this edit
+
+    def has_change_permission(self, request, obj=None):
+        return super().has_change_permission(request, obj) and not self.moving(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return super().has_delete_permission(request, obj) and not self.moving(request, obj)
+
+    # Edits change the user's links behind the API's back >> similar recipes index rebuilt in the background (core/similarity.py)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        similarity.mark_stale(form.instance.user_id)  # After the many to many fields (a recipe's tags) are saved
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        similarity.mark_stale(obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for user_id in user_ids:
+            similarity.mark_stale(user_id)
+
+
+admin.site.register(models.Recipe, ShardedModelAdmin)
+admin.site.register(models.Tag, ShardedModelAdmin)
+admin.site.register(models.Ingredient, ShardedModelAdmin)
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Read only view of the slow query log"""
+    ordering = ['-total_ms']
+    list_display = ['sql', 'origin', 'database', 'calls', 'total_ms', 'max_ms', 'last_seen']
+    list_filter = ['database']
+    search_fields = ['sql', 'origin']
+    readonly_fields = [field.name for field in models.SlowQuery._meta.fields]
+
+    def has_add_permission(self, request):
+        return False  # Rows only come from the slow query log
+
+
+admin.site.register(models.SlowQuery, SlowQueryAdmin)
@@ -0,0 +1,23 @@
+"""
+Database aggregates working the same on PostgreSQL & SQLite
+"""
+
+from django.db import models
+
+
+class IdList(models.Aggregate):
+    """Sorted list of the group's IDs (`ARRAY_AGG` on PostgreSQL, `GROUP_CONCAT` on SQLite)."""  # noqa: E501
+
+    function = 'ARRAY_AGG'
+    name = 'IdList'
+    output_field = models.Field()  # Converted by convert_value(), not a field
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='GROUP_CONCAT', **extra_context)  # noqa: E501
+
+    def convert_value(self, value, expression, connection):
+        if not value:
+            return []
+        if isinstance(value, str):  # SQLite: '3,1,2'
+            value = value.split(',')
+        return sorted(int(item) for item in value)
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, post_save, pre_delete
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import sharding, slow_queries, uwsgi
+        from core.models import User
+
+        connection_created.connect(slow_queries.install, dispatch_uid='slow_queries')  # noqa: E501
+        # ^Every new database connection (any alias, any thread) times its queries # noqa: E501
+
+        request_finished.connect(uwsgi.clear_harakiri, dispatch_uid='clear_harakiri')  # noqa: E501
+        # ^The route's harakiri (HarakiriMiddleware) ends with the request
+
+        post_save.connect(sharding.assign_shard, sender=User, dispatch_uid='assign_shard')  # noqa: E501
+        pre_delete.connect(sharding.delete_user_data, sender=User, dispatch_uid='delete_user_data')  # noqa: E501
+        post_migrate.connect(sharding.reserve_id_range, sender=self, dispatch_uid='reserve_id_range')  # noqa: E501
+        # ^Users get a shard when created & take their data along when deleted, every shard numbers its own IDs # noqa: E501
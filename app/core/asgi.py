@@ -0,0 +1,79 @@
+"""
+ASGI serving mode (`APP_SERVER=asgi`, uvicorn instead of uWSGI)
+
+The request body is read by the event loop (Django's ASGIHandler, spooled
+to disk above FILE_UPLOAD_MAX_MEMORY_SIZE) before any thread is involved, so
+a slow client uploading an image only costs a coroutine, not a worker.
+
+Views, middleware & the ORM stay synchronous (DRF has no async views) and
+run in threads. Django 3.2 runs all of them in ONE thread per process and
+iterates streaming responses inside the event loop, `ASGIHandler` fixes
+both:
+
+- every request gets its own thread (`ThreadSensitiveContext`, what Django
+  4.0 does), at most ASGI_THREADS at a time >> bounded DB connections
+- streaming responses (recipe export, files) are iterated in that thread, so
+  their queries never run (or block) in the event loop
+"""
+
+import asyncio
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.handlers import asgi
+
+
+_DONE = object()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Django's ASGI handler with a (bounded) thread per request."""
+
+    _threads = None
+
+    @property
+    def threads(self):
+        if self._threads is None:  # Created in the event loop (Python < 3.10 binds it) # noqa: E501
+            self._threads = asyncio.Semaphore(settings.ASGI_THREADS)
+        return self._threads
+
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():  # Sync code of this request >> its own thread # noqa: E501
+            await super().__call__(scope, receive, send)
+
+    async def get_response_async(self, request):
+        async with self.threads:  # Waits (in the event loop) when all threads are busy # noqa: E501
+            return await super().get_response_async(request)
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        # Same messages as Django's, but the content is produced in the request's thread # noqa: E501
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers(response),
+        })
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        async with self.threads:
+            while True:
+                part = await next_part(parts, _DONE)
+                if part is _DONE:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})  # noqa: E501
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def response_headers(response):
+    """Headers & cookies of the response as ASGI (bytes) pairs."""
+    headers = [
+        (header.encode('ascii'), value.encode('latin1'))
+        for header, value in response.items()
+    ]
+    for cookie in response.cookies.values():
+        headers.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))  # noqa: E501
+    return headers
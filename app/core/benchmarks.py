@@ -0,0 +1,393 @@
+"""
+Micro benchmarks (used by `manage.py benchmark`)
+
+Each benchmark builds its data inside a transaction that is rolled back, so
+they can run against any database (even production-like ones) without
+leaving rows behind (`partitioning` needs VACUUM, outside of transactions:
+it uses scratch tables dropped at the end). Results are rows of (label,
+best of `repeat` runs in seconds[, note]).
+"""
+
+import asyncio
+import io
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import compression, renderers
+from core.asgi import ASGIHandler
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import RecipeSerializer, RecipeValuesSerializer
+
+
+BENCHMARK_EMAIL = 'benchmark@example.com'
+
+
+class Rollback(Exception):
+    """Raised to undo the benchmark data."""
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def best_of(repeat, func):
+    """Fastest of `repeat` runs (the least disturbed by everything else)."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def create_recipes(size, tags=5, ingredients=8):
+    """Create `size` recipes (with tags & ingredients) for a new user."""
+    user = get_user_model().objects.create_user(email=BENCHMARK_EMAIL, password='unused')  # noqa: E501
+    rng = random.Random(size)
+
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {number}') for number in range(20)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Ingredient {number}') for number in range(50)  # noqa: E501
+    )
+    Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {number} – crème brûlée',  # Non ASCII on purpose
+            time_minutes=rng.randint(5, 240),
+            price=Decimal(rng.randint(100, 10000)) / 100,
+            link=f'https://example.com/recipes/{number}',
+        )
+        for number in range(size)
+    )
+    tag_objs = list(Tag.objects.filter(user=user))  # bulk_create returns no IDs on SQLite # noqa: E501
+    ingredient_objs = list(Ingredient.objects.filter(user=user))
+
+    tag_links, ingredient_links = [], []
+    for recipe_id in Recipe.objects.filter(user=user).values_list('id', flat=True):  # noqa: E501
+        tag_links.extend(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+            for tag in rng.sample(tag_objs, tags)
+        )
+        ingredient_links.extend(
+            Recipe.ingredients.through(recipe_id=recipe_id, ingredient_id=ingredient.id)  # noqa: E501
+            for ingredient in rng.sample(ingredient_objs, ingredients)
+        )
+    Recipe.tags.through.objects.bulk_create(tag_links)
+    Recipe.ingredients.through.objects.bulk_create(ingredient_links)
+
+    return Recipe.objects.filter(user=user).order_by('-id').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.order_by('id')),
+        Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+    )
+    # ^Same queryset as the recipe list endpoint
+
+
+def recipe_list_payload(size):
+    """Python data of the recipe list endpoint for `size` recipes."""
+    with rolled_back():
+        return RecipeSerializer(create_recipes(size), many=True).data
+
+
+# Benchmarks ------------------------------------------------------------------
+
+
+def json_benchmark(size=1000, repeat=20):
+    """Render & parse the recipe list payload, stdlib vs orjson."""
+    payload = recipe_list_payload(size)
+    body = JSONRenderer().render(payload)
+
+    fast_body = renderers.FastJSONRenderer().render(payload)
+    if fast_body != body:
+        raise RuntimeError('FastJSONRenderer output differs from JSONRenderer')  # noqa: E501
+
+    rows = []
+    for name, renderer, parser in (
+        ('stdlib', JSONRenderer(), JSONParser()),
+        ('orjson' if renderers.orjson else 'fast (orjson not installed)', renderers.FastJSONRenderer(), renderers.FastJSONParser()),  # noqa: E501
+    ):
+        rows.append((f'render {name}', best_of(repeat, lambda: renderer.render(payload))))  # noqa: E501
+        rows.append((f'parse {name}', best_of(repeat, lambda: parser.parse(BytesIO(body)))))  # noqa: E501
+    return rows, f'{size} recipes, {len(body) / 1024:.0f} KiB'
+
+
+def serializer_benchmark(size=10000, repeat=5):
+    """Recipe list (queries + serialization), RecipeSerializer vs RecipeValuesSerializer."""  # noqa: E501
+    rows = []
+    with rolled_back():
+        queryset = create_recipes(size)
+        expected = RecipeSerializer(queryset, many=True).data
+        if RecipeValuesSerializer(queryset).data != expected:
+            raise RuntimeError('RecipeValuesSerializer output differs from RecipeSerializer')  # noqa: E501
+
+        rows.append(('serialize RecipeSerializer', best_of(repeat, lambda: RecipeSerializer(queryset.all(), many=True).data)))  # noqa: E501
+        rows.append(('serialize RecipeValuesSerializer', best_of(repeat, lambda: RecipeValuesSerializer(queryset.all()).data)))  # noqa: E501
+    return rows, f'{size} recipes'
+
+
+def compression_benchmark(size=1000, repeat=5):
+    """Compressed size vs CPU time of the recipe list at every gzip / brotli level."""  # noqa: E501
+    body = JSONRenderer().render(recipe_list_payload(size))
+
+    levels = [('gzip', level) for level in (1, 3, 5, 6, 9)]
+    if compression.brotli is not None:
+        levels += [('br', quality) for quality in (1, 3, 4, 5, 6, 9, 11)]
+
+    rows = []
+    for encoding, level in levels:
+        setting = 'COMPRESSION_BROTLI_QUALITY' if encoding == 'br' else 'COMPRESSION_GZIP_LEVEL'  # noqa: E501
+        with override_settings(**{setting: level}):
+            compressed = compression.compress(body, encoding)
+            seconds = best_of(repeat, lambda: compression.compress(body, encoding))  # noqa: E501
+        rows.append((
+            f'compress {encoding} {level}',
+            seconds,
+            f'{len(compressed) / 1024:7.0f} KiB ({len(compressed) / len(body):.1%}), {len(body) / seconds / 2 ** 20:.0f} MiB/s',  # noqa: E501
+        ))
+    return rows, f'{size} recipes, {len(body) / 1024:.0f} KiB of JSON'
+
+
+# Serving (uWSGI vs ASGI) --------------------------------------------------
+
+
+QUICK_REQUEST = ('GET', '/api/schema/', 'format=json', b'')
+SLOW_UPLOAD = ('POST', '/api/recipe/recipes/1/upload-image/', '', b'x' * 100_000)  # noqa: E501
+SLOW_CHUNKS = 10  # A slow client sends its body in this many parts...
+SLOW_DELAY = 0.1  # ...one every SLOW_DELAY seconds
+QUICK_REQUESTS = 40  # Sent during the uploads, one every QUICK_INTERVAL seconds # noqa: E501
+QUICK_INTERVAL = 0.025
+WSGI_WORKERS = 4  # scripts/run.sh
+
+
+def slow_parts(body):
+    size = -(-len(body) // SLOW_CHUNKS)
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+class SlowBody(io.RawIOBase):
+    """`wsgi.input` of a slow client (blocks the worker reading it)."""
+
+    def __init__(self, body):
+        self.parts = slow_parts(body)
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        if not self.buffer and self.parts:
+            time.sleep(SLOW_DELAY)
+            self.buffer = self.parts.pop(0)
+        count = min(len(target), len(self.buffer))
+        target[:count] = self.buffer[:count]
+        self.buffer = self.buffer[count:]
+        return count
+
+
+def serve_wsgi(requests):
+    """uWSGI model: WSGI_WORKERS sync workers, each serves (& reads) one request at a time."""  # noqa: E501
+    handler = WSGIHandler()
+    factory = RequestFactory()
+
+    def serve(method, path, query, body, slow):
+        environ = factory.generic(method, path, body, 'multipart/form-data; boundary=x', QUERY_STRING=query).environ  # noqa: E501
+        if slow:
+            environ['wsgi.input'] = io.BufferedReader(SlowBody(body))
+        response = handler(environ, lambda status, headers: None)
+        b''.join(response)
+        response.close()
+        environ['wsgi.input'].read()  # uWSGI drains the body before the next request # noqa: E501
+        return time.perf_counter()
+
+    with ThreadPoolExecutor(WSGI_WORKERS) as workers:
+        futures = []
+        for delay, slow, (method, path, query, body) in requests:
+            time.sleep(max(0, delay - time.perf_counter()))
+            futures.append((time.perf_counter(), slow, workers.submit(serve, method, path, query, body, slow)))  # noqa: E501
+        return [(slow, future.result() - sent) for sent, slow, future in futures]  # noqa: E501
+
+
+def serve_asgi(requests):
+    """ASGI model: bodies are read by the event loop, Django code runs in a thread per request."""  # noqa: E501
+    handler = ASGIHandler()
+
+    async def serve(method, path, query, body, slow):
+        parts = slow_parts(body) if slow else [body]
+
+        async def receive():
+            if slow:
+                await asyncio.sleep(SLOW_DELAY)
+            part = parts.pop(0) if parts else b''
+            return {'type': 'http.request', 'body': part, 'more_body': bool(parts)}  # noqa: E501
+
+        async def send(message):
+            pass
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',  # noqa: E501
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',  # noqa: E501
+            'query_string': query.encode(), 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),  # noqa: E501
+            'headers': [
+                (b'host', b'testserver'),
+                (b'content-type', b'multipart/form-data; boundary=x'),
+                (b'content-length', str(len(body)).encode()),
+            ],
+        }
+        await handler(scope, receive, send)
+        return time.perf_counter()
+
+    async def main():
+        tasks = []
+        for delay, slow, (method, path, query, body) in requests:
+            await asyncio.sleep(max(0, delay - time.perf_counter()))
+            tasks.append((time.perf_counter(), slow, asyncio.ensure_future(serve(method, path, query, body, slow))))  # noqa: E501
+        return [(slow, await task - sent) for sent, slow, task in tasks]
+
+    return asyncio.run(main())
+
+
+def percentile(values, percent):
+    return sorted(values)[min(len(values) - 1, int(len(values) * percent / 100))]  # noqa: E501
+
+
+def serving_benchmark(size=8, repeat=3):
+    """Latency of quick requests while `size` slow clients upload images, uWSGI vs ASGI."""  # noqa: E501
+    servers = [
+        (f'uwsgi ({WSGI_WORKERS} sync workers)', serve_wsgi),
+        (f'asgi (1 process, {settings.ASGI_THREADS} threads)', serve_asgi),
+    ]
+
+    results = {}
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        for name, serve in servers:
+            serve([(0, False, QUICK_REQUEST)])  # Warm up (schema generated once per process) # noqa: E501
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                requests = [(start, True, SLOW_UPLOAD) for _ in range(size)]
+                requests += [(start + number * QUICK_INTERVAL, False, QUICK_REQUEST) for number in range(QUICK_REQUESTS)]  # noqa: E501
+                latencies = serve(requests)
+                runs.append((
+                    [seconds for slow, seconds in latencies if not slow],
+                    max(seconds for slow, seconds in latencies if slow) if size else 0,  # noqa: E501
+                ))
+            results[name] = min(runs, key=lambda run: percentile(run[0], 99))  # noqa: E501
+
+    rows = []
+    for label, measure in (
+        ('p50', lambda quick, uploads: statistics.median(quick)),
+        ('p99', lambda quick, uploads: percentile(quick, 99)),
+        ('uploads', lambda quick, uploads: uploads),
+    ):
+        for name, _ in servers:
+            rows.append((f'{label} {name}', measure(*results[name])))
+    return rows, (
+        f'{QUICK_REQUESTS} quick requests while {size} clients upload '
+        f'{len(SLOW_UPLOAD[3]) // 1000} KB in {SLOW_CHUNKS * SLOW_DELAY:.1f}s each'  # noqa: E501
+    )
+
+
+# Partitioning (PostgreSQL) ------------------------------------------------
+
+
+RECIPES_PER_USER = 100
+SCRATCH_TABLES = [  # (table, partitions), same columns as core_recipe
+    ('benchmark_recipe_plain', 0),
+    ('benchmark_recipe_partitioned', 16),
+]
+
+
+def create_scratch_table(cursor, table, partitions, size):
+    """`size` recipes of `size / RECIPES_PER_USER` users, vacuumed (like a table in use for a while)."""  # noqa: E501
+    cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    cursor.execute(
+        f'CREATE TABLE {table} (id bigint NOT NULL, user_id bigint NOT NULL, title varchar(255) NOT NULL, '  # noqa: E501
+        f'description text NOT NULL, time_minutes integer NOT NULL, price numeric(5, 2) NOT NULL, '  # noqa: E501
+        f'link varchar(255) NOT NULL, image varchar(100))'
+        + (' PARTITION BY HASH (user_id)' if partitions else '')
+    )
+    for number in range(partitions):
+        cursor.execute(f'CREATE TABLE {table}_p{number} PARTITION OF {table} FOR VALUES WITH (MODULUS {partitions}, REMAINDER {number})')  # noqa: E501
+    cursor.execute(
+        f'INSERT INTO {table} SELECT n, n %% %s, %s || n, repeat(%s, 200), 5 + n %% 240, (n %% 10000) / 100.0, %s, NULL '  # noqa: E501
+        f'FROM generate_series(1, %s) n',
+        [max(size // RECIPES_PER_USER, 1), 'Recipe ', 'x', 'https://example.com', size],  # noqa: E501
+    )
+    cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, user_id)')
+    cursor.execute(f'CREATE INDEX {table}_user_id ON {table} (user_id)')
+    cursor.execute(f'VACUUM ANALYZE {table}')
+
+
+def vacuum_after_update(cursor, table, user_id, repeat):
+    """Fastest VACUUM of what a user's updated recipes dirtied (what autovacuum would vacuum)."""  # noqa: E501
+    cursor.execute(f'SELECT tableoid::regclass::text FROM {table} WHERE user_id = %s LIMIT 1', [user_id])  # noqa: E501
+    target = cursor.fetchone()[0]  # The partition of the user (or the plain table) # noqa: E501
+    timings = []
+    for _ in range(repeat):
+        cursor.execute(f'WITH old AS (DELETE FROM {table} WHERE user_id = %s RETURNING *) INSERT INTO {table} SELECT * FROM old', [user_id])  # noqa: E501
+        # ^A user's recipes rewritten >> dead rows in the heap & every index
+        start = time.perf_counter()
+        cursor.execute(f'VACUUM (INDEX_CLEANUP ON) {target}')  # Indexes cleaned up (what happens once enough rows died) # noqa: E501
+        timings.append(time.perf_counter() - start)
+    return min(timings), target
+
+
+def partitioning_benchmark(size=1000000, repeat=5):
+    """One user's recipes & the VACUUM after a user's update, plain vs hash partitioned core_recipe (PostgreSQL)."""  # noqa: E501
+    if connection.vendor != 'postgresql':
+        raise CommandError('The partitioning benchmark needs PostgreSQL.')
+
+    user_id = 7
+    rows = []
+    with connection.cursor() as cursor:  # Autocommit: VACUUM can't run in a transaction # noqa: E501
+        try:
+            for table, partitions in SCRATCH_TABLES:
+                create_scratch_table(cursor, table, partitions, size)
+
+            for table, partitions in SCRATCH_TABLES:
+                label = f'partitioned ({partitions})' if partitions else 'plain'  # noqa: E501
+                rows.append((f'query {label}', best_of(repeat * 20, lambda: (
+                    cursor.execute(f'SELECT * FROM {table} WHERE user_id = %s', [user_id]),  # noqa: E501
+                    cursor.fetchall(),
+                ))))
+            for table, partitions in SCRATCH_TABLES:
+                label = f'partitioned ({partitions})' if partitions else 'plain'  # noqa: E501
+                seconds, target = vacuum_after_update(cursor, table, user_id, repeat)  # noqa: E501
+                rows.append((f'vacuum {label}', seconds, target))
+        finally:
+            for table, _ in SCRATCH_TABLES:
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    return rows, f'{size} recipes, {RECIPES_PER_USER} per user'
+
+
+BENCHMARKS = {
+    'json': json_benchmark,
+    'serializer': serializer_benchmark,
+    'compression': compression_benchmark,
+    'serving': serving_benchmark,
+    'partitioning': partitioning_benchmark,
+}
@@ -0,0 +1,165 @@
+"""
+Response compression (used by CompressionMiddleware)
+
+API responses are compressed by Django, NOT nginx (nginx has `gzip off` for
+proxied locations and never re-compresses a response that already has a
+Content-Encoding). Brotli is used when the `brotli` package is installed and
+the client accepts it, gzip otherwise.
+
+Only responses of an allowed content type and at least COMPRESSION_MIN_SIZE
+bytes are compressed. Streaming responses are compressed chunk by chunk
+(flushed after every chunk), so nothing is buffered.
+
+Files served by nginx (static assets, the pre-generated schema) are
+compressed once, at build time: `precompress_file` writes `.gz` / `.br`
+siblings that nginx sends as they are (`gzip_static`).
+"""
+
+import gzip
+import os
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional >> gzip only
+    brotli = None
+
+
+def accepted_encodings(accept_encoding):
+    """Encodings the client accepts (`Accept-Encoding`), without q=0 ones."""
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.partition(';')
+        name, _, quality = params.partition('=')
+        try:
+            if name.strip() == 'q' and float(quality) == 0:
+                continue  # `gzip;q=0` >> explicitly refused
+        except ValueError:
+            pass
+        if coding.strip():
+            accepted.add(coding.strip())
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """Best encoding we support for the client (None >> send it raw)."""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and accepted & {'br', '*'}:
+        return 'br'
+    if accepted & {'gzip', '*'}:
+        return 'gzip'
+    return None
+
+
+def allowed_content_type(response):
+    content_type = response.get('Content-Type', '').partition(';')[0].strip().lower()  # noqa: E501
+    return content_type in settings.COMPRESSION_CONTENT_TYPES
+
+
+class Compressor:
+    """Incremental gzip / brotli compressor with the configured level."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(
+                mode=brotli.MODE_TEXT,
+                quality=settings.COMPRESSION_BROTLI_QUALITY,
+            )
+        else:
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # noqa: E501
+            # ^wbits 31 >> gzip header & trailer (not raw zlib)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Everything compressed so far (the client can decode it right away)."""  # noqa: E501
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(data, encoding):
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, encoding):
+    """Compress each chunk as it is produced (no buffering of the stream)."""
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_response(request, response):
+    """Compress the response if worth it & accepted by the client."""
+    if (
+        response.has_header('Content-Encoding')  # Already compressed (never twice) # noqa: E501
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or not allowed_content_type(response)
+    ):
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))  # Caches must keep both versions # noqa: E501
+
+    if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:  # noqa: E501
+        return response  # Small >> fits in a packet anyway, compressing only costs CPU # noqa: E501
+
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    if response.streaming:
+        response.streaming_content = compress_stream(response.streaming_content, encoding)  # noqa: E501
+        del response['Content-Length']  # Unknown until the stream ends
+    else:
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag  # Different bytes >> no longer a strong validator # noqa: E501
+    response['Content-Encoding'] = encoding
+    return response
+
+
+def precompress_file(path):
+    """Write `<path>.gz` (& `<path>.br`) next to the file, if they are smaller. Returns the written paths."""  # noqa: E501
+    with open(path, 'rb') as source:
+        data = source.read()
+
+    encoders = {'.gz': lambda: gzip.compress(data, compresslevel=9, mtime=0)}  # noqa: E501
+    # ^Max level: compressed once at build time, sent many times. mtime=0 >> same input, same bytes # noqa: E501
+    if brotli is not None:
+        encoders['.br'] = lambda: brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)  # noqa: E501
+
+    written = []
+    for extension, encode in encoders.items():
+        compressed = encode() if len(data) >= settings.COMPRESSION_MIN_SIZE else data  # noqa: E501
+        if len(compressed) >= len(data):  # Small or already compressed (i.e. fonts) >> nginx sends the original # noqa: E501
+            if os.path.exists(path + extension):
+                os.remove(path + extension)  # Left by an older version of the file # noqa: E501
+            continue
+        with open(path + extension + '.tmp', 'wb') as target:
+            target.write(compressed)
+        os.replace(path + extension + '.tmp', path + extension)  # Atomic >> nginx never serves a half written file # noqa: E501
+        written.append(path + extension)
+    return written
@@ -0,0 +1,119 @@
+"""
+Database routers (User shards, Primary / Read-Replica routing)
+"""
+
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core import sharding
+
+
+PIN_COOKIE_NAME = 'db_pin'
+# ^Cookie that tells us a client wrote something recently (and must read from `default`)
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+# ^Database alias used for reads in the current request / thread.
+# None >> Not set, reads go to `default` (Primary)
+
+
+def choose_replica():
+    """Return a random replica alias (or None if no replicas are configured)."""
+    replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+    if not replicas:
+        return None
+
+    return random.choice(replicas)  # Spread the read load between replicas
+
+
+def is_pinned(request):
+    """Check if the client made a write within the sticky window."""
+    return PIN_COOKIE_NAME in request.COOKIES
+
+
+def pin_to_primary(response):
+    """Make the client read from the primary for the next few seconds."""
+    response.set_cookie(
+        PIN_COOKIE_NAME,
+        '1',
+        max_age=settings.DB_REPLICA_STICKY_SECONDS,  # Browser / client drops the cookie once the window is over
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+@contextmanager
+def read_from(alias):
+    """Route the reads made inside the block to `alias`."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def set_read_alias(alias):
+    """Route reads to `alias` until `reset_read_alias` is called with the returned token."""
+    return _read_alias.set(alias)
+
+
+def reset_read_alias(token):
+    """Undo `set_read_alias`."""
+    _read_alias.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to `default` and reads to a replica, but only where a view asked for it.
+
+    Reads are NOT routed to replicas by default (authentication, admin, etc.
+    keep reading from `default`), views opt in with `read_from()` / `set_read_alias()`.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()  # None >> Django falls back to `default`
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Replicas hold the same data as the primary
+
+
+class ShardRouter:
+    """
+    Send recipes, tags & ingredients (and the links between them) to the shard of their user.
+
+    Has no say about any other model (the next router decides), nor without
+    shards configured. See core/sharding.py.
+    """
+
+    def _shard(self, model, hints):
+        if not settings.DATABASE_SHARDS or not sharding.is_sharded(model):
+            return None
+
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            return sharding.user_shard(instance)  # i.e. `user.recipe_set`
+        if instance is not None and instance._state.db:
+            return instance._state.db  # Saving / relations of a row loaded from a shard
+
+        alias = sharding.current_shard()  # The request's user
+        if alias is None and getattr(instance, 'user_id', None):
+            alias = sharding.user_shard(instance.user)  # New row outside of a request
+        return alias  # None >> `default`
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding.is_sharded(obj1) or sharding.is_sharded(obj2):
+            return True  # i.e. a recipe (shard) & its user (`default`)
+        return None
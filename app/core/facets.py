@@ -0,0 +1,123 @@
+"""
+Facet counts of filtered recipe lists (`?facets=tags,ingredients`)
+
+How many of the filtered recipes have each tag / ingredient, the
+FACETS_TOP_N most frequent per facet. Counted from the user's similar
+recipes index (core/similarity.py, in memory): the column numbers of the
+filtered recipes' rows, counted with one `np.bincount`. The only queries:
+the IDs of the filtered recipes & the names of the top tags / ingredients.
+
+Without a fresh index (none built yet, or stale: links changed behind its
+back), one grouped COUNT per facet over the link tables instead
+(`sql_counts()`): exact, and nothing is built inside the request.
+
+Counts are cached per process by (user, index version, filter signature).
+API writes give the index a new version >> that user's counts are counted
+again. Writes bypassing the API are included once the index is rebuilt.
+
+Only the index's writes (tags, ingredients, created / deleted recipes) change
+the version: counts of filters on anything else (price, time...) would go
+stale on a PATCH. Those aren't cached (signature None), the list view only
+signs filters of RecipeViewSet.facet_cached_filters.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import Count
+
+from core import similarity
+from core.models import Ingredient, Tag
+
+
+FACETS = {  # Facet >> (model, feature key % 2 in the similar recipes index)
+    'tags': (Tag, 0),
+    'ingredients': (Ingredient, 1),
+}
+
+_counted = OrderedDict()  # {(user ID, version, signature): {facet: [(ID, count)]}} # noqa: E501
+_counted_lock = threading.Lock()
+
+
+def parse(value):
+    """Facet names of `?facets=` (ValueError for unknown ones)."""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(names) - set(FACETS)
+    if unknown:
+        raise ValueError(f'Unknown facets: {", ".join(sorted(unknown))}.')
+    return list(dict.fromkeys(names))  # Without duplicates, in order
+
+
+def count(index, recipe_ids, top_n):
+    """{facet: [(ID, recipes)]} of the recipes `recipe_ids`, most recipes first."""  # noqa: E501
+    recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+    rows = np.searchsorted(index.recipe_ids, recipe_ids)
+    found = rows < len(index.recipe_ids)
+    found[found] = index.recipe_ids[rows[found]] == recipe_ids[found]
+    # ^Recipes without tags & ingredients aren't in the index (count for nothing) # noqa: E501
+    per_feature = np.bincount(index.matrix[rows[found]].indices, minlength=len(index.features))  # noqa: E501
+
+    counts = {}
+    for name, (_, parity) in FACETS.items():
+        columns = np.flatnonzero((per_feature > 0) & (index.features % 2 == parity))  # noqa: E501
+        columns = columns[np.lexsort((index.features[columns], -per_feature[columns]))[:top_n]]  # noqa: E501
+        counts[name] = list(zip((index.features[columns] // 2).tolist(), per_feature[columns].tolist()))  # noqa: E501
+    return counts
+
+
+def cached_counts(user, index, queryset, signature):
+    """count() of `queryset`, cached by `signature` (None: counted every time)."""  # noqa: E501
+    key = (user.pk, index.version, signature)
+    if signature is not None:
+        with _counted_lock:
+            counts = _counted.get(key)
+            if counts is not None:
+                _counted.move_to_end(key)
+                return counts
+
+    recipe_ids = list(queryset.prefetch_related(None).order_by().values_list('id', flat=True))  # noqa: E501
+    counts = count(index, recipe_ids, settings.FACETS_TOP_N)
+    if signature is not None:
+        with _counted_lock:
+            _counted[key] = counts
+            while len(_counted) > settings.FACETS_CACHE_SIZE:
+                _counted.popitem(last=False)  # Least recently used
+    return counts
+
+
+def sql_counts(queryset, names):
+    """{facet: [{id, name, count}]} by one grouped query per facet (no index needed)."""  # noqa: E501
+    recipes = queryset.prefetch_related(None).order_by().values('id')
+    return {
+        name: list(
+            FACETS[name][0].objects.filter(recipe__in=recipes)
+            .values('id', 'name')
+            .annotate(count=Count('recipe'))
+            .order_by('-count', 'id')[:settings.FACETS_TOP_N]
+        )
+        for name in names
+    }
+
+
+def facet_counts(user, queryset, signature, names):
+    """{facet: [{id, name, count}]} of the recipes of `queryset` (the filtered list)."""  # noqa: E501
+    index = similarity.fresh_index(user)
+    if index is None:
+        return sql_counts(queryset, names)
+
+    counts = cached_counts(user, index, queryset, signature)
+    facets = {}
+    for name in names:
+        model = FACETS[name][0]
+        ids = [facet_id for facet_id, _ in counts[name]]
+        names_by_id = dict(model.objects.filter(id__in=ids).values_list('id', 'name'))  # noqa: E501
+        # ^Names fresh on every request (renames), deleted ones are left out
+        facets[name] = [
+            {'id': facet_id, 'name': names_by_id[facet_id], 'count': recipes}
+            for facet_id, recipes in counts[name]
+            if facet_id in names_by_id
+        ]
+    return facets
@@ -0,0 +1,368 @@
+"""
+Load generation for the API (used by `manage.py loadtest`)
+
+Clients run in threads and send requests either straight into the WSGI app
+(no server needed) or to a running server over HTTP. Each client picks its
+next operation at random according to the workload's weights.
+"""
+
+import http.client
+import io
+import json
+import math
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from core import sharding
+from core.metrics import QueryTimer
+from core.models import Recipe, Tag, Ingredient
+
+
+USER_EMAIL = 'loadtest-{}@example.com'
+PASSWORD = 'loadtest-password'
+
+
+# Operations (i.e. one API call each) ------------------------------------------
+
+
+def list_recipes(session):
+    return 'GET', '/api/recipe/recipes/', None, None
+
+
+def filter_recipes(session):
+    tag_ids = ','.join(str(tag) for tag in random.sample(session.tag_ids, 2))
+    return 'GET', f'/api/recipe/recipes/?{urlencode({"tags": tag_ids})}', None, None  # noqa: E501
+
+
+def retrieve_recipe(session):
+    return 'GET', f'/api/recipe/recipes/{random.choice(session.recipe_ids)}/', None, None  # noqa: E501
+
+
+def list_tags(session):
+    return 'GET', '/api/recipe/tags/', None, None
+
+
+def list_ingredients(session):
+    return 'GET', '/api/recipe/ingredients/?assigned_only=1', None, None
+
+
+def edit_recipe(session):
+    payload = {
+        'title': f'Edited {random.random():.6f}',
+        'price': str(Decimal(random.randint(100, 5000)) / 100),
+        'tags': [{'name': f'Tag {random.randint(0, 9)}'}],
+        'ingredients': [{'name': f'Ingredient {random.randint(0, 19)}'}],
+    }
+    url = f'/api/recipe/recipes/{random.choice(session.recipe_ids)}/'
+    return 'PATCH', url, json.dumps(payload).encode(), 'application/json'
+
+
+def create_recipe(session):
+    payload = {
+        'title': 'Load test recipe',
+        'time_minutes': random.randint(5, 120),
+        'price': '9.99',
+        'tags': [{'name': f'Tag {random.randint(0, 9)}'}],
+    }
+    return 'POST', '/api/recipe/recipes/', json.dumps(payload).encode(), 'application/json'  # noqa: E501
+
+
+def login(session):
+    body = urlencode({'email': session.email, 'password': PASSWORD}).encode()
+    return 'POST', '/api/user/token/', body, 'application/x-www-form-urlencoded'
+
+
+def upload_image(session):
+    image = io.BytesIO()
+    Image.new('RGB', (400, 300), color=random.choice(['red', 'green'])).save(image, format='JPEG')  # noqa: E501
+    image.seek(0)
+    image.name = 'photo.jpg'
+    body = encode_multipart(BOUNDARY, {'image': image})
+    url = f'/api/recipe/recipes/{random.choice(session.recipe_ids)}/upload-image/'  # noqa: E501
+    return 'POST', url, body, MULTIPART_CONTENT
+
+
+WORKLOADS = {
+    # name: {operation: weight}
+    'read-heavy': {
+        list_recipes: 60, filter_recipes: 15, retrieve_recipe: 15,
+        list_tags: 5, list_ingredients: 5,
+    },
+    'bulk-edit': {edit_recipe: 70, create_recipe: 20, list_recipes: 10},
+    'login': {login: 100},
+    'upload': {upload_image: 100},
+    'mixed': {
+        list_recipes: 40, filter_recipes: 10, retrieve_recipe: 15,
+        list_tags: 5, list_ingredients: 5, edit_recipe: 12,
+        create_recipe: 5, login: 5, upload_image: 3,
+    },
+}
+
+
+# Transports -------------------------------------------------------------------
+
+
+class WSGITransport:
+    """Call the Django app in-process (no network, no server)."""
+
+    def __init__(self, token):
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def send(self, method, path, body, content_type):
+        query_timer = QueryTimer()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_timer))
+            response = self.client.generic(
+                method,
+                path,
+                body or b'',
+                content_type=content_type or 'application/octet-stream',
+            )
+        return response.status_code, len(response.content), query_timer.count
+
+    def close(self):
+        for connection in connections.all():
+            connection.close()  # Opened by this client's thread
+
+
+class HTTPTransport:
+    """Send requests to a running server (keep-alive connection per client)."""  # noqa: E501
+
+    def __init__(self, token, base_url):
+        url = urlsplit(base_url)
+        connection_class = (
+            http.client.HTTPSConnection if url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        self.connection = connection_class(url.netloc, timeout=60)
+        self.headers = {'Authorization': f'Token {token}'}
+
+    def send(self, method, path, body, content_type):
+        headers = dict(self.headers)
+        if content_type:
+            headers['Content-Type'] = content_type
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        content = response.read()
+        return response.status, len(content), None  # Queries unknown from outside # noqa: E501
+
+    def close(self):
+        self.connection.close()
+
+
+# Data & clients ---------------------------------------------------------------
+
+
+class Session:
+    """A load test user with its token & data."""
+
+    def __init__(self, email, token, recipe_ids, tag_ids):
+        self.email = email
+        self.token = token
+        self.recipe_ids = recipe_ids
+        self.tag_ids = tag_ids
+
+
+def create_sessions(clients, recipes_per_user):
+    """Create one user (with recipes, tags & ingredients) per client."""
+    user_model = get_user_model()
+    sessions = []
+    for number in range(clients):
+        email = USER_EMAIL.format(number)
+        user_model.objects.filter(email=email).delete()  # Leftover of an interrupted run # noqa: E501
+        user = user_model.objects.create_user(email=email, password=PASSWORD)
+        shard_token = sharding.set_shard(sharding.user_shard(user))  # The user's rows go where the API reads them # noqa: E501
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}') for i in range(10)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {i}') for i in range(20)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=random.randint(5, 120),
+                price=Decimal(random.randint(100, 5000)) / 100,
+            )
+            for i in range(recipes_per_user)
+        )
+        # Read back >> not every backend returns IDs from bulk_create (i.e. SQLite) # noqa: E501
+        tags = list(Tag.objects.filter(user=user))
+        ingredients = list(Ingredient.objects.filter(user=user))
+        recipes = list(Recipe.objects.filter(user=user))
+
+        tag_through = Recipe.tags.through
+        ingredient_through = Recipe.ingredients.through
+        tag_through.objects.bulk_create(
+            tag_through(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe in recipes
+            for tag in random.sample(tags, 3)
+        )
+        ingredient_through.objects.bulk_create(
+            ingredient_through(recipe_id=recipe.pk, ingredient_id=ingredient.pk)
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, 5)
+        )
+        sharding.reset_shard(shard_token)
+
+        sessions.append(Session(
+            email,
+            Token.objects.create(user=user).key,
+            [recipe.pk for recipe in recipes],
+            [tag.pk for tag in tags],
+        ))
+    return sessions
+
+
+def delete_sessions(sessions):
+    """Remove the load test users (and everything they own, incl. uploaded images)."""  # noqa: E501
+    users = get_user_model().objects.filter(
+        email__in=[session.email for session in sessions]
+    )
+    for user in users:
+        for recipe in Recipe.objects.using(sharding.user_shard(user)).filter(user=user).exclude(image=''):  # noqa: E501
+            recipe.image.delete(save=False)
+    users.delete()
+
+
+def run_client(session, make_transport, workload, deadline, samples, lock):
+    """Send requests until `deadline` (one client = one thread)."""
+    operations = list(workload)
+    weights = list(workload.values())
+    transport = make_transport(session.token)
+    results = []
+    try:
+        while time.monotonic() < deadline:
+            operation = random.choices(operations, weights)[0]
+            request = operation(session)
+
+            start = time.perf_counter()
+            try:
+                status, size, queries = transport.send(*request)
+            except Exception:  # noqa: B902 (Connection errors count as failures)
+                status, size, queries = 0, 0, None
+            duration = time.perf_counter() - start
+
+            results.append((operation.__name__, duration, status, size, queries))  # noqa: E501
+    finally:
+        transport.close()
+
+    with lock:
+        samples.extend(results)
+
+
+# Results ----------------------------------------------------------------------
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(percent * len(sorted_values) / 100) - 1)
+    # ^ceil, not round(): round() rounds halves to even (p50 of 5 values would be the 2nd)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles, requests/sec & queries/request (overall + per operation)."""  # noqa: E501
+    def stats(group):
+        latencies = sorted(sample[1] for sample in group)
+        queries = [sample[4] for sample in group if sample[4] is not None]
+        return {
+            'requests': len(group),
+            'errors': sum(1 for sample in group if not 200 <= sample[2] < 400),
+            'statuses': {  # {"200": requests}, "0": connection errors
+                str(status): count
+                for status, count in sorted(Counter(sample[2] for sample in group).items())  # noqa: E501
+            },
+            'requests_per_second': round(len(group) / elapsed, 2),
+            'p50_ms': _ms(percentile(latencies, 50)),
+            'p95_ms': _ms(percentile(latencies, 95)),
+            'p99_ms': _ms(percentile(latencies, 99)),
+            'max_ms': _ms(latencies[-1] if latencies else None),
+            'queries_per_request': (
+                round(statistics.mean(queries), 2) if queries else None
+            ),
+            'bytes_per_response': (
+                round(statistics.mean(sample[3] for sample in group))
+                if group else None
+            ),
+        }
+
+    operations = sorted({sample[0] for sample in samples})
+    return {
+        'overall': stats(samples),
+        'operations': {
+            name: stats([sample for sample in samples if sample[0] == name])
+            for name in operations
+        },
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def run(workload, clients, duration, recipes_per_user, base_url=None, keep_data=False):  # noqa: E501
+    """Run a load test and return the summarized results."""
+    sessions = create_sessions(clients, recipes_per_user)
+
+    if base_url:
+        def make_transport(token):
+            return HTTPTransport(token, base_url)
+    else:
+        make_transport = WSGITransport
+
+    samples = []
+    lock = threading.Lock()
+    start = time.monotonic()
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(session, make_transport, WORKLOADS[workload], start + duration, samples, lock),  # noqa: E501
+        )
+        for session in sessions
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+    finally:
+        if not keep_data:
+            delete_sessions(sessions)
+
+    return summarize(samples, elapsed)
+
+
+def compare(previous, current):
+    """Rows of (operation, metric, before, after, change %) between two result files."""  # noqa: E501
+    rows = []
+    names = ['overall'] + sorted(current['operations'])
+    for name in names:
+        before = previous['overall'] if name == 'overall' else previous['operations'].get(name)  # noqa: E501
+        after = current['overall'] if name == 'overall' else current['operations'][name]  # noqa: E501
+        if not before:
+            continue
+        for metric in ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):  # noqa: E501
+            old, new = before.get(metric), after.get(metric)
+            if old and new is not None:
+                rows.append((name, metric, old, new, (new - old) / old * 100))
+    return rows
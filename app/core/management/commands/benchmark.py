@@ -0,0 +1,42 @@
+"""
+Django command to run a micro benchmark (see core/benchmarks.py).
+
+i.e.
+    python manage.py benchmark json --size 1000
+    python manage.py benchmark serializer --size 10000
+    python manage.py benchmark compression
+    python manage.py benchmark serving --size 8
+    python manage.py benchmark partitioning --size 1000000  # PostgreSQL
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    """Django command to time a hot code path."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(benchmarks.BENCHMARKS))
+        parser.add_argument('--size', type=int, help='Recipes, slow clients for `serving` (default depends on the benchmark).')  # noqa: E501
+        parser.add_argument('--repeat', type=int, help='Runs, the best is reported.')  # noqa: E501
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (benchmark)"""
+        benchmark = benchmarks.BENCHMARKS[options['name']]
+        kwargs = {
+            key: options[key] for key in ('size', 'repeat')
+            if options[key] is not None  # Else the benchmark's default
+        }
+        rows, description = benchmark(**kwargs)
+
+        self.stdout.write(f"{options['name']}: {description} (best run)")
+        baselines = {}
+        for label, seconds, *note in rows:
+            operation = label.split()[0]
+            baseline = baselines.setdefault(operation, seconds)  # First row of each operation # noqa: E501
+            self.stdout.write(
+                f'  {label:<40} {seconds * 1000:9.2f}ms  {baseline / seconds:5.1f}x  {"".join(note)}'.rstrip()  # noqa: E501
+            )
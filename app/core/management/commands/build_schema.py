@@ -0,0 +1,30 @@
+"""
+Django command to pre-generate the OpenAPI schema (served by `api/schema/` & nginx).
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to build the OpenAPI schema files."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate even if the code version has not changed.',
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (build_schema)"""
+        version = schema.code_version()
+
+        if not options['force'] and schema.read_schema_files() is not None:
+            self.stdout.write(f'Schema up to date (version {version})')
+            return
+
+        schema.write_schema_files(schema.generate_schema())
+        self.stdout.write(self.style.SUCCESS(f'Schema generated (version {version})'))  # noqa: E501
@@ -0,0 +1,144 @@
+"""
+Django command to load test the API and store the results (JSON) for comparison.
+
+i.e.
+    python manage.py loadtest --workload read-heavy --clients 8 --duration 30
+    python manage.py loadtest --url http://localhost:8000 --compare loadtest-results/previous.json  # noqa: E501
+"""
+
+import json
+import os
+import subprocess
+from datetime import datetime, timezone
+
+from typing import Any
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core import loadtest
+
+
+class Command(BaseCommand):
+    """Django command to run a load test against the API."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workload',
+            choices=sorted(loadtest.WORKLOADS),
+            default='mixed',
+        )
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent clients.')  # noqa: E501
+        parser.add_argument('--duration', type=float, default=30, help='Seconds.')  # noqa: E501
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=50,
+            help='Recipes created for each client user.',
+        )
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server. Default: call the WSGI app in-process.',  # noqa: E501
+        )
+        parser.add_argument(
+            '--output',
+            default='loadtest-results',
+            help='Directory (or .json file) to store the results in.',
+        )
+        parser.add_argument('--compare', help='Previous results file to diff against.')  # noqa: E501
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help="Don't delete the load test users afterwards.",
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (loadtest)"""
+        self.stdout.write(
+            f"Running '{options['workload']}' with {options['clients']} clients "
+            f"for {options['duration']}s ({options['url'] or 'in-process WSGI'})..."  # noqa: E501
+        )
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):  # noqa: E501
+            # ^In-process requests are sent to `testserver`
+            summary = loadtest.run(
+                options['workload'],
+                options['clients'],
+                options['duration'],
+                options['recipes'],
+                base_url=options['url'],
+                keep_data=options['keep_data'],
+            )
+
+        result = {
+            'version': self.code_version(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'config': {
+                key: options[key]
+                for key in ('workload', 'clients', 'duration', 'recipes', 'url')
+            },
+            **summary,
+        }
+
+        self.print_summary(result)
+        path = self.save(result, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
+
+        if options['compare']:
+            with open(options['compare']) as previous_file:
+                self.print_comparison(json.load(previous_file), result)
+
+    def code_version(self):
+        """Git commit the results belong to (APP_VERSION inside containers)."""
+        if os.environ.get('APP_VERSION'):
+            return os.environ['APP_VERSION']
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return 'unknown'
+
+    def save(self, result, output):
+        """Write the results as JSON (one file per run inside a directory)."""
+        if output.endswith('.json'):
+            path = output
+        else:
+            name = f"{result['config']['workload']}-{result['version']}-{result['timestamp'][:19].replace(':', '')}.json"  # noqa: E501
+            path = os.path.join(output, name)
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as result_file:
+            json.dump(result, result_file, indent=2)
+        return path
+
+    def print_summary(self, result):
+        overall = result['overall']
+        if not overall['requests']:
+            raise CommandError('No requests were completed.')
+
+        self.stdout.write(
+            f"{'operation':<18}{'requests':>9}{'errors':>8}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        rows = [('overall', overall), *result['operations'].items()]
+        for name, stats in rows:
+            queries = stats['queries_per_request']
+            self.stdout.write(
+                f"{name:<18}{stats['requests']:>9}{stats['errors']:>8}"
+                f"{stats['requests_per_second']:>9}{stats['p50_ms']:>9}"
+                f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+                f"{'-' if queries is None else queries:>9}"
+            )
+        statuses = ', '.join(f'{status}: {count}' for status, count in overall['statuses'].items())  # noqa: E501
+        self.stdout.write(f'status codes  {statuses}')
+
+    def print_comparison(self, previous, current):
+        self.stdout.write(f"\nCompared with {previous['version']} ({previous['timestamp']}):")  # noqa: E501
+        for name, metric, old, new, change in loadtest.compare(previous, current):  # noqa: E501
+            self.stdout.write(f'{name:<18}{metric:<22}{old:>10} >> {new:<10}{change:+.1f}%')  # noqa: E501
@@ -0,0 +1,49 @@
+"""
+Django command to partition the recipe tables online (core/partitioning.py).
+
+i.e.
+    python manage.py migrate core 0009
+    python manage.py partition_tables --batch-size 10000
+    python manage.py migrate
+"""
+
+from typing import Any
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from core import partitioning
+
+
+REQUIRED_MIGRATION = ('core', '0009_link_tables_without_foreign_keys')  # No foreign keys to `core_recipe` left # noqa: E501
+
+
+class Command(BaseCommand):
+    """Django command to partition the recipe tables online."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias (i.e. every shard in turn).')  # noqa: E501
+        parser.add_argument('--partitions', type=int, default=settings.DB_PARTITIONS)  # noqa: E501
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows copied per transaction.')  # noqa: E501
+        parser.add_argument('--pause', type=float, default=0, help='Seconds between batches (less I/O for the app).')  # noqa: E501
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (partition_tables)"""
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL.')
+        if REQUIRED_MIGRATION not in MigrationRecorder(connection).applied_migrations():  # noqa: E501
+            raise CommandError(f'Run `manage.py migrate core {REQUIRED_MIGRATION[1][:4]}` first.')  # noqa: E501
+
+        for table, key in partitioning.TABLES:
+            converted = partitioning.convert_online(
+                connection, table, key, options['partitions'],
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                progress=lambda table, rows: self.stdout.write(f'{table}: {rows} rows copied'),  # noqa: E501
+            )
+            if converted:
+                self.stdout.write(self.style.SUCCESS(f'{table}: {options["partitions"]} partitions on {key}'))  # noqa: E501
+            else:
+                self.stdout.write(f'{table}: partitioned already')
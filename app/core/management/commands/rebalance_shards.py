@@ -0,0 +1,48 @@
+"""
+Django command to move users to their shard on the hash ring (see core/sharding.py).
+
+Run after adding a shard to DB_SHARDS (or to move the data of users from
+before sharding off `default`), i.e.
+    python manage.py rebalance_shards --dry-run  # What would move
+    python manage.py rebalance_shards
+"""
+
+from collections import Counter
+from typing import Any
+from django.core.management.base import BaseCommand
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Django command to move misplaced users, one user at a time."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the moves.')  # noqa: E501
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per query.')  # noqa: E501
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (rebalance_shards)"""
+        moves = Counter()
+        rows = failed = 0
+        for user, target in sharding.misplaced_users():
+            source = sharding.user_shard(user)
+            if not options['dry_run']:
+                try:
+                    rows += sharding.move_user(user, target, options['batch_size'])  # noqa: E501
+                except sharding.ShardMoveError as error:
+                    self.stderr.write(f'{user}: {error} (left on {source})')
+                    failed += 1
+                    continue
+            moves[source, target] += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{user}: {source} >> {target}')
+
+        for (source, target), users in sorted(moves.items()):
+            self.stdout.write(f'{source} >> {target}: {users} users')
+        if options['dry_run']:
+            self.stdout.write(f'Would move {sum(moves.values())} users')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Moved {sum(moves.values())} users ({rows} rows)'))  # noqa: E501
+        if failed:
+            self.stderr.write(f'{failed} users changed while being moved, run the command again')  # noqa: E501
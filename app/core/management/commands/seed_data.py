@@ -0,0 +1,99 @@
+"""
+Django command to generate a large benchmark dataset.
+
+i.e.
+    python manage.py seed_data --users 100000 --recipes 10000000 --processes 8
+"""
+
+import multiprocessing
+import time
+
+from typing import Any
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core import seed
+from core.models import User
+
+
+class Command(BaseCommand):
+    """Django command to seed users, recipes, tags & ingredients."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=42, help='Same seed >> same data.')  # noqa: E501
+        parser.add_argument('--tags', type=int, default=200, help='Distinct tag names.')  # noqa: E501
+        parser.add_argument('--ingredients', type=int, default=1000, help='Distinct ingredient names.')  # noqa: E501
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Popularity skew of tags & ingredients (higher = more skewed).',  # noqa: E501
+        )
+        parser.add_argument(
+            '--password',
+            default='seedpass123',
+            help='Password of every seeded user (hashed once).',
+        )
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())  # noqa: E501
+        parser.add_argument('--batch-size', type=int, default=20000, help='Rows per INSERT / COPY.')  # noqa: E501
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per worker task.')  # noqa: E501
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (seed_data)"""
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1.')
+
+        first_email = seed.EMAIL.format(seed=options['seed'], number=0)
+        if User.objects.filter(email=first_email).exists():
+            raise CommandError(f"Seed {options['seed']} has already been loaded (pick another --seed).")  # noqa: E501
+
+        processes = options['processes']
+        if connection.vendor == 'sqlite':
+            processes = 1  # SQLite allows a single writer at a time
+
+        plan = seed.Plan(
+            options['seed'],
+            options['users'],
+            options['recipes'],
+            options['tags'],
+            options['ingredients'],
+            options['zipf'],
+            make_password(options['password']),  # ONE hash for every user (PBKDF2 is slow on purpose) # noqa: E501
+        )
+        tasks = [
+            (plan, start, end, options['batch_size'])
+            for start, end in plan.chunks(options['chunk_size'])
+        ]
+
+        self.stdout.write(
+            f"Seeding {options['users']} users & {options['recipes']} recipes "
+            f'with {processes} process(es)...'
+        )
+        start = time.monotonic()
+        rows = 0
+
+        if processes > 1:
+            connections.close_all()  # Forked workers must open their own connections # noqa: E501
+            with multiprocessing.Pool(processes) as pool:
+                for done, written in enumerate(pool.imap_unordered(seed.seed_chunk, tasks), start=1):  # noqa: E501
+                    rows += written
+                    self.report_progress(done, len(tasks), rows, start)
+        else:
+            for done, task in enumerate(tasks, start=1):
+                rows += seed.seed_chunk(task)
+                self.report_progress(done, len(tasks), rows, start)
+
+        seed.reset_sequences()  # IDs were assigned by us, not by the sequences
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)'  # noqa: E501
+        ))
+
+    def report_progress(self, done, total, rows, start):
+        if done == total or done % max(1, total // 20) == 0:  # ~every 5%
+            elapsed = time.monotonic() - start
+            self.stdout.write(f'  {done}/{total} chunks, {rows} rows, {elapsed:.1f}s')  # noqa: E501
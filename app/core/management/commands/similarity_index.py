@@ -0,0 +1,44 @@
+"""
+Django command to rebuild the similar recipes indexes (see core/similarity.py).
+
+    python manage.py similarity_index          # Rebuild the stale & old ones
+    python manage.py similarity_index --all    # Rebuild every user's
+    python manage.py similarity_index --watch  # Background process (scripts/run.sh, uWSGI) # noqa: E501
+"""
+
+import time
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import similarity
+
+
+class Command(BaseCommand):
+    """Django command to rebuild similar recipes indexes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild the index of every user.')  # noqa: E501
+        parser.add_argument('--watch', action='store_true', help='Keep rebuilding the indexes due (every SIMILARITY_WATCH_SECONDS).')  # noqa: E501
+        parser.add_argument('--pause', type=float, default=0, help='Seconds between two rebuilds.')  # noqa: E501
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (similarity_index)"""
+        if options['all']:
+            users = get_user_model()._default_manager.order_by('pk').iterator()
+            for user in users:
+                similarity.build(user)
+            self.stdout.write(self.style.SUCCESS('Rebuilt every index'))
+            return
+
+        while True:
+            rebuilt = similarity.rebuild_due(options['pause'])
+            if rebuilt or not options['watch']:
+                self.stdout.write(f'Rebuilt {rebuilt} indexes')
+            if not options['watch']:
+                return
+            connections.close_all()  # Idle between rounds, don't hold connections # noqa: E501
+            time.sleep(settings.SIMILARITY_WATCH_SECONDS)
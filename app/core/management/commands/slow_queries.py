@@ -0,0 +1,58 @@
+"""
+Django command to list the slowest queries recorded by the slow query log.
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand
+
+from core.models import SlowQuery
+
+
+ORDERINGS = {
+    'total': '-total_ms',  # Where the database time goes
+    'calls': '-calls',
+    'max': '-max_ms',
+}
+
+
+class Command(BaseCommand):
+    """Django command to report slow queries."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--order',
+            choices=sorted(ORDERINGS),
+            default='total',
+            help='Sort by total time, number of calls or slowest call.',
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Print the captured query plans.',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Delete every recorded slow query.',
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (slow_queries)"""
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} slow queries'))  # noqa: E501
+            return
+
+        slow_queries = SlowQuery.objects.order_by(ORDERINGS[options['order']])[:options['limit']]  # noqa: E501
+        for slow_query in slow_queries:
+            average = slow_query.total_ms / slow_query.calls if slow_query.calls else 0  # noqa: E501
+            self.stdout.write(
+                f'{slow_query.calls} calls, {slow_query.total_ms:.0f}ms total, '  # noqa: E501
+                f'{average:.1f}ms avg, {slow_query.max_ms:.1f}ms max '
+                f'[{slow_query.database}] {slow_query.origin}\n'
+                f'  {slow_query.sql}'
+            )
+            if options['explain'] and slow_query.explain:
+                self.stdout.write('  ' + slow_query.explain.replace('\n', '\n  '))  # noqa: E501
+            self.stdout.write('')
@@ -0,0 +1,38 @@
+"""
+Django command to write the uWSGI configuration for this container (see core/uwsgi.py).
+
+i.e.
+    python manage.py uwsgi_config --output /vol/run/uwsgi.ini
+    python manage.py uwsgi_config --workers  # Just the worker count (uvicorn)
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand
+
+from core import uwsgi
+
+
+class Command(BaseCommand):
+    """Django command to size uWSGI from the container's CPU & memory limits."""  # noqa: E501
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='File to write (default: stdout).')  # noqa: E501
+        parser.add_argument('--workers', action='store_true', help='Only print the number of workers (ASGI mode).')  # noqa: E501
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (uwsgi_config)"""
+        if options['workers']:
+            self.stdout.write(str(uwsgi.worker_sizing()['workers']))
+            return
+
+        config = uwsgi.uwsgi_options()
+        ini = uwsgi.render_ini(config)
+
+        if not options['output']:
+            self.stdout.write(ini, ending='')
+            return
+
+        with open(options['output'], 'w') as ini_file:
+            ini_file.write(ini)
+        summary = ', '.join(f'{option}={value}' for option, value in config if option in ('workers', 'threads', 'cheaper', 'reload-on-rss', 'listen'))  # noqa: E501
+        self.stdout.write(self.style.SUCCESS(f'uWSGI: {summary} (CPUs: {uwsgi.cpu_limit()})'))  # noqa: E501
@@ -2,27 +2,86 @@
 Django command to wait for the database to be available.
 """
 
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from psycopg2 import OperationalError as Psycopg2OpError
 
 from typing import Any
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+
+INITIAL_DELAY = 0.005  # Seconds. First retry after ~5ms (DB is often up by the time the container is)
+MAX_DELAY = 1.0  # Seconds. Never wait longer than this between two attempts
 
 
 class Command(BaseCommand):
     """Django command to wait for database."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait before giving up (0 = wait forever).',
+        )
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Database alias to wait for (repeatable). Defaults to all configured aliases.',  # noqa: E501
+        )
+
+    def probe(self, alias):
+        """Run a cheap query against `alias` (Exception raised if DB is not ready)."""  # noqa: E501
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close()  # Connections are per thread, don't leave this one open
+
+    def wait_for(self, alias, deadline):
+        """Retry `probe` with exponential backoff (and jitter) until ready or `deadline`."""  # noqa: E501
+        start = time.monotonic()
+        delay = INITIAL_DELAY
+        while True:
+            try:
+                self.probe(alias)
+                return time.monotonic() - start  # Time-to-ready for this alias
+            except (Psycopg2OpError, OperationalError):
+                if deadline and time.monotonic() >= deadline:
+                    return None
+
+                self.stdout.write(
+                    f'Database {alias!r} unavailable, waiting {delay * 1000:.0f}ms...'  # noqa: E501
+                )
+                time.sleep(random.uniform(delay / 2, delay))
+                # ^Jitter >> containers started together don't all hit the DB at the same moment # noqa: E501
+                delay = min(delay * 2, MAX_DELAY)
+
     def handle(self, *args: Any, **options: Any):
         """Entrypoint for command (wait_for_db)"""
         self.stdout.write('Waiting for database...')  # Standard Output to Log Things to Screen # noqa: E501
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])  # Exception Raised if DB is not ready # noqa: E501
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+        aliases = options['databases'] or list(connections)
+        timeout = options['timeout']
+        deadline = time.monotonic() + timeout if timeout else None
+
+        # Check all aliases (primary, replicas, ...) at the same time
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            results = dict(zip(
+                aliases,
+                executor.map(lambda alias: self.wait_for(alias, deadline), aliases),  # noqa: E501
+            ))
+
+        unavailable = [alias for alias, took in results.items() if took is None]
+        if unavailable:
+            raise CommandError(
+                f'Database unavailable after {timeout}s: {", ".join(unavailable)}'  # noqa: E501
+            )
 
+        for alias, took in results.items():
+            self.stdout.write(f'Database {alias!r} ready in {took * 1000:.0f}ms')  # noqa: E501
         self.stdout.write(self.style.SUCCESS('Database available!'))
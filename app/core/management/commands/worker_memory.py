@@ -0,0 +1,49 @@
+"""
+Django command to report the memory of the uWSGI workers (see core/preload.py).
+
+i.e.
+    python manage.py worker_memory              # Running workers
+    python manage.py worker_memory --compare 4  # Without & with preloading
+"""
+
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+
+from core import preload, uwsgi
+
+
+MiB = 2 ** 20
+
+
+class Command(BaseCommand):
+    """Django command to show RSS / USS per worker."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', type=int, metavar='WORKERS', help='Fork workers without & with preloading (no uWSGI needed).')  # noqa: E501
+        parser.add_argument('--rounds', type=int, default=20, help='Sample requests served by each forked worker.')  # noqa: E501
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command (worker_memory)"""
+        if options['compare']:
+            results, seconds = preload.compare(options['compare'], options['rounds'])  # noqa: E501
+            for mode, workers in results.items():
+                self.write_workers(mode, workers)
+            self.stdout.write(f'preloading took {seconds * 1000:.0f}ms (once, in the master)')  # noqa: E501
+            return
+
+        stats = uwsgi.read_stats()
+        if stats is None:
+            raise CommandError(f'No uWSGI stats socket at {uwsgi.settings.UWSGI_STATS}')  # noqa: E501
+        workers = [
+            preload.memory_usage(worker['pid'])
+            for worker in stats['workers'] if worker.get('pid')  # Not the stopped (cheap) ones # noqa: E501
+        ]
+        self.write_workers('workers', workers)
+
+    def write_workers(self, label, workers):
+        self.stdout.write(f'{label}:')
+        for number, memory in enumerate(workers, 1):
+            self.stdout.write(f"  worker {number}  rss {memory['rss'] / MiB:7.1f} MiB  uss {memory['uss'] / MiB:7.1f} MiB  shared {memory['shared'] / MiB:7.1f} MiB")  # noqa: E501
+        if workers:
+            total = sum(memory['uss'] for memory in workers)
+            self.stdout.write(f'  total uss {total / MiB:.1f} MiB')
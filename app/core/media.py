@@ -0,0 +1,126 @@
+"""
+Protected media (recipe images)
+
+Images are served under MEDIA_URL by `protected_media_view`: Django only
+authenticates the request & checks the recipe belongs to the user (1 indexed
+query), then hands the file to nginx with `X-Accel-Redirect` (internal
+location, see proxy/default.conf.tpl). nginx sends the bytes and handles
+Range / If-Range itself, so uWSGI workers never stream images.
+
+Without nginx (MEDIA_ACCEL_REDIRECT_PREFIX = None, i.e. `runserver`) the
+file is sent by Django, with the same Range & conditional request support.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from drf_spectacular.utils import extend_schema
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication  # noqa: E501
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.permissions import IsAuthenticated
+
+from core import sharding
+from core.models import Recipe
+
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def normalize_path(path):
+    """Media path without `..` tricks (None if it points outside MEDIA_ROOT)."""  # noqa: E501
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith('..') or path == '.':
+        return None
+    return path
+
+
+def file_etag(stat):
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+    # ^Same format as nginx's ETag >> validators stay the same whoever sends the file # noqa: E501
+
+
+def byte_range(request, size, etag):
+    """(start, end) of a single `Range: bytes=` request, None >> whole file, False >> unsatisfiable."""  # noqa: E501
+    match = RANGE.match(request.headers.get('Range', '').replace(' ', ''))
+    if match is None:
+        return None  # No (or a multi) range >> whole file (allowed by RFC 7233)  # noqa: E501
+    if request.headers.get('If-Range', etag) != etag:
+        return None  # File changed since the client's partial copy
+
+    first, last = match.groups()
+    if not first:  # `bytes=-500` >> last 500 bytes
+        if not last:
+            return None
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def send_file(request, path, stat, content_type):
+    """Django sends the file itself (no nginx in front)."""
+    requested = byte_range(request, stat.st_size, file_etag(stat))
+    if requested is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if requested is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = requested
+        with open(path, 'rb') as media_file:
+            media_file.seek(start)
+            response = HttpResponse(media_file.read(end - start + 1), content_type=content_type, status=206)  # noqa: E501
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@extend_schema(exclude=True)  # Not part of the JSON API (image URLs come from the recipes) # noqa: E501
+@api_view(['GET'])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([IsAuthenticated])
+def protected_media_view(request, path):
+    """Serve a recipe image to its owner."""
+    path = normalize_path(path)
+    if path is None or not Recipe.objects.using(sharding.user_shard(request.user)).filter(user=request.user, image=path).exists():  # noqa: E501
+        raise Http404  # Same answer for "not yours" & "doesn't exist"
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404
+
+    etag = file_etag(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))  # noqa: E501
+    # ^If-None-Match / If-Modified-Since >> 304 without touching the file
+    if response is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'  # noqa: E501
+        prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+        if prefix:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = prefix + path  # nginx sends the bytes # noqa: E501
+        else:
+            response = send_file(request, full_path, stat, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_SECONDS)  # noqa: E501
+    # ^private >> shared caches (CDN / proxies) must never keep another user's image # noqa: E501
+    return response
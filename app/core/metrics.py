@@ -0,0 +1,108 @@
+"""
+Prometheus metrics (per route latency, status codes, response size & database usage)
+"""
+
+import os
+import time
+
+from django.http import HttpResponse
+
+from core import uwsgi
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+# Every uWSGI worker is a separate process. With PROMETHEUS_MULTIPROC_DIR set (see scripts/run.sh)
+# each worker writes its values to memory mapped files in that directory and the scrape endpoint
+# adds them up, so one scrape sees the totals of ALL workers (not only the one that answered).
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time spent processing a request.',
+    ['route', 'method'],
+)
+REQUESTS = Counter(
+    'http_requests',
+    'Requests by response status code.',
+    ['route', 'method', 'status'],
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'Size of the response body.',
+    ['route'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request',
+    'Number of database queries made by a request.',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_TIME = Histogram(
+    'db_query_duration_seconds_per_request',
+    'Total time a request spent waiting for the database.',
+    ['route'],
+)
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries & the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def observe(route, method, status, duration, size, query_timer):
+    """Record one finished request."""
+    REQUEST_LATENCY.labels(route, method).observe(duration)
+    REQUESTS.labels(route, method, str(status)).inc()
+    if size is not None:
+        RESPONSE_SIZE.labels(route).observe(size)
+    DB_QUERIES.labels(route).observe(query_timer.count)
+    DB_TIME.labels(route).observe(query_timer.duration)
+
+
+def metrics_view(request):
+    """Scrape endpoint (Prometheus text format)."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # Aggregate all the workers
+    else:
+        registry = REGISTRY  # Single process (i.e. Development Server)
+
+    output = generate_latest(registry)
+    stats = uwsgi.read_stats() if uwsgi.uwsgi_api is not None else None
+    # ^Workers, listen queue & memory, from the uWSGI master's stats socket
+    if stats is not None:
+        stats_registry = CollectorRegistry()
+        stats_registry.register(UWSGIStatsCollector(stats))
+        output += generate_latest(stats_registry)
+
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
+
+
+class UWSGIStatsCollector:
+    """Prometheus collector of a uWSGI stats document (see core/uwsgi.py)."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def collect(self):
+        return uwsgi.collect(self.stats)
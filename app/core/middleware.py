@@ -0,0 +1,98 @@
+"""
+Custom middleware
+"""
+
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from core import compression, metrics, profiling, slow_queries, uwsgi
+
+
+class HarakiriMiddleware:
+    """Harakiri of the request's route class (see core/uwsgi.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        uwsgi.set_harakiri(uwsgi.harakiri_seconds(request.path_info))
+        return self.get_response(request)
+        # ^Cleared on `request_finished` >> streamed responses are covered until the end # noqa: E501
+
+
+class MetricsMiddleware:
+    """Record latency, status, response size & database usage of every request."""  # noqa: E501
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_timer = metrics.QueryTimer()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():  # Primary & replicas
+                stack.enter_context(connection.execute_wrapper(query_timer))
+            response = self.get_response(request)
+
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.view_name if match else '<unresolved>'
+        # ^URL name (i.e. `recipe:recipe-list`) >> one time series per endpoint, NOT per URL (IDs) # noqa: E501
+
+        if route != 'metrics':  # Don't record the scrapes themselves
+            size = None if response.streaming else len(response.content)
+            metrics.observe(
+                route,
+                request.method,
+                response.status_code,
+                duration,
+                size,
+                query_timer,
+            )
+
+        return response
+
+
+class CompressionMiddleware:
+    """Compress responses with gzip / brotli (see core/compression.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return compression.compress_response(request, self.get_response(request))  # noqa: E501
+
+
+class ProfilingMiddleware:
+    """Profile a request when a staff user asks for it (see core/profiling.py)."""  # noqa: E501
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = profiling.requested_mode(request)  # Header lookup only >> no cost for normal requests # noqa: E501
+        if mode is None or profiling.staff_user(request) is None:
+            return self.get_response(request)
+
+        return profiling.profile_request(self.get_response, request, mode)
+
+
+class SlowQueryMiddleware:
+    """Tag the queries of a request with its view (see core/slow_queries.py)."""  # noqa: E501
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slow_queries.set_origin('')
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.reset_origin(token)  # Nothing leaks into the next request # noqa: E501
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.set_origin(slow_queries.view_origin(view_func, request.method))  # noqa: E501
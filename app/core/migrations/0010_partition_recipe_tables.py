@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations
+
+from core import partitioning
+
+
+def partition_tables(apps, schema_editor):
+    """Hash partition the recipe tables (PostgreSQL only, see core/partitioning.py)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, key in partitioning.TABLES:
+        partitioning.convert(schema_editor.connection, table, key, settings.DB_PARTITIONS)
+        # ^Nothing to do if `manage.py partition_tables` converted the table already
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_link_tables_without_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+        # ^Reverse: the partitioned tables work for the older code as they are
+    ]
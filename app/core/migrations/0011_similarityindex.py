@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_partition_recipe_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityIndex',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('data', models.BinaryField()),
+                ('recipes', models.PositiveIntegerField(default=0)),
+                ('version', models.UUIDField(default=uuid.uuid4)),
+                ('stale', models.BooleanField(default=False)),
+                ('built_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='moving',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -61,11 +61,20 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)  
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)  # Can user login to Django Admin
+    shard = models.CharField(max_length=64, blank=True)  # Database holding the user's recipes, tags & ingredients (blank >> `default`, see core/sharding.py) # noqa: E501
+    moving = models.BooleanField(default=False)  # Data being copied to another shard >> its writes are refused until the switch (core/sharding.py) # noqa: E501
 
     objects = UserManager()  # UserManager is a class that inherits from BaseUserManager and provides methods for creating and managing users. # noqa: E501
 
     USERNAME_FIELD = "email"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields if not field.primary_key and field.name not in ('shard', 'moving')]  # noqa: E501
+            # ^Set by updates of their own only (core/sharding.py): a stale instance (i.e. the request's user) must not undo a move # noqa: E501
+        super().save(*args, **kwargs)
+
+
 # Add user model at end of settings.py file as below (IMPORTANT)
 # AUTH_USER_MODEL = 'core.User'
 # Also make sure that 'core' app is in INSTALLED_APPS in settings.py file
@@ -77,6 +86,7 @@ class Recipe(models.Model):  # base Model Class
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,  # Referencing a string from settings.py file
         on_delete=models.CASCADE,  # If the user is deleted, the assosiated recipes should also be deleted.
+        db_constraint=False,  # The recipe may live on a shard, its user always lives on `default`
         # Compliance with Data Compliance rules 
     )
     # ^ForeignKey is a relationship between two models.
@@ -91,13 +101,24 @@ class Recipe(models.Model):  # base Model Class
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
 
-    tags = models.ManyToManyField("Tag")  # ManyToManyField is a relationship between two models that allows a many-to-many relationship between the two models. # noqa: E501
+    tags = models.ManyToManyField("Tag", db_constraint=False)  # ManyToManyField is a relationship between two models that allows a many-to-many relationship between the two models. # noqa: E501
     # ^Many different recipes can have many different Tags
     # any of our tags can be associated to any of our recipes and any of our recipes can be associated to any of our tags.
 
-    ingredients = models.ManyToManyField("Ingredient")  # ^Same as above
+    ingredients = models.ManyToManyField("Ingredient", db_constraint=False)  # ^Same as above
+    # db_constraint=False >> no foreign keys on the link tables, `core_recipe` is partitioned (core/partitioning.py)
 
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)  
+    image = models.ImageField(null=True, upload_to=recipe_image_file_path, db_index=True)  # Indexed >> protected media looks recipes up by image
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='recipe_user_title_idx'),
+        ]
+        # ^One per `?ordering=` of the API (recipe/views.py): a user's recipes are read in that order straight from the index,
+        # range filters (min_price, max_time...) & cursor pages are ranges of it (no sort, no OFFSET, see core/pagination.py)
 
     def __str__(self):
         return self.title
@@ -113,6 +134,7 @@ class Tag(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,  # Same as Recipe.user
     )
 
     def __str__(self):
@@ -125,9 +147,44 @@ class Ingredient(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,  # Same as Recipe.user
     )
 
     def __str__(self):
         return self.name
  
 
+
+
+class SlowQuery(models.Model):
+    """Queries slower than SLOW_QUERY_THRESHOLD_MS, grouped by fingerprint (see core/slow_queries.py)"""  # noqa: E501
+
+    fingerprint = models.CharField(max_length=40, unique=True)  # Hash of the normalized SQL
+    sql = models.TextField()  # Normalized SQL (values replaced by `?`)
+    example_sql = models.TextField()  # Last slow occurrence, as executed
+    example_params = models.TextField(blank=True)
+    origin = models.CharField(max_length=255, blank=True)  # i.e. `RecipeViewSet.list` + line in our code
+    database = models.CharField(max_length=64)  # Alias the query ran on (primary / replica)
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    explain = models.TextField(blank=True)  # Captured once, for the first slow occurrence
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.origin or self.database}: {self.sql[:80]}'
+
+
+class SimilarityIndex(models.Model):
+    """Recipe × tag / ingredient matrix of a user, for similar recipes (see core/similarity.py)"""  # noqa: E501
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)  # noqa: E501
+    data = models.BinaryField()  # Compressed NumPy arrays (RecipeIndex.dumps())
+    recipes = models.PositiveIntegerField(default=0)  # Rows (recipes with tags / ingredients)
+    version = models.UUIDField(default=uuid.uuid4)  # New on every save >> processes reload their copy
+    stale = models.BooleanField(default=False)  # Links changed behind its back >> rebuilt in the background
+    built_at = models.DateTimeField()  # Last full rebuild
+
+    def __str__(self):
+        return f'{self.user}: {self.recipes} recipes'
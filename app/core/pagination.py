@@ -0,0 +1,150 @@
+"""
+Keyset (cursor) pagination of lists ordered by one field & `id`
+
+Opt-in with `?page_size=`: without it a list stays a plain JSON array
+(existing clients). With it: {"next": url, "previous": url, "results": [...]},
+clients follow the links.
+
+A cursor holds the (field value, id) of the row its page starts after. The
+next page is `field >= value AND (field > value OR id > last id)` in the
+order of the (user_id, field, id) index (core/models.py): the first
+condition is where the index range starts, so every page reads
+`page_size + 1` index entries, whether it is the 1st or the 1000th (no
+OFFSET, no sort). Rows added or deleted meanwhile don't shift the pages.
+"""
+
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError  # noqa: E501
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_ordering(ordering):
+    """('-price', '-id') >> ('price', True). Only `field, id` in one direction has a keyset."""  # noqa: E501
+    *fields, last = ordering or ['']
+    descending = last.startswith('-')
+    if last.lstrip('-') != 'id' or len(fields) > 1 or any(field.startswith('-') != descending for field in fields):  # noqa: E501
+        raise ImproperlyConfigured(f'Keyset pagination needs `<field>, id` (same direction), not {list(ordering)}.')  # noqa: E501
+    return (fields[0] if fields else last).lstrip('-'), descending
+
+
+class KeysetCursorPagination(BasePagination):
+    """Cursor pages of a queryset ordered by `field, id` (see module docstring)."""  # noqa: E501
+
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return None
+        try:
+            page_size = int(value)
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= self.max_page_size:
+            raise ValidationError({self.page_size_query_param: f'Between 1 and {self.max_page_size}.'})  # noqa: E501
+        return page_size
+
+    def encode_cursor(self, row, reverse):
+        value, row_id = row
+        if not isinstance(value, (int, str)):
+            value = str(value)  # i.e. Decimal
+        payload = json.dumps([value, row_id, reverse], separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        """((field value, id) or None, reverse)"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            value, row_id, reverse = json.loads(urlsafe_b64decode(cursor.encode()))  # noqa: E501
+            return (model._meta.get_field(self.field).to_python(value), int(row_id)), bool(reverse)  # noqa: E501
+        except (binascii.Error, ValueError, TypeError, DjangoValidationError):
+            raise NotFound('Invalid cursor.')
+
+    def after(self, position, descending):
+        """Rows after `position` in the (field, id) order."""
+        value, row_id = position
+        less, less_or_equal = ('lt', 'lte') if descending else ('gt', 'gte')
+        if self.field == 'id':
+            return Q(**{f'id__{less}': row_id})
+        return Q(**{f'{self.field}__{less_or_equal}': value}) & (
+            Q(**{f'{self.field}__{less}': value}) | Q(**{self.field: value, f'id__{less}': row_id})  # noqa: E501
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Queryset of the page's rows (same ordering), None without `?page_size=`."""  # noqa: E501
+        self.page_size = self.get_page_size(request)
+        if self.page_size is None:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.field, descending = keyset_ordering(queryset.query.order_by)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        keys = queryset.prefetch_related(None)
+        if position is not None:
+            keys = keys.filter(self.after(position, descending != reverse))
+        if reverse:  # `previous` link: read backwards from the cursor
+            keys = keys.reverse()
+        rows = list(keys.values_list(self.field, 'id')[:self.page_size + 1])
+        # ^Index only: (field, id) of the page + 1 row (is there more?)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_row = rows[-1] if rows and (has_more or reverse) else None
+        self.previous_row = rows[0] if rows and (has_more if reverse else position is not None) else None  # noqa: E501
+        return queryset.filter(id__in=[row_id for _, row_id in rows])
+
+    def link(self, row, reverse):
+        if row is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(row, reverse))  # noqa: E501
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.link(self.next_row, False),
+            'previous': self.link(self.previous_row, True),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        link = {'type': 'string', 'nullable': True, 'format': 'uri'}
+        return {
+            'oneOf': [
+                schema,  # Without `?page_size=`
+                {
+                    'type': 'object',
+                    'properties': {'next': link, 'previous': link, 'results': schema},  # noqa: E501
+                },
+            ],
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Recipes per page (at most {self.max_page_size}). Without it: all recipes, no envelope.',  # noqa: E501
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor of the `next` / `previous` link.',
+                'schema': {'type': 'string'},
+            },
+        ]
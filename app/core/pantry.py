@@ -0,0 +1,158 @@
+"""
+"What can I cook": recipes whose ingredients are (almost) all in a pantry
+
+A user's `PantryIndex` maps every ingredient to the SET of the user's
+recipes using it, as a bitset (one uint64 word per 64 recipes, one bit per
+recipe slot). It is derived from the user's similar recipes index (its
+ingredient columns, core/similarity.py), which is persisted, versioned &
+rebuilt in the background after the recipe writes already.
+
+- all ingredients in the pantry: OR the bitsets of the ingredients NOT in
+  it (recipes needing something else), the recipes left over are the
+  answer. A few hundred word-wide operations, whatever the pantry
+- missing at most k: popcount of the pantry's bitsets per recipe slot
+  (ingredients it has), recipe size - that = ingredients missing
+- derived again when the similar recipes index gets a new version (its
+  background rebuild)
+- memory: the indexes of the most recently used users are kept, up to
+  PANTRY_CACHE_BYTES per process (least recently used evicted first)
+- stale or missing similar recipes index (links changed behind its back,
+  i.e. in the admin or by deleting an ingredient, or not built yet): one
+  grouped query over the recipe / ingredient links instead (`cookable_sql()`)
+  until the background rebuild, never bitsets that may be out of date
+
+Recipes without ingredients are never cookable: there is no telling what
+they need (both ways: they have no bitset slot & are left out of the query).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import Count, F, Q, Value
+
+from core import similarity
+from core.models import Recipe
+
+
+WORD = np.dtype('<u8')  # Little endian: bit i of word w is slot w * 64 + i
+
+_cache = OrderedDict()  # {user ID: (version, PantryIndex)}, most recently used last # noqa: E501
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def bit_words(slots):
+    return max(1, -(-slots // 64))
+
+
+class PantryIndex:
+    """Ingredient >> recipe bitsets of one user."""
+
+    def __init__(self, recipe_ids, sizes, ingredient_ids, bits):
+        self.recipe_ids = recipe_ids  # Slot >> recipe ID (0: free slot)
+        self.sizes = sizes  # Slot >> number of ingredients
+        self.ingredient_ids = ingredient_ids  # Row of `bits` >> ingredient ID (sorted) # noqa: E501
+        self.bits = bits  # (ingredients, words) bitsets of recipe slots
+
+    @classmethod
+    def from_links(cls, recipes, ingredients):
+        """Index of the (recipe ID, ingredient ID) pairs."""
+        recipe_ids, slots = np.unique(np.asarray(recipes, dtype=np.int64), return_inverse=True)  # noqa: E501
+        ingredient_ids, rows = np.unique(np.asarray(ingredients, dtype=np.int64), return_inverse=True)  # noqa: E501
+        bits = np.zeros((len(ingredient_ids), bit_words(len(recipe_ids))), dtype=WORD)  # noqa: E501
+        np.bitwise_or.at(bits, (rows, slots // 64), np.left_shift(np.uint64(1), (slots % 64).astype(np.uint64)))  # noqa: E501
+        sizes = np.bincount(slots, minlength=len(recipe_ids)).astype(np.int32)
+        return cls(recipe_ids, sizes, ingredient_ids, bits)
+
+    @classmethod
+    def from_recipe_index(cls, index):
+        """Ingredient columns of a similar recipes index (features: ingredients odd)."""  # noqa: E501
+        recipes, keys = index.links()
+        ingredients = keys % 2 == 1
+        return cls.from_links(recipes[ingredients], keys[ingredients] // 2)
+
+    @property
+    def nbytes(self):
+        return self.recipe_ids.nbytes + self.sizes.nbytes + self.ingredient_ids.nbytes + self.bits.nbytes  # noqa: E501
+
+    def slot_bits(self, slots):
+        """Bitset of `slots`."""
+        words = np.zeros(self.bits.shape[1], dtype=WORD)
+        slots = np.asarray(slots, dtype=np.int64)
+        np.bitwise_or.at(words, slots // 64, np.left_shift(np.uint64(1), (slots % 64).astype(np.uint64)))  # noqa: E501
+        return words
+
+    def cookable(self, pantry, missing=0):
+        """[(recipe ID, ingredients missing)] of the recipes missing at most `missing` ingredients, fewest first."""  # noqa: E501
+        in_pantry = np.isin(self.ingredient_ids, np.asarray(list(pantry), dtype=np.int64))  # noqa: E501
+        used = self.sizes > 0
+        if missing == 0:
+            blocked = np.bitwise_or.reduce(self.bits[~in_pantry], axis=0)
+            # ^Recipes needing at least one ingredient the pantry doesn't have # noqa: E501
+            possible = self.slot_bits(np.flatnonzero(used)) & ~blocked
+            slots = np.flatnonzero(np.unpackbits(possible.view(np.uint8), bitorder='little')[:len(self.sizes)])  # noqa: E501
+            counts = np.zeros(len(slots), dtype=np.int32)
+        else:
+            have = np.unpackbits(self.bits[in_pantry].view(np.uint8), axis=1, bitorder='little')  # noqa: E501
+            have = have[:, :len(self.sizes)].sum(axis=0, dtype=np.int32)  # Pantry ingredients per recipe # noqa: E501
+            lacking = self.sizes - have
+            slots = np.flatnonzero(used & (lacking <= missing))
+            counts = lacking[slots]
+        order = np.lexsort((-self.recipe_ids[slots], counts))  # Fewest missing, then newest # noqa: E501
+        return list(zip(self.recipe_ids[slots][order].tolist(), counts[order].tolist()))  # noqa: E501
+
+
+# Per process cache ----------------------------------------------------------
+
+
+def _store(user_id, version, index):
+    """Cache `index`, evict least recently used users past PANTRY_CACHE_BYTES (lock held)."""  # noqa: E501
+    global _cache_bytes
+    previous = _cache.pop(user_id, None)
+    if previous is not None:
+        _cache_bytes -= previous[1].nbytes
+    _cache[user_id] = (version, index)
+    _cache_bytes += index.nbytes
+    while _cache_bytes > settings.PANTRY_CACHE_BYTES and len(_cache) > 1:
+        _, (_, evicted) = _cache.popitem(last=False)
+        _cache_bytes -= evicted.nbytes
+
+
+def get_index(user, recipe_index):
+    """The user's pantry index, derived again when the similar recipes index changed."""  # noqa: E501
+    version = recipe_index.version
+    with _cache_lock:
+        cached = _cache.get(user.pk)
+        if cached is not None and cached[0] == version:
+            _cache.move_to_end(user.pk)
+            return cached[1]
+    index = PantryIndex.from_recipe_index(recipe_index)
+    with _cache_lock:
+        _store(user.pk, version, index)
+    return index
+
+
+def cookable_sql(user, pantry, missing=0):
+    """PantryIndex.cookable() as one grouped query (the user's shard), at most PANTRY_MAX_RESULTS."""  # noqa: E501
+    have = Count('ingredients', filter=Q(ingredients__in=pantry)) if pantry else Value(0)  # noqa: E501
+    recipes = (
+        Recipe.objects.filter(user=user)
+        .annotate(size=Count('ingredients'), have=have)
+        .filter(size__gt=0)  # Without ingredients >> not cookable
+        .annotate(lacking=F('size') - F('have'))
+        .filter(lacking__lte=missing)
+        .order_by('lacking', '-id')  # Fewest missing, then newest
+        .values_list('id', 'lacking')
+    )
+    return list(recipes[:settings.PANTRY_MAX_RESULTS])
+
+
+def cookable_recipes(user, pantry, missing=0):
+    """[(recipe ID, ingredients missing)], fewest missing first."""
+    recipe_index = similarity.fresh_index(user)
+    if recipe_index is None:
+        return cookable_sql(user, pantry, missing)
+    return get_index(user, recipe_index).cookable(pantry, missing)
@@ -0,0 +1,180 @@
+"""
+PostgreSQL hash partitions of the recipe tables
+
+Used by migration 0010 & `manage.py partition_tables`.
+
+`core_recipe` is split on `user_id`, the link tables on `recipe_id` (Django's
+M2M tables have no `user_id`, and every query of theirs filters on the
+recipe). DB_PARTITIONS partitions each, `<table>_p0`, `<table>_p1`, ...:
+
+- a user's recipes (a recipe's links) are in ONE partition, the planner
+  only reads that one (`WHERE user_id = ...`, `recipe_id IN (...)`)
+- (auto)vacuum & index maintenance work per partition: a busy user only
+  dirties its partition, vacuum scans its heap & (much smaller) indexes
+  instead of the indexes of the whole table
+
+Unique constraints of a partitioned table must include the partition key:
+the primary key becomes (id, <key>), IDs stay unique through the
+table's sequence. Nothing can reference a partitioned table by `id`
+alone, so the link tables lost their foreign keys (migration 0009).
+
+Two ways to convert:
+- `migrate` (migration 0010): copies everything in ONE statement while
+  holding the table's lock. Fine for new or small databases
+- `manage.py partition_tables` (run between 0009 & 0010): copies in
+  batches while the app keeps running (a trigger mirrors writes to the
+  copy), then swaps the tables under a short lock. 0010 then finds the
+  tables partitioned & does nothing
+"""
+
+import time
+
+from django.db import transaction
+
+
+TABLES = [  # (table, partition key)
+    ('core_recipe', 'user_id'),
+    ('core_recipe_tags', 'recipe_id'),
+    ('core_recipe_ingredients', 'recipe_id'),
+]
+
+
+def copy_name(table):
+    return f'{table}_partitioned'
+
+
+def is_partitioned(cursor, table):
+    cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [table])  # noqa: E501
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def indexes(cursor, table):
+    """[(name, `USING ...` part of the definition, unique)] except the primary key."""  # noqa: E501
+    cursor.execute(
+        'SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique '
+        'FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+        'WHERE i.indrelid = %s::regclass AND NOT i.indisprimary ORDER BY 1',
+        [table],
+    )
+    return [(name, definition.split(' USING ', 1)[1], unique) for name, definition, unique in cursor.fetchall()]  # noqa: E501
+
+
+def create_statements(table, key, partitions, table_indexes):
+    """SQL creating the (empty) partitioned copy of `table`."""
+    copy = copy_name(table)
+    statements = [
+        f'CREATE TABLE {copy} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY HASH ({key})',  # noqa: E501
+        # ^Same columns in the same order (`INSERT ... SELECT *`), the `id` default keeps using the table's sequence # noqa: E501
+        f'ALTER TABLE {copy} ADD CONSTRAINT {copy}_pkey PRIMARY KEY (id, {key})',  # noqa: E501
+    ]
+    statements += [
+        f'CREATE TABLE {table}_p{number} PARTITION OF {copy} FOR VALUES WITH (MODULUS {partitions}, REMAINDER {number})'  # noqa: E501
+        for number in range(partitions)
+    ]
+    for name, using, unique in table_indexes:
+        if unique and key not in using:
+            raise ValueError(f'{name}: unique indexes of a partitioned table must include {key}')  # noqa: E501
+        statements.append(f'CREATE {"UNIQUE " if unique else ""}INDEX {name}_p ON {copy} USING {using}')  # noqa: E501
+        # ^i.e. UNIQUE (recipe_id, tag_id) of the link tables: includes the key, stays as it is # noqa: E501
+    return statements
+
+
+def mirror_statements(table, key):
+    """SQL of the trigger copying writes to `table` to its partitioned copy (during the online copy)."""  # noqa: E501
+    copy = copy_name(table)
+    return [
+        f'''CREATE FUNCTION {table}_mirror()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {copy} WHERE id = OLD.id AND {key} = OLD.{key};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {copy} VALUES (NEW.*) ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END $$''',
+        f'CREATE TRIGGER {table}_mirror AFTER INSERT OR UPDATE OR DELETE ON {table} FOR EACH ROW EXECUTE PROCEDURE {table}_mirror()',  # noqa: E501
+    ]
+
+
+def copy_batch_statement(table):
+    """SQL copying the next batch of rows (after ID %s, at most %s), returns (last ID, rows)."""  # noqa: E501
+    return (
+        f'WITH batch AS (SELECT * FROM {table} WHERE id > %s ORDER BY id LIMIT %s FOR SHARE), '  # noqa: E501
+        # ^FOR SHARE: an update of these rows waits for the batch >> its trigger then replaces the copied row # noqa: E501
+        f'copied AS (INSERT INTO {copy_name(table)} SELECT * FROM batch ON CONFLICT DO NOTHING) '  # noqa: E501
+        # ^Conflict: the trigger copied the row already (newer or the same) # noqa: E501
+        f'SELECT max(id), count(*) FROM batch'
+    )
+
+
+def swap_statements(cursor, table, table_indexes):
+    """SQL replacing `table` by its partitioned copy (names & sequence included)."""  # noqa: E501
+    copy = copy_name(table)
+    cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+    sequence = cursor.fetchone()[0]
+    statements = [
+        f'DROP TRIGGER IF EXISTS {table}_mirror ON {table}',
+        f'DROP FUNCTION IF EXISTS {table}_mirror()',
+    ]
+    if sequence:
+        statements.append(f'ALTER SEQUENCE {sequence} OWNED BY {copy}.id')  # Else dropped with the table # noqa: E501
+    statements += [
+        f'DROP TABLE {table}',
+        f'ALTER TABLE {copy} RENAME TO {table}',
+        f'ALTER TABLE {table} RENAME CONSTRAINT {copy}_pkey TO {table}_pkey',
+    ]
+    statements += [f'ALTER INDEX {name}_p RENAME TO {name}' for name, _, _ in table_indexes]  # noqa: E501
+    return statements
+
+
+def execute(cursor, statements):
+    for statement in statements:
+        cursor.execute(statement)
+
+
+def convert(connection, table, key, partitions):
+    """Partition `table` in one go (the caller's transaction, i.e. a migration)."""  # noqa: E501
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return False
+        cursor.execute(f'LOCK TABLE {table} IN SHARE MODE')  # Writes wait, reads go on # noqa: E501
+        table_indexes = indexes(cursor, table)
+        execute(cursor, create_statements(table, key, partitions, table_indexes))  # noqa: E501
+        cursor.execute(f'INSERT INTO {copy_name(table)} SELECT * FROM {table}')  # noqa: E501
+        execute(cursor, swap_statements(cursor, table, table_indexes))
+    return True
+
+
+def convert_online(connection, table, key, partitions, batch_size=10000, pause=0, progress=None):  # noqa: E501
+    """Partition `table` while it is in use: mirror writes, copy in batches, swap."""  # noqa: E501
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return False
+        table_indexes = indexes(cursor, table)
+        with transaction.atomic(using=connection.alias):
+            cursor.execute(f'DROP TABLE IF EXISTS {copy_name(table)}')  # Leftover of an interrupted run # noqa: E501
+            cursor.execute(f'DROP FUNCTION IF EXISTS {table}_mirror() CASCADE')  # noqa: E501
+            execute(cursor, create_statements(table, key, partitions, table_indexes))  # noqa: E501
+            execute(cursor, mirror_statements(table, key))
+            # ^From here on every write to the table reaches the copy too
+
+        last_id, copied = 0, 0
+        while True:
+            with transaction.atomic(using=connection.alias):  # One short transaction per batch # noqa: E501
+                cursor.execute(copy_batch_statement(table), [last_id, batch_size])  # noqa: E501
+                batch_last_id, rows = cursor.fetchone()
+            if not rows:
+                break
+            last_id, copied = batch_last_id, copied + rows
+            if progress:
+                progress(table, copied)
+            time.sleep(pause)  # Leaves I/O to the app
+
+        with transaction.atomic(using=connection.alias):
+            cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+            # ^Only for the renames, requests wait a few milliseconds
+            execute(cursor, swap_statements(cursor, table, table_indexes))
+    return True
@@ -0,0 +1,225 @@
+"""
+Copy-on-write friendly preloading in the uWSGI master (see app/wsgi.py)
+
+uWSGI imports app.wsgi in the master and forks the workers from it, so
+the workers share the master's memory pages until they write to them.
+Two things used to make every worker copy most of those pages anyway:
+
+- caches filled lazily by the first requests (URL resolvers, model
+  `_meta`, serializer plans, templates, the schema, Pillow plugins) were
+  built once PER worker, in private memory
+- the garbage collector writes to the header of every object it visits,
+  so the first collection in a worker dirtied every page holding objects
+  inherited from the master
+
+`preload()` (master, before fork) fills those caches, then moves every
+object into the GC's permanent generation (`gc.freeze()`), which
+collections never visit. `after_fork()` (every worker) re-enables the GC &
+makes sure no database connection of the master is used by a worker.
+
+Measure with `manage.py worker_memory` (running workers) or
+`manage.py worker_memory --compare` (forks workers with & without).
+`--compare 4`, 20 rounds of sample requests per worker, on CPython 3.9
+(the image's version) with the pinned requirements, glibc Linux rather
+than the image's Alpine (musl's allocator may shift the numbers):
+
+    per worker       RSS        USS (private)   shared
+    plain            61.9 MiB   30.6 MiB        31.4 MiB
+    preloaded        62.4 MiB   13.9 MiB        48.5 MiB
+
+4 workers: 122 MiB >> 55 MiB of private memory, preloading takes ~350ms
+once in the master. RSS hardly changes (it counts shared pages too), so
+`reload-on-rss` limits don't need to change either.
+"""
+
+import gc
+import json
+import mimetypes
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.template.loader import get_template
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.urls import get_resolver
+
+from rest_framework import serializers
+
+from core import schema, uwsgi
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
+
+
+PROJECT_APPS = ('core', 'recipe', 'user')
+TEMPLATES = ['admin/login.html', 'admin/index.html', 'rest_framework/api.html']  # noqa: E501
+
+_inherited_connections = []
+
+
+def project_serializers(base=serializers.BaseSerializer):
+    """Serializer classes defined in this project (not DRF's own)."""
+    for subclass in base.__subclasses__():
+        if subclass.__module__.split('.')[0] in PROJECT_APPS:
+            yield subclass
+        yield from project_serializers(subclass)
+
+
+def warm_up():
+    """Fill the caches the first requests of every worker would fill."""
+    get_resolver().reverse_dict  # Imports every view, compiles every URL pattern # noqa: E501
+    for model in apps.get_models():
+        model._meta.get_fields()  # Relation tree & field caches
+
+    for serializer_class in set(project_serializers()):
+        try:
+            serializer_class().fields  # Field objects, model field info
+        except Exception:  # Needs arguments >> built on first use instead
+            pass
+
+    from recipe.serializers import RecipeValuesSerializer
+    RecipeValuesSerializer.compile()
+
+    schema.get_schema()
+    for name in TEMPLATES:
+        get_template(name)  # Cached template loader (DEBUG off)
+    mimetypes.init()  # Reads /etc/mime.types (media & static responses)
+    if Image is not None:
+        Image.init()  # Imports every Pillow image plugin
+
+
+def freeze():
+    """Keep the objects alive so far out of every future collection."""
+    gc.collect()
+    gc.freeze()
+
+
+def under_uwsgi_master():
+    """app.wsgi is imported by the uWSGI master (workers are forked from it)."""  # noqa: E501
+    return uwsgi.uwsgi_api is not None and not uwsgi.uwsgi_api.opt.get('lazy-apps')  # noqa: E501
+    # ^`lazy-apps` >> every worker imports the app itself, nothing to share
+
+
+def preload():
+    """Master, before the workers are forked."""
+    warm_up()
+    connections.close_all()  # A connection must never be shared by processes
+    freeze()
+
+
+def after_fork():
+    """Every worker, right after the fork."""
+    for connection in connections.all():
+        if connection.connection is not None:
+            _inherited_connections.append(connection.connection)
+            # ^Kept (never closed): closing it would end the master's session on the shared socket # noqa: E501
+            connection.connection = None  # Next query opens its own connection # noqa: E501
+    gc.enable()
+
+
+def install():
+    """Preload the app in the uWSGI master (app/wsgi.py disabled the GC)."""
+    if not under_uwsgi_master():
+        return
+    if not settings.PRELOAD_APP:
+        gc.enable()
+        return
+
+    from uwsgidecorators import postfork
+    postfork(after_fork)
+    preload()
+
+
+# Measurements ---------------------------------------------------------------
+
+
+MEASURE_REQUESTS = [
+    ('get', '/api/schema/', {'format': 'json'}),
+    ('get', '/api/recipe/recipes/', {}),  # 401 (DRF, authentication)
+    ('post', '/api/user/token/', {}),  # 400 (parsers, serializer validation)
+    ('get', '/admin/login/', {}),  # Template rendering
+]
+
+
+def memory_usage(pid='self'):
+    """{rss, uss, shared} in bytes (/proc/<pid>/smaps_rollup)."""
+    totals = {}
+    for name in ('smaps_rollup', 'smaps'):  # smaps_rollup: Linux >= 4.14
+        try:
+            with open(f'/proc/{pid}/{name}') as smaps:
+                for line in smaps:
+                    key, _, value = line.partition(':')
+                    if value.strip().endswith('kB'):
+                        totals[key] = totals.get(key, 0) + int(value.split()[0]) * 1024  # noqa: E501
+            break
+        except OSError:
+            continue
+
+    uss = totals.get('Private_Clean', 0) + totals.get('Private_Dirty', 0)
+    return {
+        'rss': totals.get('Rss', 0),
+        'uss': uss,  # Only in this process (what a worker really costs)
+        'shared': totals.get('Rss', 0) - uss,
+    }
+
+
+def serve_and_measure(rounds):
+    """Worker: serve the sample requests, collect garbage, report memory."""
+    gc.enable()
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    for _ in range(rounds):
+        for method, path, data in MEASURE_REQUESTS:
+            response = handler(getattr(factory, method)(path, data).environ, lambda status, headers: None)  # noqa: E501
+            b''.join(response)
+            response.close()
+    gc.collect()  # What every worker does sooner or later
+    return memory_usage()
+
+
+def fork_workers(count, rounds):
+    """Fork `count` workers (like uWSGI), memory of each after serving."""
+    results = []
+    for _ in range(count):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # Worker
+            try:
+                os.close(read_end)
+                with os.fdopen(write_end, 'w') as pipe:
+                    json.dump(serve_and_measure(rounds), pipe)
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as pipe:
+            results.append(json.load(pipe))
+        os.waitpid(pid, 0)
+    return results
+
+
+def compare(workers=4, rounds=20):
+    """{mode: [memory of each worker]} without & with preloading."""
+    results = {}
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        connections.close_all()
+        gc.collect()
+        results['plain'] = fork_workers(workers, rounds)
+
+        start = time.perf_counter()
+        warm_up()
+        connections.close_all()
+        gc.disable()
+        freeze()
+        preload_seconds = time.perf_counter() - start
+        try:
+            results['preloaded'] = fork_workers(workers, rounds)
+        finally:
+            gc.unfreeze()
+            gc.enable()
+    return results, preload_seconds
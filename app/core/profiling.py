@@ -0,0 +1,174 @@
+"""
+On-demand profiling of a single request (staff only)
+
+Send `X-Profile: inline` (or `?profile=inline`) with a staff user's token to
+get a text report (cProfile + SQL) instead of the normal response, or
+`X-Profile: download` to get the normal response plus an `X-Profile-URL`
+header pointing at the stored `.prof` file (open with snakeviz / pstats).
+Stored profiles are kept in PROFILE_ROOT (not served by nginx), at most
+PROFILE_MAX_STORED of them, for PROFILE_MAX_AGE.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+
+MODES = ('inline', 'download')
+
+
+class SQLRecorder:
+    """Database execute wrapper keeping every query & its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': [str(param) for param in params or []] if not many else '<many>',  # noqa: E501
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+                'alias': context['connection'].alias,
+            })
+
+
+def requested_mode(request):
+    """Profiling mode asked for by the request (None >> not profiling)."""
+    mode = request.headers.get('X-Profile') or request.GET.get('profile')
+    if not mode:
+        return None
+    return mode if mode in MODES else 'inline'
+
+
+def staff_user(request):
+    """Return the staff user behind the request's token (None if not staff)."""
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+
+    token = Token.objects.select_related('user').filter(key=key.strip()).first()  # noqa: E501
+    if token is None or not (token.user.is_active and token.user.is_staff):
+        return None
+    return token.user
+
+
+def profile(get_response, request):
+    """Run the request under cProfile, recording the SQL it makes."""
+    profiler = cProfile.Profile()
+    recorder = SQLRecorder()
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+    return response, profiler, recorder.queries, elapsed
+
+
+def text_report(request, response, profiler, queries, elapsed):
+    """Human readable report: timings, hottest functions & every query."""
+    output = io.StringIO()
+    sql_ms = sum(query['ms'] for query in queries)
+    output.write(
+        f'{request.method} {request.get_full_path()} >> {response.status_code}\n'  # noqa: E501
+        f'Total {elapsed * 1000:.1f}ms, {len(queries)} queries in {sql_ms:.1f}ms\n\n'  # noqa: E501
+    )
+
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(settings.PROFILE_TOP_FUNCTIONS)  # noqa: E501
+
+    output.write('\nSQL\n')
+    for number, query in enumerate(queries, start=1):
+        output.write(f"{number}. [{query['alias']}] {query['ms']}ms {query['sql']} {query['params']}\n")  # noqa: E501
+
+    return output.getvalue()
+
+
+def prune():
+    """Delete profiles older than PROFILE_MAX_AGE & beyond the newest PROFILE_MAX_STORED."""  # noqa: E501
+    profiles = []
+    for entry in os.scandir(settings.PROFILE_ROOT):
+        if entry.name.endswith('.prof'):
+            try:
+                profiles.append((entry.stat().st_mtime_ns, entry.name[:-len('.prof')]))  # noqa: E501
+            except FileNotFoundError:
+                continue  # Pruned by another worker meanwhile
+    profiles.sort(reverse=True)  # Newest first
+
+    oldest = (time.time() - settings.PROFILE_MAX_AGE) * 1e9
+    for number, (modified, profile_id) in enumerate(profiles):
+        if number >= settings.PROFILE_MAX_STORED or modified < oldest:
+            for extension in ('prof', 'sql.json'):
+                try:
+                    os.remove(os.path.join(settings.PROFILE_ROOT, f'{profile_id}.{extension}'))  # noqa: E501
+                except FileNotFoundError:
+                    pass
+
+
+def store(profiler, queries):
+    """Save the profile (+ SQL) and return its ID."""
+    profile_id = str(uuid.uuid4())
+    os.makedirs(settings.PROFILE_ROOT, exist_ok=True)
+
+    with open(os.path.join(settings.PROFILE_ROOT, f'{profile_id}.sql.json'), 'w') as sql_file:  # noqa: E501
+        json.dump(queries, sql_file, indent=2)
+    profiler.dump_stats(os.path.join(settings.PROFILE_ROOT, f'{profile_id}.prof'))  # noqa: E501
+    # ^.prof last: prune() lists profiles by it, no `.sql.json` is left behind
+
+    prune()  # The directory doesn't grow without limit
+    return profile_id
+
+
+def profile_request(get_response, request, mode):
+    """Profile the request and return the response for `mode`."""
+    response, profiler, queries, elapsed = profile(get_response, request)
+
+    if mode == 'download':
+        profile_id = store(profiler, queries)
+        response['X-Profile-URL'] = request.build_absolute_uri(
+            reverse('profile-download', args=[profile_id])
+        )
+        response['X-Profile-SQL-URL'] = response['X-Profile-URL'] + '?sql=1'
+        return response
+
+    report = HttpResponse(
+        text_report(request, response, profiler, queries, elapsed),
+        content_type='text/plain; charset=utf-8',
+    )
+    report['X-Profiled-Status'] = str(response.status_code)
+    return report
+
+
+def profile_download_view(request, profile_id):
+    """Download a stored profile (staff only)."""
+    if staff_user(request) is None:
+        raise Http404  # Don't reveal that profiles exist
+
+    extension = 'sql.json' if request.GET.get('sql') else 'prof'
+    path = os.path.join(settings.PROFILE_ROOT, f'{profile_id}.{extension}')
+    if not os.path.exists(path):
+        raise Http404
+
+    return FileResponse(open(path, 'rb'), as_attachment=True)
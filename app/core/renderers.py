@@ -0,0 +1,123 @@
+"""
+Renderers & parsers for the API
+
+Fast JSON: drop-in replacements for DRF's JSONRenderer / JSONParser, selected
+through REST_FRAMEWORK in settings (API_JSON=fast). orjson is optional:
+without it (or for anything orjson can't produce byte for byte, i.e.
+`?indent=4` for the browsable API) they fall back to DRF's stdlib
+implementation.
+
+MessagePack: binary alternative to JSON for clients sending
+`Accept: application/msgpack` / `Content-Type: application/msgpack`.
+"""
+
+from decimal import Decimal
+
+import msgpack
+from django.db.models.fields.files import FieldFile
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional >> stdlib json is used
+    orjson = None
+
+
+UTF8 = ('utf-8', 'utf8')
+
+_encoder = JSONEncoder()
+# ^DRF's own encoder for what orjson doesn't handle the same way (Decimal, datetime, QuerySet...) # noqa: E501
+
+
+def _default(obj):
+    return _encoder.default(obj)
+
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    # ^datetime >> `_default` (DRF trims microseconds to milliseconds & writes UTC as `Z`) # noqa: E501
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer producing the same bytes, several times faster.
+
+    Only difference: NaN / Infinity floats become `null` instead of an error.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (
+            orjson is None
+            or indent is not None
+            or not self.compact
+            or self.ensure_ascii
+        ):
+            return super().render(data, accepted_media_type, renderer_context)  # noqa: E501
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        except orjson.JSONEncodeError:  # i.e. integers above 64 bit
+            return super().render(data, accepted_media_type, renderer_context)  # noqa: E501
+
+        # Same escaping as DRF (U+2028 / U+2029 are line breaks in JavaScript)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')  # noqa: E501
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser parsing UTF-8 bodies with orjson."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower() not in UTF8 or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())  # NaN / Infinity are rejected (like strict DRF) # noqa: E501
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+# MessagePack -----------------------------------------------------------------
+
+
+def _msgpack_default(obj):
+    """Encoding rules for values MessagePack has no type for."""
+    if isinstance(obj, Decimal):
+        return str(obj)  # Exact, same as the JSON API (DecimalField >> '5.50'), NOT a lossy float # noqa: E501
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None  # Image >> its URL (serializers already give absolute URLs) # noqa: E501
+    return _encoder.default(obj)  # datetime >> ISO 8601 string, UUID >> string... like JSON # noqa: E501
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render responses as MessagePack (same structure as the JSON API)."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)  # noqa: E501
+
+
+class MessagePackParser(BaseParser):
+    """Parse MessagePack request bodies (file uploads stay multipart)."""
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -0,0 +1,123 @@
+"""
+Pre-generated OpenAPI schema (instead of introspecting every view on each request)
+"""
+
+import functools
+import hashlib
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.views import View
+
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+from core.compression import precompress_file
+
+
+FORMATS = {
+    # format: (file name, content type, renderer)
+    'yaml': ('schema.yml', 'application/vnd.oai.openapi', OpenApiYamlRenderer),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json', OpenApiJsonRenderer),  # noqa: E501
+}
+VERSION_FILE = 'schema.version'
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Return an identifier of the deployed code (the schema changes only when this does)."""  # noqa: E501
+    version = os.environ.get('APP_VERSION')  # i.e. Git SHA passed in at build time
+    if version:
+        return version
+
+    # Fallback >> Hash of every Python source file of the project
+    digest = hashlib.sha256()
+    for root, dirs, files in sorted(os.walk(settings.BASE_DIR)):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+
+    return digest.hexdigest()[:16]
+
+
+def generate_schema():
+    """Introspect the API and return the rendered schema for every format."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+
+    return {
+        fmt: renderer().render(schema, renderer_context={})
+        for fmt, (_, _, renderer) in FORMATS.items()
+    }
+
+
+def read_schema_files(directory=None):
+    """Return the schema files written for the current code version (None if stale / missing)."""  # noqa: E501
+    directory = directory or settings.SCHEMA_ROOT
+    try:
+        with open(os.path.join(directory, VERSION_FILE)) as version_file:
+            if version_file.read().strip() != code_version():
+                return None  # Written by an older version of the code
+
+        contents = {}
+        for fmt, (file_name, _, _) in FORMATS.items():
+            with open(os.path.join(directory, file_name), 'rb') as schema_file:
+                contents[fmt] = schema_file.read()
+        return contents
+    except OSError:
+        return None
+
+
+def write_schema_files(contents, directory=None):
+    """Write every format + the code version they were generated from."""
+    directory = directory or settings.SCHEMA_ROOT
+    os.makedirs(directory, exist_ok=True)
+
+    for fmt, (file_name, _, _) in FORMATS.items():
+        path = os.path.join(directory, file_name)
+        with open(path + '.tmp', 'wb') as schema_file:
+            schema_file.write(contents[fmt])
+        os.replace(path + '.tmp', path)  # Atomic >> nginx never serves a half written file # noqa: E501
+        precompress_file(path)  # .gz / .br siblings sent by nginx (`gzip_static`)  # noqa: E501
+
+    with open(os.path.join(directory, VERSION_FILE), 'w') as version_file:
+        version_file.write(code_version())  # Written last, marks the schema files as complete # noqa: E501
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema():
+    """Return {format: (content, etag)}, loaded once per process."""
+    contents = read_schema_files() or generate_schema()
+    # ^Generate in memory only if the build step didn't run (i.e. Development Server)
+
+    return {
+        fmt: (content, '"%s"' % hashlib.sha256(content).hexdigest()[:32])
+        for fmt, content in contents.items()
+    }
+
+
+class CachedSchemaView(View):
+    """
+    OpenApi3 schema for this API (pre-generated).
+
+    - YAML: application/vnd.oai.openapi (default)
+    - JSON: application/vnd.oai.openapi+json (`?format=json`)
+    """
+
+    def get(self, request, *args, **kwargs):
+        fmt = 'json' if request.GET.get('format') == 'json' else 'yaml'
+        content, etag = get_schema()[fmt]
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()  # Swagger UI reloads cost nothing
+        else:
+            response = HttpResponse(content, content_type=FORMATS[fmt][1])
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'  # Clients may store it, but must revalidate (ETag) # noqa: E501
+        return response
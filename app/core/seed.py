@@ -0,0 +1,221 @@
+"""
+Fast generation of large, realistic datasets (used by `manage.py seed_data`)
+
+- Deterministic: the same --seed always produces the same data.
+- Tags & ingredients are picked with Zipfian popularity (a few are in most recipes).
+- Every user shares ONE precomputed password hash (no PBKDF2 per user).
+- Rows are written in large batches, with COPY on PostgreSQL.
+- IDs are assigned up front, so worker processes can each write a range of users
+  (and their recipes) without talking to each other.
+"""
+
+import io
+import itertools
+import random
+
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from core.models import User, Recipe, Tag, Ingredient
+
+
+EMAIL = 'seed{seed}-user{number}@example.com'
+
+TAG_NAMES = [
+    'Dinner', 'Lunch', 'Breakfast', 'Quick', 'Healthy', 'Vegetarian', 'Vegan',
+    'Dessert', 'Snack', 'Comfort Food', 'Gluten Free', 'Spicy', 'Italian',
+    'Mexican', 'Indian', 'Chinese', 'Thai', 'Japanese', 'French', 'Greek',
+    'Low Carb', 'High Protein', 'Budget', 'Family', 'Party', 'Baking', 'Grill',
+    'Slow Cooker', 'One Pot', 'Salad', 'Soup', 'Seafood', 'Chicken', 'Beef',
+]
+INGREDIENT_NAMES = [
+    'Salt', 'Pepper', 'Olive Oil', 'Garlic', 'Onion', 'Butter', 'Sugar',
+    'Flour', 'Eggs', 'Milk', 'Tomato', 'Lemon', 'Rice', 'Chicken Breast',
+    'Carrot', 'Potato', 'Parsley', 'Basil', 'Cheese', 'Cream', 'Ginger',
+    'Soy Sauce', 'Beef', 'Pasta', 'Cumin', 'Paprika', 'Honey', 'Vinegar',
+    'Mushrooms', 'Spinach', 'Bell Pepper', 'Chili', 'Coriander', 'Yogurt',
+]
+DISHES = ['Stew', 'Bake', 'Salad', 'Curry', 'Soup', 'Pie', 'Stir Fry', 'Pasta', 'Roast']  # noqa: E501
+
+
+def vocabulary(names, size):
+    """Pad the well known names up to `size` (most popular first)."""
+    return names[:size] + [
+        f'{names[i % len(names)]} {i // len(names) + 1}'
+        for i in range(len(names), size)
+    ]
+
+
+def zipf_cum_weights(size, exponent):
+    """Cumulative weights where item k is picked proportionally to 1 / k^exponent."""  # noqa: E501
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, size + 1)))  # noqa: E501
+
+
+def recipes_per_user(seed, users, recipes):
+    """Split `recipes` between `users` (skewed: a few users own a lot)."""
+    rng = random.Random(f'{seed}-plan')
+    weights = [rng.paretovariate(1.5) for _ in range(users)]
+    total = sum(weights)
+    counts = [int(recipes * weight / total) for weight in weights]
+    for index in range(recipes - sum(counts)):  # Rounding leftovers
+        counts[index % users] += 1
+    return counts
+
+
+class Plan:
+    """Everything a worker needs to write its range of users independently."""
+
+    def __init__(self, seed, users, recipes, tags, ingredients, exponent, password_hash):  # noqa: E501
+        self.seed = seed
+        self.users = users
+        self.tags = vocabulary(TAG_NAMES, tags)
+        self.ingredients = vocabulary(INGREDIENT_NAMES, ingredients)
+        self.tag_weights = zipf_cum_weights(tags, exponent)
+        self.ingredient_weights = zipf_cum_weights(ingredients, exponent)
+        self.password_hash = password_hash
+        self.counts = recipes_per_user(seed, users, recipes)
+        self.recipe_offsets = [0, *itertools.accumulate(self.counts)]
+
+        def next_id(model):
+            return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1  # noqa: E501
+
+        # First free ID of each table. Every user gets a fixed window of tag /
+        # ingredient IDs (one per vocabulary entry, gaps are fine).
+        self.user_start = next_id(User)
+        self.recipe_start = next_id(Recipe)
+        self.tag_start = next_id(Tag)
+        self.ingredient_start = next_id(Ingredient)
+
+    def chunks(self, size):
+        """User ranges (start, end) for the workers."""
+        return [(start, min(start + size, self.users)) for start in range(0, self.users, size)]  # noqa: E501
+
+
+class Writer:
+    """Buffer rows per table and write them in batches."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.rows_written = 0
+
+    def add(self, table, columns, row):
+        rows = self.buffers.setdefault((table, columns), [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(table, columns)
+
+    def flush(self, table=None, columns=None):
+        keys = [(table, columns)] if table else list(self.buffers)
+        for key in keys:
+            rows = self.buffers.pop(key, [])
+            if rows:
+                write_rows(key[0], key[1], rows)
+                self.rows_written += len(rows)
+
+
+def write_rows(table, columns, rows):
+    """Insert rows, with COPY on PostgreSQL (executemany elsewhere)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write('\t'.join(_copy_value(value) for value in row))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY {table} ({", ".join(columns)}) FROM STDIN',
+                buffer,
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {table} ({", ".join(columns)}) '
+                f'VALUES ({", ".join(["%s"] * len(columns))})',
+                rows,
+            )
+
+
+def _copy_value(value):
+    """Value in COPY text format."""
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')  # noqa: E501
+
+
+def _columns(model, *names):
+    """Table & column names of a model (so renamed fields don't break the seeder)."""  # noqa: E501
+    return model._meta.db_table, tuple(model._meta.get_field(name).column for name in names)  # noqa: E501
+
+
+USER_TABLE = _columns(User, 'id', 'password', 'is_superuser', 'email', 'name', 'is_active', 'is_staff', 'shard', 'moving')  # noqa: E501
+RECIPE_TABLE = _columns(Recipe, 'id', 'user', 'title', 'description', 'time_minutes', 'price', 'link', 'image')  # noqa: E501
+TAG_TABLE = _columns(Tag, 'id', 'user', 'name')
+INGREDIENT_TABLE = _columns(Ingredient, 'id', 'user', 'name')
+RECIPE_TAGS_TABLE = (Recipe.tags.through._meta.db_table, ('recipe_id', 'tag_id'))  # noqa: E501
+RECIPE_INGREDIENTS_TABLE = (Recipe.ingredients.through._meta.db_table, ('recipe_id', 'ingredient_id'))  # noqa: E501
+
+
+def seed_users(plan, start, end, batch_size):
+    """Write users [start, end) with their recipes, tags & ingredients. Returns rows written."""  # noqa: E501
+    writer = Writer(batch_size)
+    tag_window = len(plan.tags)
+    ingredient_window = len(plan.ingredients)
+
+    for number in range(start, end):
+        rng = random.Random(f'{plan.seed}-{number}')  # Same user >> same data, whatever the chunking # noqa: E501
+        user_id = plan.user_start + number
+        writer.add(*USER_TABLE, (
+            user_id, plan.password_hash, False,
+            EMAIL.format(seed=plan.seed, number=number), f'User {number}',
+            True, False, '', False,  # Seeded on `default`, `rebalance_shards` spreads them over the shards # noqa: E501
+        ))
+
+        used_tags, used_ingredients = set(), set()
+        recipe_id = plan.recipe_start + plan.recipe_offsets[number]
+        for recipe_id in range(recipe_id, recipe_id + plan.counts[number]):
+            tags = set(rng.choices(range(tag_window), cum_weights=plan.tag_weights, k=rng.randint(1, 4)))  # noqa: E501
+            ingredients = set(rng.choices(range(ingredient_window), cum_weights=plan.ingredient_weights, k=rng.randint(3, 10)))  # noqa: E501
+            used_tags |= tags
+            used_ingredients |= ingredients
+
+            main = plan.ingredients[min(ingredients)]  # Most popular one
+            writer.add(*RECIPE_TABLE, (
+                recipe_id, user_id, f'{main} {rng.choice(DISHES)}', '',
+                rng.randint(5, 180), f'{rng.randint(100, 5000) / 100:.2f}', '', None,  # noqa: E501
+            ))
+            for tag in tags:
+                writer.add(*RECIPE_TAGS_TABLE, (recipe_id, plan.tag_start + number * tag_window + tag))  # noqa: E501
+            for ingredient in ingredients:
+                writer.add(*RECIPE_INGREDIENTS_TABLE, (recipe_id, plan.ingredient_start + number * ingredient_window + ingredient))  # noqa: E501
+
+        # Tags / ingredients are per user >> only create the ones this user's recipes use # noqa: E501
+        for tag in sorted(used_tags):
+            writer.add(*TAG_TABLE, (plan.tag_start + number * tag_window + tag, user_id, plan.tags[tag]))  # noqa: E501
+        for ingredient in sorted(used_ingredients):
+            writer.add(*INGREDIENT_TABLE, (plan.ingredient_start + number * ingredient_window + ingredient, user_id, plan.ingredients[ingredient]))  # noqa: E501
+
+    writer.flush()
+    return writer.rows_written
+
+
+def seed_chunk(args):
+    """Process pool entry point."""
+    plan, start, end, batch_size = args
+    try:
+        with transaction.atomic():
+            # ^Foreign keys are checked at commit >> batches can be written in any order # noqa: E501
+            # and a failed chunk leaves nothing behind
+            return seed_users(plan, start, end, batch_size)
+    finally:
+        connections.close_all()
+
+
+def reset_sequences():
+    """Move the ID sequences past the explicitly assigned IDs."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [User, Recipe, Tag, Ingredient])  # noqa: E501
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
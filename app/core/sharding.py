@@ -0,0 +1,327 @@
+"""
+User shards: every user's recipes, tags & ingredients live on one database
+
+Shards are configured with DB_SHARDS (aliases `shard_1`, `shard_2`, ...,
+see settings). Users, tokens, sessions & the admin tables stay on `default`.
+
+- placement: a consistent hash ring of the shard aliases (SHARD_VIRTUAL_NODES
+  points each) maps a user ID to a shard. Adding a shard only moves the
+  users whose points it takes over (~1/N of them), not almost everyone
+  like `user_id % N` would
+- location: `User.shard` records where a user's data is right now (set
+  when the user is created, blank >> `default`, i.e. data from before
+  sharding). The ring only says where it SHOULD be, `manage.py
+  rebalance_shards` moves the users for which the two differ (their writes
+  are refused meanwhile, see `move_user()`)
+- routing: `ShardRouter` (core/db_routers.py) sends the sharded models to
+  the shard of the request's user (`use_shard()` / `set_shard()`, set by
+  the recipe views) or of the instance they belong to
+- IDs: each shard hands out IDs from its own range, `<shard number> << 40`
+  onwards (`reserve_id_range()`, after `migrate`), so IDs are unique across
+  shards & say which shard created the row. Moved rows keep their IDs
+  (stable API URLs). The ranges stay below 2 ** 53 (JSON / JavaScript safe
+  integers) up to shard 8191
+- admin: one shard at a time, counts & lookups by ID ask every shard at
+  once (`fan_out()`)
+"""
+
+import bisect
+import contextvars
+import functools
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Count, Max
+
+from core.models import Ingredient, Recipe, Tag
+
+
+SHARD_ID_BITS = 40  # IDs per shard (~10 ** 12)
+
+SHARDED_MODELS = {
+    'core.recipe',
+    'core.tag',
+    'core.ingredient',
+    'core.recipe_tags',  # Links of a user's recipes to the user's tags / ingredients # noqa: E501
+    'core.recipe_ingredients',
+}
+
+_shard_alias = contextvars.ContextVar('shard_alias', default=None)
+# ^Shard of the current request's user. None >> route by instance (or `default`) # noqa: E501
+
+
+class ShardMoveError(Exception):
+    """A user's data couldn't be moved (nothing was changed)."""
+
+
+# Placement ------------------------------------------------------------------
+
+
+def hash64(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')  # noqa: E501
+
+
+class HashRing:
+    """Consistent hash ring, a key belongs to the first node point after its hash."""  # noqa: E501
+
+    def __init__(self, nodes, virtual_nodes=64):
+        self.points = sorted(
+            (hash64(f'{node}#{number}'), node)
+            for node in nodes
+            for number in range(virtual_nodes)
+        )
+        # ^Many points per node >> every node gets about the same share of the keys # noqa: E501
+        self.hashes = [point for point, _ in self.points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self.hashes, hash64(key)) % len(self.points)
+        return self.points[index][1]
+
+
+@functools.lru_cache(maxsize=8)
+def get_ring(nodes, virtual_nodes):
+    return HashRing(nodes, virtual_nodes)
+
+
+def ring_shard(user_id):
+    """Shard the user's data belongs on (None without shards)."""
+    if not settings.DATABASE_SHARDS:
+        return None
+    return get_ring(tuple(settings.DATABASE_SHARDS), settings.SHARD_VIRTUAL_NODES).node_for(user_id)  # noqa: E501
+
+
+def user_shard(user):
+    """Alias of the database holding the user's data right now."""
+    return getattr(user, 'shard', '') or 'default'  # Anonymous users: `default` (nothing of theirs anywhere) # noqa: E501
+
+
+def all_aliases():
+    """Every database holding sharded data (`default`: data of unmoved users)."""  # noqa: E501
+    return ['default', *settings.DATABASE_SHARDS]
+
+
+# Routing --------------------------------------------------------------------
+
+
+@contextmanager
+def use_shard(alias):
+    """Route the sharded models to `alias` inside the block."""
+    token = _shard_alias.set(alias)
+    try:
+        yield
+    finally:
+        _shard_alias.reset(token)
+
+
+def set_shard(alias):
+    """Route the sharded models to `alias` until `reset_shard` is called with the returned token."""  # noqa: E501
+    return _shard_alias.set(alias)
+
+
+def reset_shard(token):
+    """Undo `set_shard`."""
+    _shard_alias.reset(token)
+
+
+def current_shard():
+    return _shard_alias.get()
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+# Signals (core/apps.py) -----------------------------------------------------
+
+
+def assign_shard(sender, instance, created, raw=False, using=None, **kwargs):
+    """`post_save` of User: place a new user (the ring needs its ID)."""
+    if created and not raw and not instance.shard and settings.DATABASE_SHARDS:  # noqa: E501
+        instance.shard = ring_shard(instance.pk)
+        sender._default_manager.using(using).filter(pk=instance.pk).update(shard=instance.shard)  # noqa: E501
+
+
+def delete_user_data(sender, instance, using=None, **kwargs):
+    """`pre_delete` of User: the cascade only sees the user's database."""
+    alias = user_shard(instance)
+    if alias != using:
+        for model in (Recipe, Tag, Ingredient):  # Links go with them (cascade on the shard) # noqa: E501
+            model._base_manager.using(alias).filter(user_id=instance.pk).delete()  # noqa: E501
+
+
+def reserve_id_range(sender=None, using='default', **kwargs):
+    """`post_migrate`: new rows of a shard get IDs from the shard's own range."""  # noqa: E501
+    if using not in settings.DATABASE_SHARDS:
+        return
+    start = id_range(using)[0]
+    connection = connections[using]
+    for model in (Recipe, Tag, Ingredient):
+        if (last_id(connection, model._meta.db_table) or 0) < start:
+            set_last_id(connection, model._meta.db_table, start)
+
+
+def id_range(alias):
+    """[first, last) ID created by shard `alias` (`default`: the IDs below the shards')."""  # noqa: E501
+    number = 0 if alias == 'default' else int(alias.rpartition('_')[2])
+    return number << SHARD_ID_BITS, (number + 1) << SHARD_ID_BITS
+
+
+def last_id(connection, table):
+    """Last ID handed out by the table's sequence."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])  # noqa: E501
+        else:  # PostgreSQL
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])  # noqa: E501
+            sequence = cursor.fetchone()[0]
+            cursor.execute(f'SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {sequence}')  # noqa: E501
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_last_id(connection, table, value):
+    """Next ID of the table is `value` + 1."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [value, table])  # noqa: E501
+            if not cursor.rowcount:  # No row before the first insert
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, value])  # noqa: E501
+        else:
+            cursor.execute('SELECT setval(pg_get_serial_sequence(%s, %s), %s)', [table, 'id', value])  # noqa: E501
+
+
+# Cross shard queries --------------------------------------------------------
+
+
+def fan_out(function, aliases=None):
+    """{alias: function(alias)}, run on every database at the same time."""
+    aliases = list(aliases or all_aliases())
+    if len(aliases) == 1:
+        return {aliases[0]: function(aliases[0])}
+
+    def run(alias):
+        try:
+            return function(alias)
+        finally:
+            connections[alias].close()  # Connections belong to the pool's thread # noqa: E501
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return dict(zip(aliases, pool.map(run, aliases)))
+        # ^Slowest shard, not the sum of all of them
+
+
+# Rebalancing ----------------------------------------------------------------
+
+
+def user_data(alias, user_id):
+    """[(queryset, keep IDs)] of the user's rows on `alias`, rows before the links to them."""  # noqa: E501
+    return [
+        (Tag._base_manager.using(alias).filter(user_id=user_id), True),
+        (Ingredient._base_manager.using(alias).filter(user_id=user_id), True),
+        (Recipe._base_manager.using(alias).filter(user_id=user_id), True),
+        (Recipe.tags.through._base_manager.using(alias).filter(recipe__user_id=user_id), False),  # noqa: E501
+        (Recipe.ingredients.through._base_manager.using(alias).filter(recipe__user_id=user_id), False),  # noqa: E501
+    ]
+
+
+def fingerprint(alias, user_id):
+    """(rows, highest ID) of every table, changes when the user adds or deletes something."""  # noqa: E501
+    return [
+        tuple(queryset.aggregate(Count('pk'), Max('pk')).values())
+        for queryset, _ in user_data(alias, user_id)
+    ]
+
+
+def copy_rows(queryset, target, keep_ids, batch_size):
+    """Insert the rows of `queryset` into `target` in batches, return how many."""  # noqa: E501
+    rows = queryset.order_by('pk').iterator(chunk_size=batch_size)
+    copied = 0
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return copied
+        if not keep_ids:
+            for row in batch:
+                row.pk = None  # Links: the target numbers them
+        queryset.model._base_manager.using(target).bulk_create(batch)
+        copied += len(batch)
+
+
+def check_movable(source, target, user_id):
+    """SQLite numbers new rows after the highest ID in the table (whatever its sequence says)."""  # noqa: E501
+    if connections[target].vendor != 'sqlite':
+        return
+    end = id_range(target)[1]
+    for queryset, keep_ids in user_data(source, user_id):
+        highest = queryset.aggregate(Max('pk'))['pk__max'] if keep_ids else None  # noqa: E501
+        if highest is not None and highest >= end:
+            raise ShardMoveError(
+                f'{target} (SQLite) would hand out IDs of a later shard after '
+                f'taking {queryset.model.__name__} {highest}.'
+            )
+
+
+def lock_user(user_id):
+    """The user, its row locked until the transaction on `default` ends (`move_user` waits for it)."""  # noqa: E501
+    return get_user_model()._default_manager.select_for_update().get(pk=user_id)  # noqa: E501
+
+
+def move_user(user, target, batch_size=1000):
+    """
+    Copy the user's data to `target`, switch the user over, delete the old one.
+
+    The user is fenced for the whole move: `User.moving` is set first (once
+    the writes in progress, which hold `lock_user()`, are committed) & the
+    writes after it are refused (the recipe API answers 503, the admin 403)
+    until the switch. Reads keep going to the old copy until then. A row
+    added or deleted behind the fence's back (i.e. a bulk delete in the
+    admin) cancels the move (ShardMoveError, the copy is deleted).
+    """
+    source = user_shard(user)
+    if source == target:
+        return 0
+    check_movable(source, target, user.pk)
+
+    users = get_user_model()._default_manager.filter(pk=user.pk)
+    users.update(moving=True)  # Waits for the row lock of the writes in progress # noqa: E501
+    try:
+        before = fingerprint(source, user.pk)
+        copied = 0
+        with transaction.atomic(using=target):
+            for queryset, keep_ids in user_data(source, user.pk):
+                copied += copy_rows(queryset, target, keep_ids, batch_size)
+        # ^Committed before the switch: the user never points at a shard without its rows # noqa: E501
+
+        if fingerprint(source, user.pk) != before:
+            delete_data(target, user.pk)  # The copy is out of date
+            raise ShardMoveError(f'{user} changed data while it was copied.')
+    except BaseException:
+        users.update(moving=False)
+        raise
+    users.update(shard=target, moving=False)
+    # ^The switch: from now on the user's requests (& writes) go to `target`
+    user.shard = target
+
+    delete_data(source, user.pk)
+    return copied
+
+
+def delete_data(alias, user_id):
+    """Delete the user's rows on `alias` (not the user)."""
+    with transaction.atomic(using=alias):
+        for queryset, keep_ids in user_data(alias, user_id):
+            if keep_ids:
+                queryset.delete()  # Links go with the rows
+
+
+def misplaced_users():
+    """Users whose data isn't on their ring shard (yet)."""
+    for user in get_user_model()._default_manager.order_by('pk').iterator():
+        target = ring_shard(user.pk) or 'default'
+        if user_shard(user) != target:
+            yield user, target
@@ -0,0 +1,292 @@
+"""
+Similar recipes: per user recipe × feature matrices (`/recipes/{id}/similar/`)
+
+Every user has one `SimilarityIndex` (on `default`): a binary sparse matrix
+(SciPy CSR), one row per recipe, one column per tag / ingredient of the
+user, stored as compressed NumPy arrays (`dumps()`, only the row pointers &
+column numbers: every value is 1).
+
+- query: the features shared with a recipe are ONE sparse matrix × vector
+  product over all the user's recipes, Jaccard (shared / union) or cosine
+  (shared / sqrt(size × size)) follow from the row sizes, the top k come
+  from a partial sort. No join over the link tables per request
+- writes: recipe writes & deletes (API & admin), deleted tags /
+  ingredients only mark the user's index `stale` (one UPDATE, no matrix
+  work in the request). `manage.py similarity_index --watch` (started next
+  to the app by scripts/run.sh / uWSGI) rebuilds stale, missing & old
+  indexes from the link tables in the background
+- until then (`fresh_index()` is None): the links of the recipes sharing
+  a feature with the query are read instead (2 queries) & scored the same
+  way. Nothing is built inside a request
+- processes keep the last SIMILARITY_CACHE_USERS indexes they loaded, a
+  changed `version` makes them load the new one
+- the pantry bitsets (core/pantry.py) are derived from the same indexes
+"""
+
+import io
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import db_routers, sharding
+from core.models import Recipe, SimilarityIndex
+
+
+METRICS = ('jaccard', 'cosine')
+
+_loaded = OrderedDict()  # {user ID: (version, RecipeIndex)}, most recently used last # noqa: E501
+_loaded_lock = threading.Lock()
+
+
+def feature_keys(tag_ids=(), ingredient_ids=()):
+    """One number per feature: tags even, ingredients odd (their IDs overlap)."""  # noqa: E501
+    return np.concatenate([
+        np.asarray(tag_ids, dtype=np.int64) * 2,
+        np.asarray(ingredient_ids, dtype=np.int64) * 2 + 1,
+    ])
+
+
+class RecipeIndex:
+    """Binary recipe × feature matrix of one user."""
+
+    def __init__(self, recipe_ids, features, matrix):
+        self.recipe_ids = recipe_ids  # Row >> recipe ID (sorted)
+        self.features = features  # Column >> feature key (sorted)
+        self.matrix = matrix  # CSR, 1 where the recipe has the feature
+        self.version = None  # Of the SimilarityIndex row it was stored as / loaded from # noqa: E501
+
+    @classmethod
+    def from_links(cls, recipes, keys):
+        """Index of the (recipe ID, feature key) pairs (recipes without features are left out)."""  # noqa: E501
+        recipes = np.asarray(recipes, dtype=np.int64)
+        keys = np.asarray(keys, dtype=np.int64)
+        recipe_ids, rows = np.unique(recipes, return_inverse=True)
+        features, columns = np.unique(keys, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+            shape=(len(recipe_ids), len(features)),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return cls(recipe_ids, features, matrix)
+
+    def links(self):
+        """(recipe IDs, feature keys) of every 1 in the matrix."""
+        rows = np.repeat(np.arange(len(self.recipe_ids)), np.diff(self.matrix.indptr))  # noqa: E501
+        return self.recipe_ids[rows], self.features[self.matrix.indices]
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def recipe_features(self, recipe_id):
+        """Feature keys of a recipe (None if it isn't in the index)."""
+        row = np.searchsorted(self.recipe_ids, recipe_id)
+        if row == len(self.recipe_ids) or self.recipe_ids[row] != recipe_id:
+            return None
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return self.features[self.matrix.indices[start:end]]
+
+    def top_k(self, keys, k, metric='jaccard', exclude=None):
+        """[(recipe ID, score)] of the k recipes most similar to the feature `keys`, best first."""  # noqa: E501
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        if not len(keys) or not len(self.recipe_ids) or k < 1:
+            return []
+
+        columns = np.searchsorted(self.features, keys)
+        known = columns < len(self.features)
+        known[known] = self.features[columns[known]] == keys[known]
+        query = np.zeros(len(self.features), dtype=np.int32)
+        query[columns[known]] = 1
+
+        shared = self.matrix @ query  # Features every recipe shares with the query # noqa: E501
+        sizes = np.diff(self.matrix.indptr)
+        if metric == 'cosine':
+            scores = shared / np.sqrt(sizes * len(keys))
+        else:
+            scores = shared / (sizes + len(keys) - shared)  # Jaccard
+            # ^`keys` the index doesn't know (i.e. a new tag) count for the union # noqa: E501
+
+        candidates = np.flatnonzero(shared)
+        if exclude is not None:
+            candidates = candidates[self.recipe_ids[candidates] != exclude]
+        if len(candidates) > k:
+            kth = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]  # noqa: E501
+            candidates = candidates[scores[candidates] >= kth]
+            # ^Partial sort: only the top k (and recipes tied with the k-th) are sorted # noqa: E501
+        order = np.lexsort((-self.recipe_ids[candidates], -scores[candidates]))[:k]  # noqa: E501
+        # ^Best score first, newest recipe first among equal scores
+        best = candidates[order]
+        return list(zip(self.recipe_ids[best].tolist(), scores[best].tolist()))
+
+    def dumps(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            recipe_ids=self.recipe_ids,
+            features=self.features,
+            indptr=self.matrix.indptr,
+            indices=self.matrix.indices,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, data):
+        if not data:  # Row created, first build still running
+            return cls.from_links([], [])
+        with np.load(io.BytesIO(bytes(data)), allow_pickle=False) as arrays:
+            recipe_ids, features = arrays['recipe_ids'], arrays['features']
+            indptr, indices = arrays['indptr'], arrays['indices']
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr),
+            shape=(len(recipe_ids), len(features)),
+        )
+        return cls(recipe_ids, features, matrix)
+
+
+# Database -------------------------------------------------------------------
+
+
+def user_links(user_id, recipes=None):
+    """(recipe IDs, feature keys) of all the user's recipes, or of `recipes` (2 queries, user's shard)."""  # noqa: E501
+    tags = Recipe.tags.through.objects.filter(recipe__user_id=user_id)
+    ingredients = Recipe.ingredients.through.objects.filter(recipe__user_id=user_id)  # noqa: E501
+    if recipes is not None:
+        tags, ingredients = tags.filter(recipe__in=recipes), ingredients.filter(recipe__in=recipes)  # noqa: E501
+    tags = tags.values_list('recipe_id', 'tag_id')
+    ingredients = ingredients.values_list('recipe_id', 'ingredient_id')
+    tags = np.array(list(tags), dtype=np.int64).reshape(-1, 2)
+    ingredients = np.array(list(ingredients), dtype=np.int64).reshape(-1, 2)
+    return (
+        np.concatenate([tags[:, 0], ingredients[:, 0]]),
+        feature_keys(tags[:, 1], ingredients[:, 1]),
+    )
+
+
+def sharing_recipes(user_id, keys):
+    """Subquery of the user's recipes with at least one of the feature `keys`."""  # noqa: E501
+    keys = np.asarray(keys, dtype=np.int64)
+    return Recipe.objects.filter(user_id=user_id).filter(
+        Q(tags__in=(keys[keys % 2 == 0] // 2).tolist())
+        | Q(ingredients__in=(keys[keys % 2 == 1] // 2).tolist())
+    ).values('id')
+
+
+def recipe_keys(recipe):
+    """Feature keys of one recipe, from its database."""
+    alias = recipe._state.db
+    return feature_keys(
+        list(Recipe.tags.through.objects.using(alias).filter(recipe_id=recipe.pk).values_list('tag_id', flat=True)),  # noqa: E501
+        list(Recipe.ingredients.through.objects.using(alias).filter(recipe_id=recipe.pk).values_list('ingredient_id', flat=True)),  # noqa: E501
+    )
+
+
+def store(stored, index, **fields):
+    """Save `index` into the SimilarityIndex row `stored`."""
+    stored.data = index.dumps()
+    stored.recipes = len(index)
+    stored.version = uuid.uuid4()
+    for name, value in fields.items():
+        setattr(stored, name, value)
+    stored.save()
+    index.version = stored.version
+    remember(stored.user_id, stored.version, index)
+
+
+def build(user):
+    """(Re)build the user's index from the link tables, return it."""
+    with db_routers.read_from(None):  # Primary only (i.e. called by a replica reading `list`) # noqa: E501
+        SimilarityIndex.objects.get_or_create(user_id=user.pk, defaults={'data': b'', 'built_at': timezone.now()})  # noqa: E501
+        with transaction.atomic():
+            stored = SimilarityIndex.objects.select_for_update().get(user_id=user.pk)  # noqa: E501
+            # ^Locked before the links are read: writes marking it stale meanwhile wait & apply after # noqa: E501
+            with sharding.use_shard(sharding.user_shard(user)):
+                index = RecipeIndex.from_links(*user_links(user.pk))
+            store(stored, index, stale=False, built_at=timezone.now())
+    return index
+
+
+def fresh_index(user):
+    """The user's index if nothing changed since it was built, None if missing or stale (no build in the request)."""  # noqa: E501
+    state = SimilarityIndex.objects.filter(user_id=user.pk).values_list('version', 'stale').first()  # noqa: E501
+    if state is None:
+        request_build(user.pk)
+        return None
+    version, stale = state
+    return None if stale else load(user.pk, version)
+
+
+def request_build(user_id):
+    """An empty, stale index row: built by the next background pass."""
+    with db_routers.read_from(None):
+        SimilarityIndex.objects.get_or_create(user_id=user_id, defaults={'data': b'', 'stale': True, 'built_at': timezone.now()})  # noqa: E501
+
+
+def load(user_id, version):
+    """This process' copy of the index `version` (loaded if it has another one)."""  # noqa: E501
+    with _loaded_lock:
+        cached = _loaded.get(user_id)
+        if cached is not None and cached[0] == version:
+            _loaded.move_to_end(user_id)
+            return cached[1]
+
+    version, data = SimilarityIndex.objects.filter(user_id=user_id).values_list('version', 'data').get()  # noqa: E501
+    index = RecipeIndex.loads(data)
+    index.version = version
+    remember(user_id, version, index)
+    return index
+
+
+def remember(user_id, version, index):
+    with _loaded_lock:
+        _loaded[user_id] = (version, index)
+        _loaded.move_to_end(user_id)
+        while len(_loaded) > settings.SIMILARITY_CACHE_USERS:
+            _loaded.popitem(last=False)  # Least recently used
+
+
+def mark_stale(user_id):
+    """The user's links changed (a recipe written or deleted, a tag deleted...): rebuilt in the background."""  # noqa: E501
+    SimilarityIndex.objects.filter(user_id=user_id, stale=False).update(stale=True)  # noqa: E501
+    # ^Row lock only for this UPDATE (none if already stale). A running build()
+    # holds it >> this waits & marks the new index stale (it may miss the write) # noqa: E501
+
+
+def similar_recipes(user, recipe, k, metric='jaccard'):
+    """[(recipe ID, score)] of the user's k recipes most similar to `recipe`."""  # noqa: E501
+    index = fresh_index(user)
+    keys = index.recipe_features(recipe.pk) if index is not None else None
+    if keys is None:  # No features, or no fresh index
+        keys = recipe_keys(recipe)
+    if index is None:
+        index = RecipeIndex.from_links(*user_links(user.pk, sharing_recipes(user.pk, keys)))  # noqa: E501
+        # ^Only the recipes sharing a feature (the others score 0), same scores
+    return index.top_k(keys, k, metric, exclude=recipe.pk)
+
+
+# Background rebuilds --------------------------------------------------------
+
+
+def due_for_rebuild():
+    """Indexes marked stale or older than SIMILARITY_MAX_AGE."""
+    oldest = timezone.now() - timedelta(seconds=settings.SIMILARITY_MAX_AGE)
+    return SimilarityIndex.objects.filter(Q(stale=True) | Q(built_at__lt=oldest)).select_related('user')  # noqa: E501
+
+
+def rebuild_due(pause=0):
+    """Rebuild every index due, return how many."""
+    rebuilt = 0
+    for stored in due_for_rebuild().order_by('built_at').iterator():
+        build(stored.user)
+        rebuilt += 1
+        time.sleep(pause)  # Leaves the database to the app
+    return rebuilt
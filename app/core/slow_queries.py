@@ -0,0 +1,222 @@
+"""
+Slow query log
+
+Every database connection gets an execute wrapper (installed when the
+connection is created, see CoreConfig.ready). Queries slower than
+SLOW_QUERY_THRESHOLD_MS are queued together with the view they came from;
+a background thread groups them by fingerprint (the SQL with its values
+removed) into `SlowQuery` rows and captures EXPLAIN the first time a
+fingerprint is seen. Requests never wait for any of this.
+
+View them with `manage.py slow_queries` or in Django Admin.
+"""
+
+import contextvars
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+_origin = contextvars.ContextVar('slow_query_origin', default='')
+# ^View handling the current request (set by SlowQueryMiddleware)
+
+_local = threading.local()
+# ^`recording` >> True while this thread is writing slow queries (don't log our own queries) # noqa: E501
+
+_SKIP_FILES = {
+    __file__,
+    os.path.join(os.path.dirname(__file__), 'middleware.py'),
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'manage.py'),
+}
+# ^Frames that wrap every query >> never the interesting location
+
+_TRANSACTION_CONTROL = ('BEGIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'COMMIT')
+
+LOG_TABLE = 'core_slowquery'  # Queries on the log itself are never logged
+
+_queue = queue.Queue(maxsize=1000)
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+# Fingerprints ---------------------------------------------------------------
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|\d+|\'[^\']*\')\s*,)*\s*(?:%s|\?|\d+|\'[^\']*\')\s*\)', re.IGNORECASE)  # noqa: E501
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL with every value replaced by `?` (same query shape >> same text)."""
+    sql = _IN_LIST.sub('IN (...)', sql)  # 3 or 300 IDs in the list are the same query # noqa: E501
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+
+# Recording ------------------------------------------------------------------
+
+
+def set_origin(origin):
+    return _origin.set(origin)
+
+
+def reset_origin(token):
+    _origin.reset(token)
+
+
+def view_origin(view_func, method):
+    """Name of the view (and viewset action) i.e. `RecipeViewSet.list`."""
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)  # noqa: E501
+    if view_class is None:
+        return getattr(view_func, '__qualname__', str(view_func))
+
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+def code_location():
+    """Innermost frame of OUR code that led to the query (i.e. a serializer method)."""  # noqa: E501
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        if frame.filename.startswith(base_dir) and frame.filename not in _SKIP_FILES:  # noqa: E501
+            path = os.path.relpath(frame.filename, base_dir)
+            return f'{path}:{frame.lineno} in {frame.name}'
+    return ''
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Time the query, queue it if it is slow."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if (
+            threshold is not None
+            and duration_ms >= threshold
+            and not getattr(_local, 'recording', False)
+            and LOG_TABLE not in sql  # i.e. `slow_queries --reset`
+            and not sql.startswith(_TRANSACTION_CONTROL)  # Waiting for locks, not slow SQL # noqa: E501
+        ):
+            # Only slow queries pay for the stack walk
+            origin = ' / '.join(filter(None, [_origin.get(), code_location()]))
+            submit({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': None if many else params,
+                'duration_ms': duration_ms,
+                'origin': origin[:255],
+            })
+
+
+def install(sender, connection, **kwargs):
+    """`connection_created` receiver: wrap every query of the new connection."""  # noqa: E501
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def submit(entry):
+    """Hand a slow query to the background thread (or record it right away)."""
+    if not settings.SLOW_QUERY_ASYNC:
+        record(entry)
+        return
+
+    _ensure_worker()
+    try:
+        _queue.put_nowait(entry)
+    except queue.Full:
+        pass  # Never slow a request down because the log can't keep up
+
+
+def _ensure_worker():
+    """Start the background thread (once per process, uWSGI forks after import)."""  # noqa: E501
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid != os.getpid():
+            threading.Thread(target=_work, name='slow-query-log', daemon=True).start()  # noqa: E501
+            _worker_pid = os.getpid()
+
+
+def _work():
+    while True:
+        entry = _queue.get()
+        try:
+            record(entry)
+        finally:
+            connections.close_all()  # This thread's connections
+
+
+def record(entry):
+    """Add a slow query to its fingerprint's totals (EXPLAIN if it is new)."""
+    from core.models import SlowQuery
+
+    _local.recording = True
+    try:
+        normalized = normalize(entry['sql'])
+        duration_ms = entry['duration_ms']
+        defaults = {
+            'sql': normalized,
+            'example_sql': entry['sql'],
+            'example_params': repr(entry['params']),
+            'origin': entry['origin'],
+            'database': entry['alias'],
+        }
+        with transaction.atomic(using='default'):
+            slow_query, created = SlowQuery.objects.using('default').get_or_create(  # noqa: E501
+                fingerprint=fingerprint(normalized),
+                defaults=defaults,
+            )
+            SlowQuery.objects.using('default').filter(pk=slow_query.pk).update(  # noqa: E501
+                calls=F('calls') + 1,  # F() >> no lost updates between processes # noqa: E501
+                total_ms=F('total_ms') + duration_ms,
+                max_ms=Greatest('max_ms', duration_ms),
+                last_seen=timezone.now(),  # update() skips auto_now
+                **({} if created else defaults),  # Keep the latest example
+            )
+        if created:
+            plan = explain(entry['alias'], entry['sql'], entry['params'])
+            SlowQuery.objects.using('default').filter(pk=slow_query.pk).update(explain=plan)  # noqa: E501
+    except Exception:  # i.e. table not migrated yet >> never break the app
+        logger.exception('Could not record slow query')
+    finally:
+        _local.recording = False
+
+
+def explain(alias, sql, params):
+    """Query plan of a SELECT on the database it ran on."""
+    if params is None or not sql.lstrip().upper().startswith('SELECT'):
+        return ''  # Only plain reads are explained
+
+    connection = connections[alias]
+    prefix = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
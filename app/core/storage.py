@@ -0,0 +1,43 @@
+"""
+Static files storage (`collectstatic`)
+
+Every file is also copied under a name containing a hash of its content
+(`admin/css/base.5af66c1b1797.css`, references inside CSS are rewritten)
+and `{% static %}` links to that name. A changed file gets a new URL, so
+nginx can let browsers cache hashed files forever (`immutable`).
+
+Hashed files of a compressible type also get `.gz` / `.br` siblings,
+written once at collect time and sent as they are by nginx (`gzip_static`).
+"""
+
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from core.compression import precompress_file
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest hashed names + precompressed siblings of the hashed files."""
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+            # ^No manifest, `collectstatic` didn't run (i.e. tests) >> original names # noqa: E501
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for name in sorted(paths):
+            hashed_name = self.hashed_files.get(self.hash_key(self.clean_name(name)))  # noqa: E501
+            # ^Final name (CSS files are hashed again after their references are rewritten) # noqa: E501
+            if hashed_name and self.compressible(hashed_name):
+                precompress_file(self.path(hashed_name))
+
+    @staticmethod
+    def compressible(name):
+        return os.path.splitext(name)[1].lower() in settings.STATIC_PRECOMPRESS_EXTENSIONS  # noqa: E501
@@ -0,0 +1,121 @@
+"""
+Query budgets for API tests (guard against N+1 regressions)
+
+Usage:
+
+    class RecipeBudgetTests(QueryBudgetMixin, TestCase):
+        def test_list(self):
+            self.assertQueryBudget(
+                4,
+                lambda: self.client.get(RECIPES_URL),
+                grow=lambda: create_recipe(user=self.user),  # More data >> SAME number of queries # noqa: E501
+            )
+"""
+
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class RecordedQuery:
+    """One executed query + where in OUR code it came from."""
+
+    def __init__(self, sql, params, duration, stack):
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+        self.stack = stack
+
+    def __str__(self):
+        lines = [f'{self.sql}  [{self.duration * 1000:.2f}ms]']
+        lines += [
+            f'      {frame.filename}:{frame.lineno} in {frame.name}'
+            for frame in self.stack
+        ]
+        return '\n'.join(lines)
+
+
+class QueryRecorder:
+    """Database execute wrapper keeping every query that was run."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(RecordedQuery(
+                sql,
+                params,
+                time.perf_counter() - start,
+                project_stack(),
+            ))
+
+    def report(self):
+        """Numbered list of the queries (with stack traces)."""
+        return '\n'.join(
+            f'{number}. {query}'
+            for number, query in enumerate(self.queries, start=1)
+        )
+
+
+def project_stack():
+    """Stack frames inside the project (skip Django, DRF & test code)."""
+    base_dir = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir)
+        and '/tests/' not in frame.filename
+        and not frame.filename.endswith('manage.py')
+    ]
+
+
+@contextmanager
+def record_queries():
+    """Record the queries made on every database connection inside the block."""  # noqa: E501
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting the number of queries an API call makes."""
+
+    def assertQueryBudget(self, budget, request, grow=None, rounds=2):
+        """
+        Assert `request()` makes at most `budget` queries.
+
+        With `grow`, the data is grown before each of the `rounds` calls and the
+        number of queries must stay the SAME (i.e. not one query per recipe / tag).
+        """
+        counts = []
+        for _ in range(rounds if grow else 1):
+            if grow:
+                grow()
+
+            with record_queries() as recorder:
+                response = request()
+
+            if len(recorder) > budget:
+                self.fail(
+                    f'{len(recorder)} queries made, budget is {budget}:\n'
+                    f'{recorder.report()}'
+                )
+            if counts and len(recorder) != counts[-1]:
+                self.fail(
+                    f'Queries grow with the data ({counts[-1]} >> {len(recorder)}), '  # noqa: E501
+                    f'probably N+1:\n{recorder.report()}'
+                )
+            counts.append(len(recorder))
+
+        return response
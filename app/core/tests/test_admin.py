@@ -2,11 +2,19 @@
 Tests for Django Admin Modifications
 """
 
+import tempfile
+from decimal import Decimal
+
+from PIL import Image
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core import similarity
+from core.models import Ingredient, Recipe, SimilarityIndex, Tag
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django Admin"""
@@ -49,3 +57,26 @@ class AdminSiteTests(TestCase):
 
         self.assertEqual(res.status_code, 200)
         # ^This is a test that the create user page loads successfully.
+
+    def test_recipe_edits_mark_index_stale(self):
+        """Test saving & deleting a recipe in the admin leaves the similar recipes index to the rebuild"""  # noqa: E501
+        recipe = Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Carrot')
+        similarity.build(self.user)
+
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')  # The admin form requires an image # noqa: E501
+            image_file.seek(0)
+            res = self.client.post(url, {'user': self.user.id, 'title': 'Soup', 'time_minutes': 5, 'price': '1.00', 'tags': [tag.id], 'ingredients': [ingredient.id], 'image': image_file})  # noqa: E501
+
+        self.assertEqual(res.status_code, 302)
+        self.assertTrue(SimilarityIndex.objects.get(user=self.user).stale)
+        Recipe.objects.get(id=recipe.id).image.delete()  # Deletes the uploaded image
+
+        similarity.build(self.user)
+        self.client.post(reverse('admin:core_recipe_delete', args=[recipe.id]), {'post': 'yes'})  # noqa: E501
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertTrue(SimilarityIndex.objects.get(user=self.user).stale)
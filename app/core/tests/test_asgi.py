@@ -0,0 +1,108 @@
+"""
+Tests for the ASGI serving mode
+"""
+
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.asgi import ASGIHandler
+from core.models import Recipe
+
+
+def scope(path, method='GET', query='', headers=()):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query.encode(),
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+        'headers': [(b'host', b'testserver'), *headers],
+    }
+
+
+async def response(communicator):
+    """(status, headers, body) sent by the application."""
+    start = await communicator.receive_output(timeout=5)
+    body = b''
+    while True:
+        message = await communicator.receive_output(timeout=5)
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return start['status'], dict(start['headers']), body
+
+
+class ASGIHandlerTests(SimpleTestCase):
+    """Test slow clients don't hold up other requests"""
+
+    async def test_slow_upload_doesnt_block(self):
+        """Test requests are served while another body is still arriving"""
+        handler = ASGIHandler()
+        upload = ApplicationCommunicator(handler, scope(
+            '/api/recipe/recipes/1/upload-image/',
+            method='POST',
+            headers=[(b'content-type', b'multipart/form-data; boundary=x'), (b'content-length', b'10')],  # noqa: E501
+        ))
+        await upload.send_input({'type': 'http.request', 'body': b'x' * 5, 'more_body': True})  # noqa: E501
+
+        quick = ApplicationCommunicator(handler, scope('/api/schema/', query='format=json'))  # noqa: E501
+        await quick.send_input({'type': 'http.request'})
+        status, _, body = await response(quick)
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'openapi', body)
+        self.assertTrue(await upload.receive_nothing())  # Still waiting for its body # noqa: E501
+
+        await upload.send_input({'type': 'http.request', 'body': b'x' * 5})
+        status, _, _ = await response(upload)
+        self.assertEqual(status, 401)
+
+    def test_benchmark(self):
+        """Test the serving benchmark runs"""
+        out = StringIO()
+
+        with patch('core.benchmarks.SLOW_DELAY', 0.01), patch('core.benchmarks.QUICK_REQUESTS', 5):  # noqa: E501
+            call_command('benchmark', 'serving', '--size', '5', '--repeat', '1', stdout=out)  # noqa: E501
+
+        self.assertIn('p99 asgi', out.getvalue())
+
+
+class ASGIStreamingTests(TransactionTestCase):
+    """Test streaming responses are produced outside the event loop"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        self.token = Token.objects.create(user=user).key
+        for number in range(3):
+            Recipe.objects.create(user=user, title=f'Recipe {number}', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+
+    async def test_export(self):
+        """Test the recipe export (queries while streaming) is sent whole"""
+        communicator = ApplicationCommunicator(ASGIHandler(), scope(
+            reverse('recipe:recipe-export'),
+            headers=[(b'authorization', f'Token {self.token}'.encode())],
+        ))
+        await communicator.send_input({'type': 'http.request'})
+        status, headers, body = await response(communicator)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'Content-Type'], b'application/x-ndjson')
+        self.assertEqual(
+            [json.loads(line)['title'] for line in body.splitlines()],
+            ['Recipe 2', 'Recipe 1', 'Recipe 0'],
+        )
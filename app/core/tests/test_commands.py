@@ -5,44 +5,71 @@ from unittest.mock import patch  # Mock behaviour of Database. Simulate that DB
 from psycopg2 import OperationalError as Psycopg2Error  # OperationalError Exception: posibility of error we might get when we try to connect to DB befor it is ready # noqa: E501
 
 from django.core.management import call_command  # Helper Function Provided by Django: Call the command that we are testing # noqa: E501
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError    # Helper Function Provided by Django: Check if DB is ready or not # noqa: E501
 from django.test import SimpleTestCase          # Helper Function Provided by Django: Base Test Class (Just checking DB availability) # noqa: E501
 
 
-@patch('core.management.commands.wait_for_db.Command.check')  # Mock the behaviour of check() function (Status of Database) # noqa: E501
+@patch('core.management.commands.wait_for_db.Command.probe')  # Mock the behaviour of probe() function (Status of Database) # noqa: E501
 # ^Decorator ^ Command that we are mocking
 class CommandTests(SimpleTestCase):
     """Test commands."""
 
-    def test_wait_for_db_ready(self, patched_check):
-        # patched_check = magic mock object that replaces check by patch
+    def test_wait_for_db_ready(self, patched_probe):
+        # patched_probe = magic mock object that replaces probe by patch
 
         """Test waiting for database if database ready."""
-        patched_check.return_value = True
-        # ^when check is called inside our command, inside our test case, we just want it to return the True value. # noqa: E501
+        patched_probe.return_value = None
+        # ^when probe is called inside our command, inside our test case, we just want it to succeed. # noqa: E501
 
-        call_command('wait_for_db')  # Call the command that we are testing
+        call_command('wait_for_db', '--database', 'default')  # Call the command that we are testing # noqa: E501
 
-        patched_check.assert_called_once_with(databases=['default'])  # Check if the check() method has been called # noqa: E501
+        patched_probe.assert_called_once_with('default')  # Check if the probe() method has been called # noqa: E501
         # ^checks that we're calling the right thing from our wait_for_db ready. # noqa: E501
 
     @patch('time.sleep')  # Mock the behaviour of time.sleep() function
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
         """Test waiting for database when getting OperationalError."""
-        patched_check.side_effect = [Psycopg2Error] * 2 + \
-            [OperationalError] * 3 + [True]
+        patched_probe.side_effect = [Psycopg2Error] * 2 + \
+            [OperationalError] * 3 + [None]
         #
         # ^How Mocking works when when you want to raise an exception (when a Database is not ready) # noqa: E501
         # The way that you make it raise an exception instead of actually pretend to get value is you use the side effect. # noqa: E501
         # side_effect allows you to pass in various different items that get handled differently depending on that type. # noqa: E501
-        # First '2' times Psycopg2Error, then '3' times OperationalError, then True (6th time). # noqa: E501
+        # First '2' times Psycopg2Error, then '3' times OperationalError, then None (6th time). # noqa: E501
         # Psycopg2Error > Database not even started yet
         # OperationalError > Database is started but not ready to accept connections yet # noqa: E501
         # '2' and '3' arbitary values based on trial and error / experience
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', '--database', 'default')
+
+        self.assertEqual(patched_probe.call_count, 6)
+        # ^check if the probe() method has been called 6 times
+
+        patched_probe.assert_called_with('default')
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_probe):
+        """Test the delay between attempts grows exponentially (up to 1s)."""
+        patched_probe.side_effect = [OperationalError] * 12 + [None]
+
+        call_command('wait_for_db', '--database', 'default')
 
-        self.assertEqual(patched_check.call_count, 6)
-        # ^check if the check() method has been called 6 times
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertLess(delays[0], 0.01)  # Starts in the low milliseconds
+        self.assertGreater(delays[5], delays[0])
+        self.assertTrue(all(delay <= 1 for delay in delays))
+
+    def test_wait_for_db_timeout(self, patched_probe):
+        """Test the command gives up once the timeout is reached."""
+        patched_probe.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', '--database', 'default', '--timeout', '0.05')  # noqa: E501
+
+    def test_wait_for_db_all_aliases(self, patched_probe):
+        """Test every configured alias is checked by default."""
+        call_command('wait_for_db')
 
-        patched_check.assert_called_with(databases=['default'])
+        probed = {call.args[0] for call in patched_probe.call_args_list}
+        self.assertIn('default', probed)
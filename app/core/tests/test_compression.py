@@ -0,0 +1,126 @@
+"""
+Tests for response compression
+"""
+
+import gzip
+import zlib
+from io import StringIO
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings  # noqa: E501
+
+from core import compression
+
+
+BODY = b'{"title": "Soup", "price": "5.50"}' * 100
+
+
+def respond(response, accept_encoding='gzip, deflate'):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return compression.compress_response(request, response)
+
+
+def json_response(body=BODY, **kwargs):
+    return HttpResponse(body, content_type='application/json', **kwargs)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+@patch.object(compression, 'brotli', None)
+class GzipCompressionTests(SimpleTestCase):
+    """Test compressing responses with gzip"""
+
+    def test_accept_encoding(self):
+        """Test q=0 refuses an encoding"""
+        self.assertEqual(compression.accepted_encodings('gzip;q=0, br;q=0.5, deflate'), {'br', 'deflate'})  # noqa: E501
+        self.assertIsNone(compression.choose_encoding('gzip;q=0, deflate'))
+        self.assertEqual(compression.choose_encoding('*'), 'gzip')
+
+    def test_gzip(self):
+        """Test large JSON responses are gzipped"""
+        res = respond(json_response())
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+
+    def test_not_compressed(self):
+        """Test small, not allowed, already encoded & not accepted responses are left alone"""  # noqa: E501
+        responses = [
+            (respond(json_response(b'{}')), b'{}'),
+            (respond(HttpResponse(BODY, content_type='image/jpeg')), BODY),
+            (respond(HttpResponse(BODY, content_type='text/html; charset=utf-8')), BODY),  # CSRF tokens (BREACH) # noqa: E501
+            (respond(json_response(headers={'Content-Encoding': 'br'})), BODY),
+            (respond(json_response(), accept_encoding='identity'), BODY),
+            (respond(json_response(status=206)), BODY),
+        ]
+
+        for res, body in responses:
+            self.assertEqual(res.content, body)
+            self.assertNotEqual(res.get('Content-Encoding'), 'gzip')
+        self.assertEqual(responses[0][0]['Vary'], 'Accept-Encoding')  # Could be compressed # noqa: E501
+        self.assertFalse(responses[1][0].has_header('Vary'))
+
+    def test_etag_weakened(self):
+        """Test a strong ETag becomes weak (the bytes changed)"""
+        res = respond(json_response(headers={'ETag': '"abc"'}))
+
+        self.assertEqual(res['ETag'], 'W/"abc"')
+
+    def test_streaming_not_buffered(self):
+        """Test every chunk is compressed & sent before the next is produced"""  # noqa: E501
+        produced = []
+
+        def chunks():
+            for number in range(3):
+                produced.append(number)
+                yield b'{"line": %d}\n' % number
+
+        res = respond(StreamingHttpResponse(chunks(), content_type='application/x-ndjson'))  # noqa: E501
+        decompressor = zlib.decompressobj(31)
+        output = []
+        for chunk in res.streaming_content:
+            output.append(decompressor.decompress(chunk))
+            if len(output) <= 3:
+                self.assertEqual(len(produced), len(output))  # Not buffered
+                self.assertEqual(output[-1], b'{"line": %d}\n' % (len(output) - 1))  # noqa: E501
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+
+
+@skipIf(compression.brotli is None, 'brotli is not installed')
+class BrotliCompressionTests(SimpleTestCase):
+    """Test compressing responses with brotli"""
+
+    def test_brotli_preferred(self):
+        """Test brotli is used when accepted"""
+        res = respond(json_response(), accept_encoding='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(res.content), BODY)
+
+
+class CompressionMiddlewareTests(TestCase):
+    """Test the middleware compresses API responses"""
+
+    def test_schema_compressed(self):
+        """Test a large API response is compressed & still revalidates"""
+        res = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn(b'/api/recipe/recipes/', gzip.decompress(res.content))
+
+        cached = self.client.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=res['ETag'])  # noqa: E501
+        self.assertEqual(cached.status_code, 304)
+
+    def test_benchmark(self):
+        """Test the compression benchmark runs"""
+        out = StringIO()
+
+        call_command('benchmark', 'compression', '--size', '20', '--repeat', '1', stdout=out)  # noqa: E501
+
+        self.assertIn('compress gzip 5', out.getvalue())
@@ -0,0 +1,162 @@
+"""
+Tests for the Primary / Read-Replica database router
+"""
+
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import db_routers
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RouterTests(SimpleTestCase):
+    """Test the router itself"""
+
+    def setUp(self):
+        self.router = db_routers.PrimaryReplicaRouter()
+
+    def test_reads_default_without_alias(self):
+        """Test reads are not routed unless a view asks for it"""
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_reads_routed_inside_block(self):
+        """Test reads go to the alias set by `read_from`"""
+        with db_routers.read_from('replica_1'):
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica_1')
+
+        self.assertIsNone(self.router.db_for_read(Recipe))  # Reset after the block
+
+    def test_writes_always_go_to_default(self):
+        """Test writes go to `default` even inside a replica block"""
+        with db_routers.read_from('replica_1'):
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_choose_replica_without_replicas(self):
+        """Test None (i.e. `default`) is chosen when no replicas exist"""
+        self.assertIsNone(db_routers.choose_replica())
+
+    @override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+    def test_choose_replica(self):
+        """Test one of the configured replicas is chosen"""
+        self.assertIn(db_routers.choose_replica(), ['replica_1', 'replica_2'])
+
+
+@patch('core.db_routers.choose_replica', return_value=None)
+class ReplicaViewTests(TestCase):
+    """Test which requests are sent to a replica"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_reads_from_replica(self, patched_choose):
+        """Test listing recipes uses a replica"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        patched_choose.assert_called_once()
+
+    def test_write_pins_client_to_primary(self, patched_choose):
+        """Test a write sets the stickiness cookie"""
+        payload = {'title': 'New', 'time_minutes': 5, 'price': Decimal('1.00')}
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn(db_routers.PIN_COOKIE_NAME, res.cookies)
+        self.assertEqual(
+            res.cookies[db_routers.PIN_COOKIE_NAME]['max-age'],
+            settings.DB_REPLICA_STICKY_SECONDS,
+        )
+        patched_choose.assert_not_called()
+
+    def test_failed_write_does_not_pin(self, patched_choose):
+        """Test an invalid write does not pin the client"""
+        res = self.client.post(RECIPES_URL, {'title': 'Missing fields'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(db_routers.PIN_COOKIE_NAME, res.cookies)
+
+    def test_pinned_client_reads_from_primary(self, patched_choose):
+        """Test reads within the sticky window skip the replica"""
+        self.client.cookies[db_routers.PIN_COOKIE_NAME] = '1'
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        patched_choose.assert_not_called()
+
+    def test_alias_reset_after_request(self, patched_choose):
+        """Test the replica alias does not leak past the request"""
+        patched_choose.return_value = 'replica_1'
+        router = db_routers.PrimaryReplicaRouter()
+
+        with patch.object(router.__class__, 'db_for_read', return_value=None):
+            self.client.get(RECIPES_URL)  # Keep the reads on `default`
+
+        self.assertIsNone(router.db_for_read(Recipe))
+
+
+# Run with two SQLite files standing in for primary & replica, i.e.
+# DB_ENGINE=django.db.backends.sqlite3 DB_NAME=primary.sqlite3 \
+#   DB_REPLICAS=replica.sqlite3 python manage.py test core.tests.test_db_routers
+# (Nothing replicates between the two files, other API tests expect the replica to be up to date)
+@skipUnless(
+    'replica_1' in settings.DATABASES
+    and 'MIRROR' not in settings.DATABASES['replica_1'].get('TEST', {}),
+    'Requires a separate (non-mirrored) replica database.',
+)
+class ReplicaIntegrationTests(TestCase):
+    """Test routing against a real, separate replica database"""
+
+    databases = {'default'} | {'replica_1'}.intersection(settings.DATABASES)
+    # ^Test runner collects `databases` even from skipped classes
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_read_your_writes(self):
+        """Test stale replica is read until the client writes something"""
+        create_recipe(user=self.user)  # Only on the primary (nothing replicates in tests)
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.data, [])  # Replica hasn't got the recipe
+
+        payload = {'title': 'New', 'time_minutes': 5, 'price': Decimal('1.00')}
+        self.client.post(RECIPES_URL, payload)  # Write >> client is pinned to primary
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data), 2)
@@ -0,0 +1,96 @@
+"""
+Tests for the load test result calculations & runs
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core import loadtest
+
+
+class SummaryTests(SimpleTestCase):
+    """Test summarizing & comparing load test samples"""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([7], 95), 7)
+        self.assertIsNone(loadtest.percentile([], 50))
+
+    def test_percentile_ranks(self):
+        """Test nearest-rank percentiles of odd & even lengths (halves round up)"""  # noqa: E501
+        self.assertEqual(loadtest.percentile([1, 2, 3, 4, 5], 50), 3)
+        self.assertEqual(loadtest.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(loadtest.percentile(list(range(1, 11)), 25), 3)
+        self.assertEqual(loadtest.percentile(list(range(1, 11)), 95), 10)
+        self.assertEqual(loadtest.percentile([1, 2, 3], 100), 3)
+
+    def test_summarize(self):
+        """Test overall & per operation statistics"""
+        samples = [
+            # (operation, seconds, status, bytes, queries)
+            ('list_recipes', 0.010, 200, 1000, 4),
+            ('list_recipes', 0.030, 200, 1000, 4),
+            ('login', 0.200, 400, 50, 1),
+        ]
+
+        summary = loadtest.summarize(samples, elapsed=2)
+
+        self.assertEqual(summary['overall']['requests'], 3)
+        self.assertEqual(summary['overall']['errors'], 1)
+        self.assertEqual(summary['overall']['statuses'], {'200': 2, '400': 1})
+        self.assertEqual(summary['overall']['requests_per_second'], 1.5)
+        self.assertEqual(summary['operations']['list_recipes']['p50_ms'], 10)
+        self.assertEqual(summary['operations']['list_recipes']['p99_ms'], 30)
+        self.assertEqual(summary['operations']['login']['queries_per_request'], 1)  # noqa: E501
+
+    def test_compare(self):
+        """Test the change between two runs is reported in percent"""
+        previous = loadtest.summarize([('list_recipes', 0.1, 200, 10, 8)], 1)
+        current = loadtest.summarize([('list_recipes', 0.05, 200, 10, 4)], 1)
+
+        rows = {
+            (name, metric): change
+            for name, metric, _, _, change in loadtest.compare(previous, current)  # noqa: E501
+        }
+
+        self.assertEqual(rows[('overall', 'p50_ms')], -50)
+        self.assertEqual(rows[('list_recipes', 'queries_per_request')], -50)
+
+
+class LoadTestRunTests(TransactionTestCase):
+    """Test running the command against the in-process app"""
+    # ^Clients run in threads, with their own database connections
+
+    def test_command(self):
+        """Test a short run is counted, reported & its users removed"""
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'result.json')
+
+            call_command(
+                'loadtest', '--workload', 'read-heavy', '--clients', '2',
+                '--duration', '0.5', '--recipes', '3', '--output', path,
+                stdout=out,
+            )
+
+            with open(path) as result_file:
+                result = json.load(result_file)
+
+        overall = result['overall']
+        self.assertGreater(overall['requests'], 0)
+        self.assertEqual(overall['errors'], 0)
+        self.assertEqual(overall['statuses'], {'200': overall['requests']})
+        self.assertEqual(sum(stats['requests'] for stats in result['operations'].values()), overall['requests'])  # noqa: E501
+        self.assertLessEqual(set(result['operations']), {function.__name__ for function in loadtest.WORKLOADS['read-heavy']})  # noqa: E501
+        self.assertIn(f"status codes  200: {overall['requests']}", out.getvalue())  # noqa: E501
+        self.assertFalse(get_user_model().objects.exists())
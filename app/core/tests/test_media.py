@@ -0,0 +1,149 @@
+"""
+Tests for protected media (recipe images)
+"""
+
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+IMAGE_NAME = 'uploads/recipe/soup.jpg'
+IMAGE_BYTES = bytes(range(256)) * 4  # 1 KiB, content doesn't matter
+
+
+def media_url(path=IMAGE_NAME):
+    return reverse('protected-media', args=[path])
+
+
+def create_client(email):
+    user = get_user_model().objects.create_user(email=email, password='testpass123')  # noqa: E501
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')  # noqa: E501
+    return user, client
+
+
+class MediaTestCase(TestCase):
+    """An image of a recipe of the client's user"""
+
+    accel_redirect_prefix = '/protected-media/'  # nginx in front
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            MEDIA_ACCEL_REDIRECT_PREFIX=self.accel_redirect_prefix,
+        )
+        self.override.enable()
+
+        os.makedirs(os.path.join(self.media_root, 'uploads', 'recipe'))
+        with open(os.path.join(self.media_root, IMAGE_NAME), 'wb') as image_file:  # noqa: E501
+            image_file.write(IMAGE_BYTES)
+
+        self.user, self.client = create_client('owner@example.com')
+        Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+            image=IMAGE_NAME,
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+
+class ProtectedMediaTests(MediaTestCase):
+    """Test serving recipe images to their owner only"""
+
+    def test_image_url_served(self):
+        """Test the serializer's image URL is the protected view"""
+        recipe = Recipe.objects.get()
+        url = self.client.get(reverse('recipe:recipe-detail', args=[recipe.id])).data['image']  # noqa: E501
+
+        self.assertEqual(url, f'http://testserver{media_url()}')
+
+    def test_owner_redirected_to_nginx(self):
+        """Test the owner gets an X-Accel-Redirect (no bytes from Django)"""
+        with self.assertNumQueries(2):  # Token + ownership
+            res = self.client.get(media_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-media/{IMAGE_NAME}')  # noqa: E501
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res.content, b'')
+        self.assertIn('private', res['Cache-Control'])
+        self.assertTrue(res.has_header('ETag'))
+
+    def test_other_users_denied(self):
+        """Test other users & anonymous requests can't get the image"""
+        _, other = create_client('other@example.com')
+
+        self.assertEqual(other.get(media_url()).status_code, status.HTTP_404_NOT_FOUND)  # noqa: E501
+        self.assertEqual(APIClient().get(media_url()).status_code, status.HTTP_401_UNAUTHORIZED)  # noqa: E501
+
+    def test_path_traversal(self):
+        """Test paths outside MEDIA_ROOT are rejected"""
+        res = self.client.get(media_url('uploads/recipe/../../../etc/passwd'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_not_modified(self):
+        """Test conditional requests are answered without the file"""
+        etag = self.client.get(media_url())['ETag']
+
+        res = self.client.get(media_url(), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.has_header('X-Accel-Redirect'))
+
+
+class DjangoSentMediaTests(MediaTestCase):
+    """Test serving images without nginx (development)"""
+
+    accel_redirect_prefix = None
+
+    def test_whole_file(self):
+        """Test the whole file is sent"""
+        res = self.client.get(media_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(res.streaming_content), IMAGE_BYTES)
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        """Test single byte ranges"""
+        res = self.client.get(media_url(), HTTP_RANGE='bytes=10-19')
+        suffix = self.client.get(media_url(), HTTP_RANGE='bytes=-4')
+        open_ended = self.client.get(media_url(), HTTP_RANGE='bytes=1020-')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(res.content, IMAGE_BYTES[10:20])
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(IMAGE_BYTES)}')  # noqa: E501
+        self.assertEqual(suffix.content, IMAGE_BYTES[-4:])
+        self.assertEqual(open_ended.content, IMAGE_BYTES[1020:])
+
+    def test_range_not_satisfiable(self):
+        """Test a range after the end of the file"""
+        res = self.client.get(media_url(), HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)  # noqa: E501
+        self.assertEqual(res['Content-Range'], f'bytes */{len(IMAGE_BYTES)}')
+
+    def test_if_range_changed(self):
+        """Test the whole file is sent when If-Range doesn't match"""
+        res = self.client.get(media_url(), HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')  # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(res.streaming_content), IMAGE_BYTES)
@@ -0,0 +1,72 @@
+"""
+Tests for the metrics middleware & scrape endpoint
+"""
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from prometheus_client import REGISTRY
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('metrics')
+
+
+def sample_value(name, **labels):
+    """Return the current value of a metric (0 if never recorded)."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(TestCase):
+    """Test metrics are recorded per route"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_request_recorded_by_route(self):
+        """Test latency & status are recorded under the URL name"""
+        labels = {'route': 'recipe:recipe-list', 'method': 'GET'}
+        before = sample_value('http_request_duration_seconds_count', **labels)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sample_value('http_request_duration_seconds_count', **labels),
+            before + 1,
+        )
+        self.assertGreaterEqual(
+            sample_value('http_requests_total', status='200', **labels),
+            1,
+        )
+
+    def test_db_queries_recorded(self):
+        """Test the database queries of a request are counted"""
+        labels = {'route': 'recipe:recipe-list'}
+        before = sample_value('db_queries_per_request_sum', **labels)
+
+        self.client.get(RECIPES_URL)
+
+        self.assertGreater(
+            sample_value('db_queries_per_request_sum', **labels),
+            before,
+        )
+
+    def test_scrape_endpoint(self):
+        """Test the metrics are exposed in the Prometheus format"""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'http_request_duration_seconds_bucket', res.content)
+        self.assertIn(b'route="recipe:recipe-list"', res.content)
@@ -0,0 +1,24 @@
+"""
+Tests for keyset pagination
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from core.pagination import keyset_ordering
+
+
+class KeysetOrderingTests(SimpleTestCase):
+    """Test which orderings have a keyset"""
+
+    def test_field_and_id(self):
+        """Test `field, id` in one direction gives the field & direction"""
+        self.assertEqual(keyset_ordering(['price', 'id']), ('price', False))
+        self.assertEqual(keyset_ordering(['-title', '-id']), ('title', True))
+        self.assertEqual(keyset_ordering(['-id']), ('id', True))
+
+    def test_without_keyset(self):
+        """Test mixed directions, 2 fields or no `id` last are rejected"""
+        for ordering in ([], ['price'], ['price', '-id'], ['price', 'title', 'id']):  # noqa: E501
+            with self.assertRaises(ImproperlyConfigured):
+                keyset_ordering(ordering)
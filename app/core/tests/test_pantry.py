@@ -0,0 +1,39 @@
+"""
+Tests for the "what can I cook" bitset index
+"""
+
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from core import pantry
+
+
+class PantryIndexTests(SimpleTestCase):
+    """Test subset & "missing at most k" matches"""
+
+    def setUp(self):
+        self.index = pantry.PantryIndex.from_links(
+            [1, 1, 2, 2, 2, 3],
+            [10, 20, 10, 20, 30, 40],
+        )
+
+    def test_all_in_pantry(self):
+        """Test only recipes with every ingredient at hand match"""
+        self.assertEqual(self.index.cookable({10, 20}), [(1, 0)])
+        self.assertEqual(self.index.cookable({10, 20, 30, 40}), [(3, 0), (2, 0), (1, 0)])  # noqa: E501
+        self.assertEqual(self.index.cookable(set()), [])
+
+    def test_missing(self):
+        """Test recipes lacking up to k ingredients, fewest missing first"""
+        self.assertEqual(self.index.cookable({10, 20}, missing=1), [(1, 0), (3, 1), (2, 1)])  # noqa: E501
+        self.assertEqual(self.index.cookable({99}, missing=2), [(3, 1), (1, 2)])  # noqa: E501
+
+    @override_settings(PANTRY_CACHE_BYTES=1)
+    def test_lru_eviction(self):
+        """Test the least recently used users' indexes go first"""
+        with patch.dict(pantry._cache, clear=True), patch.object(pantry, '_cache_bytes', 0):  # noqa: E501
+            pantry._store(1, 'a', self.index)
+            pantry._store(2, 'b', self.index)
+
+            self.assertEqual(list(pantry._cache), [2])  # Always keeps the last one # noqa: E501
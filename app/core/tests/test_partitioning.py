@@ -0,0 +1,56 @@
+"""
+Tests for the hash partitioning of the recipe tables
+"""
+
+from unittest.mock import Mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from core import partitioning
+
+
+RECIPE_INDEXES = [
+    ('core_recipe_user_id_b0b7e7b6', 'btree (user_id)', False),
+    ('core_recipe_image_3e8a0f4c', 'btree (image)', False),
+]
+
+
+class PartitioningSQLTests(SimpleTestCase):
+    """Test the statements converting a table"""
+
+    def test_create(self):
+        """Test the copy is hash partitioned with the key in its primary key"""
+        statements = partitioning.create_statements('core_recipe', 'user_id', 4, RECIPE_INDEXES)  # noqa: E501
+
+        self.assertIn('PARTITION BY HASH (user_id)', statements[0])
+        self.assertIn('PRIMARY KEY (id, user_id)', statements[1])
+        self.assertIn('CREATE TABLE core_recipe_p3 PARTITION OF core_recipe_partitioned FOR VALUES WITH (MODULUS 4, REMAINDER 3)', statements)  # noqa: E501
+        self.assertIn('CREATE INDEX core_recipe_user_id_b0b7e7b6_p ON core_recipe_partitioned USING btree (user_id)', statements)  # noqa: E501
+
+    def test_unique_needs_key(self):
+        """Test unique indexes without the partition key are refused"""
+        partitioning.create_statements('core_recipe_tags', 'recipe_id', 4, [('links_uniq', 'btree (recipe_id, tag_id)', True)])  # noqa: E501
+
+        with self.assertRaises(ValueError):
+            partitioning.create_statements('core_recipe_tags', 'recipe_id', 4, [('tag_uniq', 'btree (tag_id)', True)])  # noqa: E501
+
+    def test_swap(self):
+        """Test the copy takes over name, sequence & index names"""
+        cursor = Mock()
+        cursor.fetchone.return_value = ('public.core_recipe_id_seq',)
+
+        statements = partitioning.swap_statements(cursor, 'core_recipe', RECIPE_INDEXES)  # noqa: E501
+
+        self.assertLess(
+            statements.index('ALTER SEQUENCE public.core_recipe_id_seq OWNED BY core_recipe_partitioned.id'),  # noqa: E501
+            statements.index('DROP TABLE core_recipe'),  # Would drop the sequence # noqa: E501
+        )
+        self.assertIn('ALTER TABLE core_recipe_partitioned RENAME TO core_recipe', statements)  # noqa: E501
+        self.assertIn('ALTER INDEX core_recipe_image_3e8a0f4c_p RENAME TO core_recipe_image_3e8a0f4c', statements)  # noqa: E501
+
+    def test_command_needs_postgresql(self):
+        """Test nothing happens on other databases"""
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            call_command('partition_tables')
@@ -0,0 +1,78 @@
+"""
+Tests for preloading the app in the uWSGI master
+"""
+
+import gc
+import sys
+from io import StringIO
+from unittest.mock import Mock, patch, sentinel
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, override_settings
+from django.urls import get_resolver
+
+from core import preload, uwsgi
+
+from recipe.serializers import RecipeValuesSerializer
+
+
+class PreloadTests(SimpleTestCase):
+    """Test the master warms up & the workers start clean"""
+
+    def test_warm_up(self):
+        """Test lazily filled caches are filled"""
+        with patch.object(RecipeValuesSerializer, '_compiled', None):
+            preload.warm_up()
+
+            self.assertIsNotNone(RecipeValuesSerializer._compiled)
+        self.assertTrue(get_resolver()._populated)
+
+    def test_after_fork_drops_inherited_connections(self):
+        """Test a worker never uses (nor closes) the master's connection"""
+        with patch.object(connections['default'], 'connection', sentinel.master_connection), patch.object(preload, '_inherited_connections', []):  # noqa: E501
+            preload.after_fork()
+
+            self.assertIsNone(connections['default'].connection)
+            self.assertEqual(preload._inherited_connections, [sentinel.master_connection])  # noqa: E501
+
+    @patch.object(preload, 'preload')
+    def test_install(self, patched_preload):
+        """Test preloading only happens in a uWSGI master"""
+        decorators = Mock()
+        with patch.dict(sys.modules, {'uwsgidecorators': decorators}):
+            preload.install()  # Not under uWSGI
+            with patch.object(uwsgi, 'uwsgi_api', Mock(opt={'lazy-apps': True})):  # noqa: E501
+                preload.install()
+            self.assertFalse(patched_preload.called)
+
+            with patch.object(uwsgi, 'uwsgi_api', Mock(opt={})):
+                preload.install()
+
+        patched_preload.assert_called_once_with()
+        decorators.postfork.assert_called_once_with(preload.after_fork)
+
+    @override_settings(PRELOAD_APP=False)
+    @patch.object(preload, 'preload')
+    @patch.object(uwsgi, 'uwsgi_api', Mock(opt={}))
+    def test_install_disabled(self, patched_preload):
+        """Test the GC app/wsgi.py disabled is enabled again"""
+        gc.disable()
+        try:
+            preload.install()
+
+            self.assertTrue(gc.isenabled())
+        finally:
+            gc.enable()
+        self.assertFalse(patched_preload.called)
+
+    def test_compare_command(self):
+        """Test the worker memory of both modes is reported"""
+        out = StringIO()
+
+        call_command('worker_memory', '--compare', '1', '--rounds', '1', stdout=out)  # noqa: E501
+
+        self.assertIn('plain:', out.getvalue())
+        self.assertIn('preloaded:', out.getvalue())
+        self.assertIn('uss', out.getvalue())
+        self.assertFalse(gc.get_freeze_count())  # Master state restored
@@ -0,0 +1,106 @@
+"""
+Tests for on-demand request profiling
+"""
+
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_client(is_staff):
+    """Return a client authenticated with a (staff) user's token"""
+    user = get_user_model().objects.create_user(
+        email=f'user{int(is_staff)}@example.com',
+        password='testpass123',
+        is_staff=is_staff,
+    )
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')  # noqa: E501
+    return client
+
+
+class ProfilingTests(TestCase):
+    """Test profiling requests"""
+
+    def setUp(self):
+        self.profile_root = tempfile.mkdtemp()
+        self.override = override_settings(PROFILE_ROOT=self.profile_root)
+        self.override.enable()
+        self.staff_client = create_client(is_staff=True)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.profile_root)
+
+    @patch('core.profiling.profile')
+    def test_no_flag_no_profiling(self, patched_profile):
+        """Test requests without the flag are not profiled"""
+        res = self.staff_client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        patched_profile.assert_not_called()
+
+    @patch('core.profiling.profile')
+    def test_non_staff_not_profiled(self, patched_profile):
+        """Test the flag is ignored for non staff users"""
+        client = create_client(is_staff=False)
+
+        res = client.get(RECIPES_URL, HTTP_X_PROFILE='inline')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        patched_profile.assert_not_called()
+
+    def test_inline_report(self):
+        """Test the inline report contains the profile & the SQL"""
+        res = self.staff_client.get(RECIPES_URL, {'profile': 'inline'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Profiled-Status'], '200')
+        report = res.content.decode()
+        self.assertIn('function calls', report)  # cProfile output
+        self.assertIn('core_recipe', report)  # SQL
+
+    def test_download_profile(self):
+        """Test the profile is stored & downloadable by staff only"""
+        res = self.staff_client.get(RECIPES_URL, HTTP_X_PROFILE='download')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [])  # The normal response
+        url = res['X-Profile-URL']
+
+        download = self.staff_client.get(url)
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(download.streaming_content))
+
+        sql = self.staff_client.get(res['X-Profile-SQL-URL'])
+        self.assertIn(b'core_recipe', b''.join(sql.streaming_content))
+
+        other = create_client(is_staff=False).get(url)
+        self.assertEqual(other.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stored_profiles_pruned(self):
+        """Test only the newest PROFILE_MAX_STORED & recent profiles are kept"""  # noqa: E501
+        with override_settings(PROFILE_MAX_STORED=2):
+            urls = [self.staff_client.get(RECIPES_URL, HTTP_X_PROFILE='download')['X-Profile-URL'] for _ in range(3)]  # noqa: E501
+
+        self.assertEqual(len(os.listdir(self.profile_root)), 4)  # 2 x (.prof + .sql.json) # noqa: E501
+        self.assertEqual(self.staff_client.get(urls[0]).status_code, status.HTTP_404_NOT_FOUND)  # noqa: E501
+        self.assertEqual(self.staff_client.get(urls[2]).status_code, status.HTTP_200_OK)  # noqa: E501
+
+        with override_settings(PROFILE_MAX_AGE=-1):
+            self.staff_client.get(RECIPES_URL, HTTP_X_PROFILE='download')
+
+        self.assertEqual(os.listdir(self.profile_root), [])
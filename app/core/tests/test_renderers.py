@@ -0,0 +1,135 @@
+"""
+Tests for the fast JSON renderer & parser
+"""
+
+import json
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipIf
+from unittest.mock import patch
+
+import msgpack
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models.fields.files import FieldFile
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.models import Recipe
+
+
+DATA = {
+    'price': Decimal('12.50'),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'created': datetime(2023, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    'naive': datetime(2023, 5, 1, 12, 30, 15, 123456),
+    'day': date(2023, 5, 1),
+    'at': time(8, 15, 30, 250000),
+    'title': 'Crème brûlée \u2028 🍮',  # U+2028 is escaped by DRF
+    'tags': [{'id': 1, 'name': 'Dessert'}],
+    'empty': None,
+    1: 'int key',
+}
+
+
+@skipIf(renderers.orjson is None, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the fast renderer matches DRF's JSONRenderer"""
+
+    def test_same_bytes(self):
+        """Test Decimal, UUID, datetime & unicode render like DRF"""
+        fast = renderers.FastJSONRenderer().render(DATA)
+
+        self.assertEqual(fast, JSONRenderer().render(DATA))
+
+    def test_indent_falls_back(self):
+        """Test indented output (browsable API) is rendered by DRF"""
+        fast = renderers.FastJSONRenderer().render(DATA, 'application/json; indent=4')  # noqa: E501
+
+        self.assertEqual(fast, JSONRenderer().render(DATA, 'application/json; indent=4'))  # noqa: E501
+
+    def test_huge_integers_fall_back(self):
+        """Test values orjson can't encode are rendered by DRF"""
+        data = {'big': 2 ** 70}
+
+        self.assertEqual(renderers.FastJSONRenderer().render(data), b'{"big":1180591620717411303424}')  # noqa: E501
+
+    def test_parse(self):
+        """Test parsing matches DRF"""
+        body = JSONRenderer().render(DATA)
+
+        fast = renderers.FastJSONParser().parse(BytesIO(body))
+
+        self.assertEqual(fast, JSONParser().parse(BytesIO(body)))
+
+    def test_parse_error(self):
+        """Test invalid JSON & NaN raise a parse error"""
+        for body in (b'{"title": ', b'{"price": NaN}', b''):
+            with self.assertRaises(ParseError):
+                renderers.FastJSONParser().parse(BytesIO(body))
+
+
+class FallbackTests(SimpleTestCase):
+    """Test the renderer & parser without orjson"""
+
+    @patch('core.renderers.orjson', None)
+    def test_without_orjson(self):
+        """Test DRF's implementation is used"""
+        body = renderers.FastJSONRenderer().render(DATA)
+
+        self.assertEqual(body, JSONRenderer().render(DATA))
+        self.assertEqual(
+            renderers.FastJSONParser().parse(BytesIO(body)),
+            JSONParser().parse(BytesIO(body)),
+        )
+
+
+class MessagePackTests(SimpleTestCase):
+    """Test the MessagePack renderer & parser"""
+
+    def test_encoding_rules(self):
+        """Test Decimal, images, UUID & datetime are encoded like the JSON API"""  # noqa: E501
+        data = {**DATA, 'image': FieldFile(None, Recipe._meta.get_field('image'), 'uploads/recipe/a.jpg')}  # noqa: E501
+        del data[1]
+
+        decoded = msgpack.unpackb(renderers.MessagePackRenderer().render(data))
+
+        self.assertEqual(decoded['price'], '12.50')  # Exact, not a float
+        self.assertEqual(decoded['image'], f'{settings.MEDIA_URL}uploads/recipe/a.jpg')  # noqa: E501
+        expected = json.loads(JSONRenderer().render({**data, 'image': decoded['image']}))  # noqa: E501
+        self.assertEqual(decoded, {**expected, 'price': '12.50'})  # DRF's encoder makes raw Decimals floats # noqa: E501
+
+    def test_empty_image(self):
+        """Test a recipe without image encodes nil"""
+        image = FieldFile(None, Recipe._meta.get_field('image'), None)
+
+        self.assertIsNone(msgpack.unpackb(renderers.MessagePackRenderer().render({'image': image}))['image'])  # noqa: E501
+
+    def test_parse(self):
+        """Test round trip & parse errors"""
+        parser = renderers.MessagePackParser()
+
+        self.assertEqual(parser.parse(BytesIO(msgpack.packb({'title': 'Soup', 'price': 1.5}))), {'title': 'Soup', 'price': 1.5})  # noqa: E501
+        for body in (b'', b'\xc1', msgpack.packb(1) + b'extra'):
+            with self.assertRaises(ParseError):
+                parser.parse(BytesIO(body))
+
+
+class JSONBenchmarkTests(TestCase):
+    """Test the JSON benchmark"""
+
+    def test_benchmark(self):
+        """Test the benchmark runs & leaves no data behind"""
+        out = StringIO()
+
+        call_command('benchmark', 'json', '--size', '20', '--repeat', '2', stdout=out)  # noqa: E501
+
+        self.assertIn('render stdlib', out.getvalue())
+        self.assertIn('20 recipes', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())  # Rolled back
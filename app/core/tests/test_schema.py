@@ -0,0 +1,112 @@
+"""
+Tests for the pre-generated OpenAPI schema
+"""
+
+import gzip
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from core import schema
+
+
+SCHEMA_URL = reverse('api-schema')
+
+
+class SchemaViewTests(SimpleTestCase):
+    """Test serving the schema"""
+
+    def setUp(self):
+        schema.get_schema.cache_clear()
+
+    def tearDown(self):
+        schema.get_schema.cache_clear()
+
+    def test_schema_yaml(self):
+        """Test the YAML schema is served with an ETag"""
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/vnd.oai.openapi')
+        self.assertIn(b'/api/recipe/recipes/', res.content)
+        self.assertTrue(res.has_header('ETag'))
+
+    def test_schema_json(self):
+        """Test the JSON schema is served with `?format=json`"""
+        res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('/api/recipe/recipes/', res.json()['paths'])
+
+    def test_schema_advertises_msgpack(self):
+        """Test request & response bodies list the MessagePack media type"""
+        paths = self.client.get(SCHEMA_URL, {'format': 'json'}).json()['paths']
+
+        recipes = paths['/api/recipe/recipes/']['post']
+        self.assertIn('application/msgpack', recipes['requestBody']['content'])
+        self.assertIn('application/msgpack', recipes['responses']['201']['content'])  # noqa: E501
+        self.assertIn('application/msgpack', paths['/api/user/token/']['post']['requestBody']['content'])  # noqa: E501
+
+    def test_schema_not_modified(self):
+        """Test a matching If-None-Match returns 304"""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    @patch('core.schema.generate_schema', wraps=schema.generate_schema)
+    def test_schema_generated_once(self, patched_generate):
+        """Test the schema is generated once per process"""
+        self.client.get(SCHEMA_URL)
+        self.client.get(SCHEMA_URL)
+
+        self.assertLessEqual(patched_generate.call_count, 1)
+
+
+class BuildSchemaCommandTests(SimpleTestCase):
+    """Test the build_schema command"""
+
+    def setUp(self):
+        self.schema_root = tempfile.mkdtemp()
+        self.override = override_settings(SCHEMA_ROOT=self.schema_root)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+
+    def test_build_writes_files(self):
+        """Test the command writes the schema for the current code version"""
+        call_command('build_schema')
+
+        contents = schema.read_schema_files()
+        self.assertIsNotNone(contents)
+        self.assertIn(b'openapi', contents['yaml'])
+        with gzip.open(os.path.join(self.schema_root, 'schema.yml.gz')) as gz_file:  # noqa: E501
+            self.assertEqual(gz_file.read(), contents['yaml'])  # Sent by nginx (`gzip_static`) # noqa: E501
+
+    @patch('core.schema.generate_schema', wraps=schema.generate_schema)
+    def test_build_skipped_when_up_to_date(self, patched_generate):
+        """Test the schema is not regenerated for the same code version"""
+        call_command('build_schema')
+        call_command('build_schema')
+
+        self.assertEqual(patched_generate.call_count, 1)
+
+    @patch('core.schema.generate_schema', wraps=schema.generate_schema)
+    def test_build_after_code_change(self, patched_generate):
+        """Test a new code version regenerates the schema"""
+        call_command('build_schema')
+
+        with patch('core.schema.code_version', return_value='new-version'):
+            self.assertIsNone(schema.read_schema_files())  # Stale
+            call_command('build_schema')
+
+        self.assertEqual(patched_generate.call_count, 2)
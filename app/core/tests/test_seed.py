@@ -0,0 +1,100 @@
+"""
+Tests for the seed_data command
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, F
+from django.test import TestCase
+
+from core import seed
+from core.models import User, Recipe, Tag, Ingredient
+
+
+def run_seed(**options):
+    """Seed a small dataset (single process, inside the test transaction)."""
+    defaults = {'users': 5, 'recipes': 200, 'processes': 1, 'batch_size': 50, 'chunk_size': 2}  # noqa: E501
+    defaults.update(options)
+    call_command('seed_data', stdout=StringIO(), **defaults)
+
+
+class SeedDataTests(TestCase):
+    """Test generating benchmark data"""
+
+    def test_seed_counts(self):
+        """Test the requested number of users & recipes are created"""
+        run_seed()
+
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Recipe.objects.count(), 200)
+        self.assertTrue(Tag.objects.exists())
+        self.assertTrue(Ingredient.objects.exists())
+
+    def test_seeded_users_can_log_in(self):
+        """Test the shared password hash is valid"""
+        run_seed(password='shared-pass')
+
+        for user in User.objects.all():
+            self.assertTrue(user.check_password('shared-pass'))
+
+    def test_relations_belong_to_recipe_owner(self):
+        """Test recipes only use tags & ingredients of their own user"""
+        run_seed()
+
+        tag_links = Recipe.tags.through.objects
+        ingredient_links = Recipe.ingredients.through.objects
+
+        self.assertFalse(tag_links.exclude(tag__user=F('recipe__user')).exists())  # noqa: E501
+        self.assertFalse(
+            ingredient_links.exclude(ingredient__user=F('recipe__user')).exists()  # noqa: E501
+        )
+        self.assertFalse(Recipe.objects.filter(tags__isnull=True).exists())
+
+    def test_popularity_is_skewed(self):
+        """Test the most popular tag is used far more than an average one"""
+        run_seed(users=3, recipes=1000, tags=50)
+
+        counts = list(
+            Tag.objects.values('name')
+            .annotate(uses=Count('recipe'))
+            .order_by('-uses')
+            .values_list('uses', flat=True)
+        )
+        self.assertGreater(counts[0], 5 * (sum(counts) / len(counts)))
+
+    def test_new_rows_after_seed(self):
+        """Test sequences continue after the seeded IDs"""
+        run_seed()
+        user = User.objects.first()
+
+        recipe = Recipe.objects.create(user=user, title='New', time_minutes=1, price=1)  # noqa: E501
+
+        self.assertGreater(recipe.id, Recipe.objects.exclude(id=recipe.id).order_by('-id')[0].id)  # noqa: E501
+
+    def test_same_seed_twice_rejected(self):
+        """Test loading the same seed twice fails (emails are unique)"""
+        run_seed()
+
+        with self.assertRaises(CommandError):
+            run_seed()
+
+    def test_deterministic(self):
+        """Test the same seed produces the same data"""
+        run_seed(seed=7, chunk_size=1)
+        first = list(Recipe.objects.order_by('id').values_list('title', 'time_minutes', 'price'))  # noqa: E501
+        Recipe.objects.all().delete()
+        User.objects.all().delete()
+
+        run_seed(seed=7, chunk_size=5)  # Different chunking, same data
+        second = list(Recipe.objects.order_by('id').values_list('title', 'time_minutes', 'price'))  # noqa: E501
+
+        self.assertEqual(first, second)
+
+    def test_split_recipes(self):
+        """Test every recipe is assigned to a user"""
+        counts = seed.recipes_per_user(1, users=7, recipes=1000)
+
+        self.assertEqual(sum(counts), 1000)
+        self.assertEqual(counts, seed.recipes_per_user(1, users=7, recipes=1000))  # noqa: E501
@@ -0,0 +1,303 @@
+"""
+Tests for the user shards
+"""
+
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings  # noqa: E501
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import db_routers, sharding
+from core.models import Recipe, SimilarityIndex, Tag, SlowQuery
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SHARDS = ['shard_1', 'shard_2']
+
+
+class HashRingTests(SimpleTestCase):
+    """Test users are spread evenly & stay put"""
+
+    def test_even_spread(self):
+        """Test every shard gets about the same share of the users"""
+        ring = sharding.HashRing(['shard_1', 'shard_2', 'shard_3'])
+
+        shares = [ring.node_for(user_id) for user_id in range(30000)]
+
+        for alias in ('shard_1', 'shard_2', 'shard_3'):
+            self.assertAlmostEqual(shares.count(alias) / 30000, 1 / 3, delta=0.08)  # noqa: E501
+
+    def test_new_shard_only_takes_users(self):
+        """Test adding a shard moves ~1/N of the users, all of them to it"""
+        before = sharding.HashRing(['shard_1', 'shard_2', 'shard_3'])
+        after = sharding.HashRing(['shard_1', 'shard_2', 'shard_3', 'shard_4'])  # noqa: E501
+
+        moved = [
+            after.node_for(user_id) for user_id in range(30000)
+            if before.node_for(user_id) != after.node_for(user_id)
+        ]
+
+        self.assertAlmostEqual(len(moved) / 30000, 1 / 4, delta=0.08)
+        self.assertEqual(set(moved), {'shard_4'})
+
+    def test_id_ranges(self):
+        """Test every shard numbers its rows in its own range"""
+        self.assertEqual(sharding.id_range('default'), (0, 2 ** 40))
+        self.assertEqual(sharding.id_range('shard_2'), (2 * 2 ** 40, 3 * 2 ** 40))  # noqa: E501
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_no_shards(self):
+        """Test users aren't placed anywhere without shards"""
+        self.assertIsNone(sharding.ring_shard(1))
+
+
+class ShardRouterTests(SimpleTestCase):
+    """Test the router only moves the sharded models"""
+
+    def setUp(self):
+        self.router = db_routers.ShardRouter()
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_request_shard(self):
+        """Test recipes follow the request's user, other models don't"""
+        with sharding.use_shard('shard_2'):
+            self.assertEqual(self.router.db_for_read(Recipe), 'shard_2')
+            self.assertEqual(self.router.db_for_write(Recipe.tags.through), 'shard_2')  # noqa: E501
+            self.assertIsNone(self.router.db_for_read(get_user_model()))
+            self.assertIsNone(self.router.db_for_write(SlowQuery))
+
+        self.assertIsNone(self.router.db_for_read(Recipe))  # Reset after the block # noqa: E501
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_instance_hints(self):
+        """Test related rows go to the database of the row they belong to"""
+        user = get_user_model()(pk=1, shard='shard_1')
+        tag = Tag(user=user)
+        tag._state.db = 'shard_2'
+
+        self.assertEqual(self.router.db_for_read(Recipe, instance=user), 'shard_1')  # noqa: E501
+        self.assertEqual(self.router.db_for_write(Recipe.tags.through, instance=tag), 'shard_2')  # noqa: E501
+        self.assertEqual(self.router.db_for_write(Tag, instance=Tag(user=user)), 'shard_1')  # noqa: E501
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_no_shards(self):
+        """Test nothing is routed without shards"""
+        with sharding.use_shard('shard_1'):
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+
+@override_settings(DATABASE_SHARDS=[])
+class UnshardedAdminTests(TestCase):
+    """Test the admin pages of sharded models without shards"""
+
+    def setUp(self):
+        self.admin_user = get_user_model().objects.create_superuser('admin@example.com', 'testpass123')  # noqa: E501
+        self.client.force_login(self.admin_user)
+        self.recipe = Recipe.objects.create(user=self.admin_user, title='Soup', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+
+    def test_pages(self):
+        """Test list, change & add page work as before"""
+        for url in (
+            reverse('admin:core_recipe_changelist'),
+            reverse('admin:core_recipe_change', args=[self.recipe.id]),
+            reverse('admin:core_recipe_add'),
+        ):
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, 200)
+
+
+# Run with SQLite files standing in for the databases, i.e.
+# DB_ENGINE=django.db.backends.sqlite3 DB_NAME=default.sqlite3 \
+#   DB_SHARDS=shard1.sqlite3,shard2.sqlite3 python manage.py test core.tests.test_sharding # noqa: E501
+@skipUnless('shard_2' in settings.DATABASES, 'Requires two shard databases.')  # noqa: E501
+class ShardIntegrationTests(TransactionTestCase):
+    """Test data lands on, is read from & moves between real shards"""
+
+    databases = {'default'} | set(SHARDS).intersection(settings.DATABASES)
+    # ^Test runner collects `databases` even from skipped classes
+
+    def setUp(self):
+        self.users = {}  # {shard: user}
+        for number in range(20):  # Until there is a user on each shard
+            user = get_user_model().objects.create_user(email=f'user{number}@example.com', password='testpass123')  # noqa: E501
+            self.users.setdefault(user.shard, user)
+            if len(self.users) == 2:
+                break
+        self.user = self.users['shard_1']
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, **params):
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': Decimal('1.00'), 'tags': [{'name': 'Dinner'}]}  # noqa: E501
+        payload.update(params)
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def test_api_uses_user_shard(self):
+        """Test a user's recipes are written to & read from its shard only"""
+        recipe_id = self.create_recipe()
+
+        recipe = Recipe.objects.using('shard_1').get(id=recipe_id)
+        self.assertEqual([tag.name for tag in recipe.tags.all()], ['Dinner'])
+        self.assertFalse(Recipe.objects.using('shard_2').exists())
+        self.assertFalse(Recipe.objects.using('default').exists())
+        self.assertEqual(recipe_id >> sharding.SHARD_ID_BITS, 1)  # Shard aware ID # noqa: E501
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual([item['id'] for item in res.data], [recipe_id])
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Dinner')
+        res = self.client.get(reverse('recipe:recipe-export'))
+        self.assertEqual(len(b''.join(res.streaming_content).splitlines()), 1)  # noqa: E501
+
+    def test_delete_user(self):
+        """Test the user's data on its shard goes with it"""
+        self.create_recipe()
+
+        self.user.delete()
+
+        self.assertFalse(Recipe.objects.using('shard_1').exists())
+        self.assertFalse(Tag.objects.using('shard_1').exists())
+
+    def test_rebalance(self):
+        """Test the command moves data from before sharding to the user's shard"""  # noqa: E501
+        with sharding.use_shard('default'):
+            recipe = Recipe.objects.create(user=self.user, title='Old', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+            recipe.tags.add(Tag.objects.create(user=self.user, name='Old tag'))  # noqa: E501
+        get_user_model().objects.filter(pk=self.user.pk).update(shard='')
+        out = StringIO()
+
+        call_command('rebalance_shards', stdout=out)
+
+        self.assertIn('default >> shard_1: 1 users', out.getvalue())
+        self.assertFalse(Recipe.objects.using('default').exists())
+        moved = Recipe.objects.using('shard_1').get()
+        self.assertEqual(moved.id, recipe.id)  # IDs (API URLs) don't change
+        self.assertEqual([tag.name for tag in moved.tags.all()], ['Old tag'])
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).shard, 'shard_1')  # noqa: E501
+
+    def test_move_cancelled_by_writes(self):
+        """Test a user writing during its move stays where it was"""
+        self.create_recipe()
+        self.user.refresh_from_db()
+
+        with patch.object(sharding, 'fingerprint', side_effect=[[1], [2]]):
+            with self.assertRaises(sharding.ShardMoveError):
+                sharding.move_user(self.user, 'default')
+
+        self.assertTrue(Recipe.objects.using('shard_1').exists())
+        self.assertFalse(Recipe.objects.using('default').exists())
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual((user.shard, user.moving), ('shard_1', False))
+
+    def test_writes_fenced_during_move(self):
+        """Test the user's writes are refused from the start of the copy to the switch, reads are not"""  # noqa: E501
+        with sharding.use_shard('default'):
+            recipe = Recipe.objects.create(user=self.user, title='Old', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+        get_user_model().objects.filter(pk=self.user.pk).update(shard='')
+        self.user.refresh_from_db()
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        responses = []
+
+        def copy_rows(*args):
+            if not responses:
+                responses.extend([
+                    self.client.patch(url, {'title': 'Edited'}),
+                    self.client.post(RECIPES_URL, {'title': 'New', 'time_minutes': 5, 'price': '1.00'}),  # noqa: E501
+                    self.client.get(url),
+                ])
+            return original(*args)
+
+        original = sharding.copy_rows
+        with patch.object(sharding, 'copy_rows', side_effect=copy_rows):
+            sharding.move_user(self.user, 'shard_1')
+
+        self.assertEqual([res.status_code for res in responses], [503, 503, 200])  # noqa: E501
+        self.assertEqual(responses[0]['Retry-After'], '10')
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual((user.shard, user.moving), ('shard_1', False))
+        res = self.client.patch(url, {'title': 'Edited'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.using('shard_1').get().title, 'Edited')  # noqa: E501
+
+    def test_admin_fenced_during_move(self):
+        """Test the admin can't edit the rows of a user being moved"""
+        recipe_id = self.create_recipe()
+        admin_user = get_user_model().objects.create_superuser('admin@example.com', 'testpass123')  # noqa: E501
+        self.client.force_login(admin_user)
+        get_user_model().objects.filter(pk=self.user.pk).update(moving=True)
+
+        res = self.client.post(reverse('admin:core_recipe_delete', args=[recipe_id]), {'post': 'yes'})  # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(Recipe.objects.using('shard_1').exists())
+
+    def test_stale_user_keeps_move(self):
+        """Test saving a user loaded before its move doesn't point it back"""
+        with sharding.use_shard('default'):
+            Recipe.objects.create(user=self.user, title='Old', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+        get_user_model().objects.filter(pk=self.user.pk).update(shard='')
+        self.user.refresh_from_db()
+        stale = get_user_model().objects.get(pk=self.user.pk)
+
+        sharding.move_user(self.user, 'shard_1')
+        stale.name = 'Renamed'
+        stale.save()
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual((user.name, user.shard), ('Renamed', 'shard_1'))
+
+    def test_switch_after_copy_committed(self):
+        """Test the user is switched only once its copy is committed, after a last check"""  # noqa: E501
+        with sharding.use_shard('default'):
+            Recipe.objects.create(user=self.user, title='Old', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+        get_user_model().objects.filter(pk=self.user.pk).update(shard='')
+        self.user.refresh_from_db()
+        checks = []
+
+        def check(alias, user_id):
+            checks.append(connections['shard_1'].in_atomic_block)
+            return [1]
+
+        with patch.object(sharding, 'fingerprint', side_effect=check):
+            sharding.move_user(self.user, 'shard_1')
+
+        self.assertEqual(checks, [False, False])  # Before & after the copy's transaction # noqa: E501
+        self.assertTrue(Recipe.objects.using('shard_1').exists())
+        self.assertFalse(Recipe.objects.using('default').exists())
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).shard, 'shard_1')  # noqa: E501
+
+    def test_admin_fan_out(self):
+        """Test the admin counts every shard & finds a recipe on any of them"""
+        recipe_id = self.create_recipe(title='Sharded soup')
+        admin_user = get_user_model().objects.create_superuser('admin@example.com', 'testpass123')  # noqa: E501
+        self.client.force_login(admin_user)
+
+        res = self.client.get(reverse('admin:core_recipe_changelist'), {'shard': 'shard_1'})  # noqa: E501
+        self.assertContains(res, 'Sharded soup')
+        self.assertContains(res, 'shard_1 (1)')
+        self.assertContains(res, 'shard_2 (0)')
+
+        res = self.client.get(reverse('admin:core_recipe_change', args=[recipe_id]))  # noqa: E501
+        self.assertContains(res, 'Sharded soup')
+
+    def test_similar_recipes(self):
+        """Test the similar recipes index reads the user's shard (stored on `default`)"""  # noqa: E501
+        recipe_id = self.create_recipe()
+        other_id = self.create_recipe(title='Stew')
+
+        res = self.client.get(reverse('recipe:recipe-similar', args=[recipe_id]))  # noqa: E501
+
+        self.assertEqual([item['id'] for item in res.data], [other_id])
+        self.assertTrue(SimilarityIndex.objects.using('default').filter(user=self.user).exists())  # noqa: E501
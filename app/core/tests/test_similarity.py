@@ -0,0 +1,111 @@
+"""
+Tests for the similar recipes index
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core import similarity
+from core.models import Ingredient, Recipe, SimilarityIndex, Tag
+
+
+class RecipeIndexTests(SimpleTestCase):
+    """Test the recipe × feature matrix"""
+
+    def setUp(self):
+        self.index = similarity.RecipeIndex.from_links(
+            [1, 1, 1, 2, 2, 3, 4],
+            [10, 20, 30, 10, 20, 10, 40],
+        )
+
+    def test_top_k(self):
+        """Test scores of both metrics, best first, the recipe itself left out"""  # noqa: E501
+        keys = self.index.recipe_features(1)
+
+        self.assertEqual(self.index.top_k(keys, 5, exclude=1), [(2, 2 / 3), (3, 1 / 3)])  # noqa: E501
+        cosine = self.index.top_k(keys, 5, 'cosine', exclude=1)
+        self.assertAlmostEqual(cosine[0][1], 2 / 6 ** 0.5)
+        self.assertEqual(self.index.top_k([99], 5), [])  # Unknown feature
+
+    def test_ties(self):
+        """Test equal scores keep the newest recipes when cut at k"""
+        index = similarity.RecipeIndex.from_links([1, 2, 3, 4], [10, 10, 10, 10])  # noqa: E501
+
+        self.assertEqual([recipe_id for recipe_id, _ in index.top_k([10], 2)], [4, 3])  # noqa: E501
+
+    def test_dumps(self):
+        """Test the stored form loads back to the same matrix"""
+        index = similarity.RecipeIndex.loads(self.index.dumps())
+
+        self.assertEqual(index.recipe_ids.tolist(), [1, 2, 3, 4])
+        self.assertEqual((index.matrix != self.index.matrix).nnz, 0)
+        self.assertEqual(len(similarity.RecipeIndex.loads(b'')), 0)
+
+
+class SimilarRecipesTests(TestCase):
+    """Test the answers with & without a fresh index"""
+
+    def test_same_without_index(self):
+        """Test the recipes sharing a feature (no index) score like the index"""  # noqa: E501
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        tags = [Tag.objects.create(user=user, name=f'Tag {number}') for number in range(4)]  # noqa: E501
+        ingredients = [Ingredient.objects.create(user=user, name=f'Ingredient {number}') for number in range(6)]  # noqa: E501
+        rng = np.random.default_rng(1)
+        recipes = []
+        for number in range(40):
+            recipe = Recipe.objects.create(user=user, title=f'Recipe {number}', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+            recipe.tags.set(rng.choice(tags, size=rng.integers(0, 3), replace=False))  # noqa: E501
+            recipe.ingredients.set(rng.choice(ingredients, size=rng.integers(0, 4), replace=False))  # noqa: E501
+            recipes.append(recipe)
+
+        without = [similarity.similar_recipes(user, recipe, 5, metric) for recipe in recipes for metric in ('jaccard', 'cosine')]  # noqa: E501
+        similarity.build(user)
+        self.assertIsNotNone(similarity.fresh_index(user))
+
+        self.assertEqual(without, [similarity.similar_recipes(user, recipe, 5, metric) for recipe in recipes for metric in ('jaccard', 'cosine')])  # noqa: E501
+
+    def test_writes_mark_stale(self):
+        """Test `mark_stale()` leaves the index to the background rebuild"""
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        similarity.build(user)
+
+        similarity.mark_stale(user.pk)
+
+        self.assertIsNone(similarity.fresh_index(user))
+        self.assertEqual(similarity.rebuild_due(), 1)
+        self.assertIsNotNone(similarity.fresh_index(user))
+
+
+class SimilarityIndexCommandTests(TestCase):
+    """Test the background rebuilds"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        recipe = Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+
+    def test_rebuilds_old_indexes(self):
+        """Test only indexes past SIMILARITY_MAX_AGE are rebuilt"""
+        similarity.build(self.user)
+        out = StringIO()
+
+        call_command('similarity_index', stdout=out)
+        self.assertIn('Rebuilt 0 indexes', out.getvalue())
+
+        SimilarityIndex.objects.update(built_at=timezone.now() - timedelta(days=2))  # noqa: E501
+        call_command('similarity_index', stdout=out)
+        self.assertIn('Rebuilt 1 indexes', out.getvalue())
+
+    def test_all(self):
+        """Test `--all` builds the index of every user"""
+        call_command('similarity_index', '--all', stdout=StringIO())
+
+        self.assertEqual(SimilarityIndex.objects.get(user=self.user).recipes, 1)  # noqa: E501
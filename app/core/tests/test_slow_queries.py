@@ -0,0 +1,104 @@
+"""
+Tests for the slow query log
+"""
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import Recipe, SlowQuery
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class FingerprintTests(TestCase):
+    """Test normalizing SQL into fingerprints"""
+
+    def test_values_removed(self):
+        """Test queries differing only by their values share a fingerprint"""
+        first = slow_queries.normalize("SELECT * FROM t WHERE id = 1 AND name = 'a'")  # noqa: E501
+        second = slow_queries.normalize("SELECT  *\nFROM t WHERE id = 22 AND name = 'b''c'")  # noqa: E501
+
+        self.assertEqual(first, 'SELECT * FROM t WHERE id = ? AND name = ?')
+        self.assertEqual(first, second)
+
+    def test_in_lists_collapsed(self):
+        """Test IN lists of any length share a fingerprint"""
+        first = slow_queries.normalize('SELECT * FROM t WHERE id IN (%s)')
+        second = slow_queries.normalize('SELECT * FROM t WHERE id IN (%s, %s, %s)')  # noqa: E501
+
+        self.assertEqual(first, 'SELECT * FROM t WHERE id IN (...)')
+        self.assertEqual(slow_queries.fingerprint(first), slow_queries.fingerprint(second))  # noqa: E501
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_ASYNC=False)
+class SlowQueryLogTests(TestCase):
+    """Test recording slow queries (every query is 'slow' with threshold 0)"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_queries_recorded(self):
+        """Test queries are grouped with their view & explained"""
+        Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=1)  # noqa: E501
+
+        res = self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        slow_query = SlowQuery.objects.get(
+            sql__startswith='SELECT',
+            sql__contains='FROM "core_recipe"',
+            origin__startswith='RecipeViewSet.list',
+        )
+        self.assertEqual(slow_query.calls, 2)
+        self.assertGreaterEqual(slow_query.total_ms, slow_query.max_ms)
+        self.assertTrue(slow_query.explain)
+
+    def test_code_location_recorded(self):
+        """Test queries outside requests point at the code running them"""
+        Recipe.objects.filter(title='Soup').exists()
+
+        slow_query = SlowQuery.objects.get(sql__contains='"core_recipe"."title" = ?')  # noqa: E501
+        self.assertIn('core/tests/test_slow_queries.py', slow_query.origin)
+        self.assertIn('test_code_location_recorded', slow_query.origin)
+
+    def test_own_queries_not_recorded(self):
+        """Test writing the log does not log itself"""
+        Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=1)  # noqa: E501
+
+        self.assertFalse(SlowQuery.objects.filter(sql__contains='core_slowquery').exists())  # noqa: E501
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled(self):
+        """Test nothing is recorded without a threshold"""
+        SlowQuery.objects.all().delete()  # Queries of setUp()
+
+        self.client.get(RECIPES_URL)
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_command(self):
+        """Test the report lists the recorded queries"""
+        self.client.get(RECIPES_URL)
+        out = StringIO()
+
+        call_command('slow_queries', '--explain', '--order', 'calls', stdout=out)  # noqa: E501
+
+        self.assertIn('RecipeViewSet.list', out.getvalue())
+
+        call_command('slow_queries', '--reset', stdout=StringIO())
+        self.assertFalse(SlowQuery.objects.exists())
@@ -0,0 +1,90 @@
+"""
+Tests for the static files storage (hashed names & precompressed siblings)
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import skipIf
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+from django.utils.functional import empty
+
+from core import compression
+
+
+CSS = b'body { background: url("logo.svg"); }\n' + b'.recipe { color: #333; }\n' * 100  # noqa: E501
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"></svg>\n'  # Small
+PNG = os.urandom(2048)  # Not compressible
+
+
+class CompressedManifestStorageTests(SimpleTestCase):
+    """Test `collectstatic` hashes names & writes compressed siblings"""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        for name, content in (('app.css', CSS), ('logo.svg', SVG), ('photo.png', PNG)):  # noqa: E501
+            with open(os.path.join(self.source, name), 'wb') as static_file:
+                static_file.write(content)
+
+        self.override = override_settings(
+            STATIC_ROOT=self.static_root,
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],  # noqa: E501
+            STATIC_PRECOMPRESS_EXTENSIONS=['.css', '.svg', '.png'],
+            COMPRESSION_MIN_SIZE=1024,
+        )
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.source)
+        shutil.rmtree(self.static_root)
+
+    def collect(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        staticfiles_storage._wrapped = empty  # Reload the manifest
+
+    def test_original_names_without_manifest(self):
+        """Test URLs aren't hashed before `collectstatic` ran"""
+        self.assertEqual(static('app.css'), '/static/static/app.css')
+
+    def test_hashed_names(self):
+        """Test URLs point to hashed copies with rewritten references"""
+        self.collect()
+
+        url = static('app.css')
+        name = url[len('/static/static/'):]
+        with open(os.path.join(self.static_root, name), 'rb') as css_file:
+            content = css_file.read()
+
+        self.assertRegex(url, r'^/static/static/app\.[0-9a-f]{12}\.css$')
+        self.assertIn(os.path.basename(static('logo.svg')).encode(), content)
+
+    def test_compressed_siblings(self):
+        """Test large compressible files get a .gz sibling, others don't"""
+        self.collect()
+
+        css = os.path.join(self.static_root, staticfiles_storage.stored_name('app.css'))  # noqa: E501
+        svg = os.path.join(self.static_root, staticfiles_storage.stored_name('logo.svg'))  # noqa: E501
+        png = os.path.join(self.static_root, staticfiles_storage.stored_name('photo.png'))  # noqa: E501
+
+        with open(css, 'rb') as css_file, gzip.open(css + '.gz') as gz_file:
+            self.assertEqual(gz_file.read(), css_file.read())
+        self.assertFalse(os.path.exists(svg + '.gz'))  # Too small
+        self.assertFalse(os.path.exists(png + '.gz'))  # Bigger once compressed
+        self.assertFalse(os.path.exists(os.path.join(self.static_root, 'app.css.gz')))  # Only hashed names # noqa: E501
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli_sibling(self):
+        """Test a .br sibling is written when brotli is installed"""
+        self.collect()
+
+        css = os.path.join(self.static_root, staticfiles_storage.stored_name('app.css'))  # noqa: E501
+        with open(css, 'rb') as css_file, open(css + '.br', 'rb') as br_file:
+            self.assertEqual(compression.brotli.decompress(br_file.read()), css_file.read())  # noqa: E501
@@ -0,0 +1,150 @@
+"""
+Tests for the uWSGI configuration, per route harakiri & stats
+"""
+
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import uwsgi
+
+
+GiB = 2 ** 30
+STATS = {
+    'listen_queue': 3,
+    'listen_queue_errors': 1,
+    'workers': [
+        {'id': 1, 'status': 'busy', 'rss': 120 * 2 ** 20, 'requests': 10, 'harakiri_count': 0},  # noqa: E501
+        {'id': 2, 'status': 'idle', 'rss': 110 * 2 ** 20, 'requests': 7, 'harakiri_count': 1},  # noqa: E501
+        {'id': 3, 'status': 'cheap', 'rss': 0, 'requests': 0, 'harakiri_count': 0},  # noqa: E501
+    ],
+}
+
+
+@patch('os.sched_getaffinity', return_value=set(range(16)))  # 16 CPU host
+class UWSGIOptionsTests(SimpleTestCase):
+    """Test uWSGI is sized from the container's limits"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.somaxconn = os.path.join(self.root, 'somaxconn')
+        self.meminfo = os.path.join(self.root, 'meminfo')
+        self.write('meminfo', f'MemTotal:       {64 * GiB // 1024} kB\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as cgroup_file:
+            cgroup_file.write(content)
+
+    def options(self, **environ):
+        return dict(uwsgi.uwsgi_options(environ, self.root, self.somaxconn, self.meminfo))  # noqa: E501
+
+    def test_cgroup_v2(self, _):
+        """Test a 2 CPU / 2 GiB container gets 4 workers"""
+        self.write('cpu.max', '150000 100000')  # 1.5 CPUs >> 2
+        self.write('memory.max', str(2 * GiB))
+
+        options = self.options()
+
+        self.assertEqual(options['workers'], 4)
+        self.assertNotIn('threads', options)
+        self.assertEqual(options['cheaper'], 1)
+        self.assertEqual(options['reload-on-rss'], 300)  # 2x 150 MB (share: 384 MB) # noqa: E501
+
+    def test_cgroup_v1_memory_bound(self, _):
+        """Test threads make up for the workers that don't fit in memory"""
+        self.write('cpu/cpu.cfs_quota_us', '400000')  # 4 CPUs
+        self.write('cpu/cpu.cfs_period_us', '100000')
+        self.write('memory/memory.limit_in_bytes', str(512 * 2 ** 20))
+
+        options = self.options()
+
+        self.assertEqual(options['workers'], 2)  # 384 MB usable / 150 MB
+        self.assertEqual(options['threads'], 4)  # 8 requests at a time
+        self.assertEqual(options['reload-on-rss'], 192)  # Its share of the memory # noqa: E501
+
+    def test_no_limits(self, _):
+        """Test the host's CPUs & memory are used without cgroup limits"""
+        self.write('cpu.max', 'max 100000')
+        self.write('memory.max', 'max')
+
+        self.assertEqual(self.options()['workers'], 32)
+
+    def test_environment_overrides(self, _):
+        """Test every derived value can be set explicitly"""
+        self.write('somaxconn', '128')
+
+        options = self.options(APP_WORKERS='3', APP_THREADS='2', APP_CHEAPER='0', APP_RELOAD_ON_RSS_MB='0', APP_LISTEN='4096')  # noqa: E501
+
+        self.assertEqual((options['workers'], options['threads']), (3, 2))
+        self.assertNotIn('cheaper', options)
+        self.assertNotIn('reload-on-rss', options)
+        self.assertEqual(options['listen'], 128)  # Capped by the kernel
+
+    def test_command(self, _):
+        """Test the command writes an ini file"""
+        out = StringIO()
+
+        call_command('uwsgi_config', stdout=out)
+
+        self.assertTrue(out.getvalue().startswith('[uwsgi]\n'))
+        self.assertIn('module = app.wsgi\n', out.getvalue())
+        self.assertIn('harakiri = 300\n', out.getvalue())  # Longest route class # noqa: E501
+
+    def test_command_workers(self, _):
+        """Test `--workers` prints only the worker count (uvicorn, ASGI mode)"""  # noqa: E501
+        out = StringIO()
+
+        with patch.dict(os.environ, {'APP_WORKERS': '3'}):
+            call_command('uwsgi_config', '--workers', stdout=out)
+
+        self.assertEqual(out.getvalue(), '3\n')
+
+
+class HarakiriTests(SimpleTestCase):
+    """Test every route class gets its own harakiri"""
+
+    def test_route_classes(self):
+        """Test the first matching route class wins"""
+        self.assertEqual(uwsgi.harakiri_seconds('/api/recipe/recipes/export/'), 300)  # noqa: E501
+        self.assertEqual(uwsgi.harakiri_seconds('/api/recipe/recipes/1/upload-image/'), 60)  # noqa: E501
+        self.assertEqual(uwsgi.harakiri_seconds('/api/recipe/recipes/'), 30)
+
+    @patch.object(uwsgi, 'uwsgi_api')
+    def test_set_and_cleared(self, uwsgi_api):
+        """Test the middleware sets it & it is cleared when the request ends"""  # noqa: E501
+        self.client.get('/api/schema/')
+
+        self.assertEqual(uwsgi_api.set_user_harakiri.call_args_list[0].args, (30,))  # noqa: E501
+        self.assertEqual(uwsgi_api.set_user_harakiri.call_args_list[-1].args, (0,))  # noqa: E501
+
+
+class UWSGIStatsTests(SimpleTestCase):
+    """Test uWSGI stats are exposed to Prometheus"""
+
+    @patch.object(uwsgi, 'uwsgi_api', Mock())
+    @patch.object(uwsgi, 'read_stats', return_value=STATS)
+    def test_scraped(self, _):
+        """Test workers, listen queue & memory are in the scrape"""
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('uwsgi_listen_queue 3.0', body)
+        self.assertIn('uwsgi_workers{status="busy"} 1.0', body)
+        self.assertIn('uwsgi_workers{status="cheap"} 1.0', body)
+        self.assertIn('uwsgi_worker_rss_bytes{worker="1"} 1.2582912e+08', body)  # noqa: E501
+        self.assertIn('uwsgi_worker_harakiri_total{worker="2"} 1.0', body)
+
+    def test_not_running(self):
+        """Test no stats without a uWSGI master"""
+        self.assertIsNone(uwsgi.read_stats('127.0.0.1:1'))
@@ -0,0 +1,217 @@
+"""
+uWSGI configuration, per route harakiri & stats (used by scripts/run.sh)
+
+`manage.py uwsgi_config` writes the uWSGI ini file at startup, sized from
+the container's limits (cgroup v2 or v1, the host's otherwise):
+
+- concurrency: APP_CONCURRENCY_PER_CPU requests per CPU of the quota
+- workers: as many as that, but only as many as fit in the memory limit
+  (APP_WORKER_MEMORY_MB each), threads make up for the missing ones
+- cheaper: idle workers are stopped, down to APP_CHEAPER of them
+- reload-on-rss: a worker growing past its share of the memory is recycled
+  (APP_RELOAD_ON_RSS_MB)
+- listen: APP_LISTEN, capped by the kernel's somaxconn (uWSGI refuses more)
+- stats: JSON stats socket, read by the Prometheus endpoint (`collect`)
+- attach-daemon: the similar recipes index rebuilder (core/similarity.py)
+
+Every value can be overridden through the environment. The names start
+with APP_ because uWSGI itself reads UWSGI_* variables as options.
+"""
+
+import json
+import math
+import os
+import re
+import socket
+
+from django.conf import settings
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+try:
+    import uwsgi as uwsgi_api  # Only importable inside uWSGI workers
+except ImportError:
+    uwsgi_api = None
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+SOMAXCONN = '/proc/sys/net/core/somaxconn'
+MEMINFO = '/proc/meminfo'
+UNLIMITED = 2 ** 60  # cgroup v1 "no limit" is a huge number, not `max`
+
+
+def read(path):
+    try:
+        with open(path) as source:
+            return source.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit(root=CGROUP_ROOT):
+    """CPUs the container may use (quota / period), a fraction is rounded up."""  # noqa: E501
+    quota = read(os.path.join(root, 'cpu.max'))  # v2: "<quota> <period>" or "max <period>" # noqa: E501
+    if quota is not None:
+        quota, _, period = quota.partition(' ')
+    else:  # v1
+        quota = read(os.path.join(root, 'cpu', 'cpu.cfs_quota_us'))
+        period = read(os.path.join(root, 'cpu', 'cpu.cfs_period_us'))
+
+    cpus = len(os.sched_getaffinity(0))  # CPUs we may run on (cpuset)
+    if quota and quota not in ('max', '-1') and period:
+        cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    return max(cpus, 1)
+
+
+def memory_limit(root=CGROUP_ROOT, meminfo=MEMINFO):
+    """Bytes of memory the container may use (the host's memory without a limit)."""  # noqa: E501
+    limit = read(os.path.join(root, 'memory.max'))  # v2
+    if limit is None:
+        limit = read(os.path.join(root, 'memory', 'memory.limit_in_bytes'))  # v1 # noqa: E501
+    if limit and limit != 'max' and int(limit) < UNLIMITED:
+        return int(limit)
+
+    match = re.search(r'^MemTotal:\s+(\d+) kB', read(meminfo) or '', re.M)
+    return int(match.group(1)) * 1024 if match else None
+
+
+def env_int(environ, name, default):
+    value = environ.get(name)
+    return int(value) if value else default
+
+
+def worker_sizing(environ=os.environ, root=CGROUP_ROOT, meminfo=MEMINFO):
+    """{workers, threads, reload_on_rss} for this container (uWSGI & uvicorn, see run.sh)."""  # noqa: E501
+    cpus = cpu_limit(root)
+    memory_mb = (memory_limit(root, meminfo) or 0) // 2 ** 20
+    usable_mb = memory_mb * env_int(environ, 'APP_MEMORY_PERCENT', 75) // 100  # noqa: E501
+    # ^Rest for the master, page cache & spikes
+    worker_mb = env_int(environ, 'APP_WORKER_MEMORY_MB', 150)
+
+    concurrency = cpus * env_int(environ, 'APP_CONCURRENCY_PER_CPU', 2)
+    # ^>1 per CPU: requests spend part of their time waiting for the database
+    fitting = usable_mb // worker_mb if memory_mb else concurrency
+    workers = env_int(environ, 'APP_WORKERS', max(1, min(concurrency, fitting)))  # noqa: E501
+    threads = env_int(environ, 'APP_THREADS', math.ceil(concurrency / workers))  # noqa: E501
+    # ^Threads (cheap) make up for the workers that don't fit in memory
+
+    share_mb = max(worker_mb, min(usable_mb // workers, worker_mb * 2)) if memory_mb else 0  # noqa: E501
+    reload_on_rss = env_int(environ, 'APP_RELOAD_ON_RSS_MB', share_mb)
+    # ^A worker past its share of the memory (at most twice the expected size) is leaking >> recycled # noqa: E501
+    return {'workers': workers, 'threads': threads, 'reload_on_rss': reload_on_rss}  # noqa: E501
+
+
+def uwsgi_options(environ=os.environ, root=CGROUP_ROOT, somaxconn=SOMAXCONN, meminfo=MEMINFO):  # noqa: E501
+    """[(option, value)] of the uWSGI ini file for this container."""
+    sizing = worker_sizing(environ, root, meminfo)
+    workers, threads, reload_on_rss = sizing['workers'], sizing['threads'], sizing['reload_on_rss']  # noqa: E501
+    listen = env_int(environ, 'APP_LISTEN', 1024)
+    max_listen = read(somaxconn)
+    if max_listen:
+        listen = min(listen, int(max_listen))
+
+    options = [
+        ('socket', ':9000'),
+        ('module', 'app.wsgi'),
+        ('master', 'true'),
+        ('enable-threads', 'true'),
+        ('workers', workers),
+    ]
+    if threads > 1:
+        options.append(('threads', threads))
+
+    cheaper = env_int(environ, 'APP_CHEAPER', math.ceil(workers / 4))
+    if 0 < cheaper < workers:  # uWSGI needs at least 1 worker more than `cheaper` # noqa: E501
+        options += [
+            ('cheaper-algo', 'spare'),  # Built in (no plugin)
+            ('cheaper', cheaper),  # Workers always running
+            ('cheaper-initial', cheaper),  # Workers at startup
+            ('cheaper-step', 1),  # Workers started at a time when all are busy # noqa: E501
+        ]
+
+    if reload_on_rss:
+        options += [('reload-on-rss', reload_on_rss), ('memory-report', 'true')]  # noqa: E501
+    options += [
+        ('harakiri', max_harakiri()),
+        # ^Safety net, each route class gets its own limit (HarakiriMiddleware) # noqa: E501
+        ('listen', listen),
+        ('stats', settings.UWSGI_STATS),
+        ('attach-daemon', 'python manage.py similarity_index --watch'),
+        # ^Rebuilds similar recipes indexes in the background, restarted by the master if it dies # noqa: E501
+    ]
+    return options
+
+
+def render_ini(options):
+    return '[uwsgi]\n' + ''.join(f'{option} = {value}\n' for option, value in options)  # noqa: E501
+
+
+# Harakiri per route class ---------------------------------------------------
+
+
+def harakiri_seconds(path):
+    """Harakiri (seconds) of the first matching route class."""
+    for pattern, seconds in settings.UWSGI_HARAKIRI_ROUTES:
+        if re.match(pattern, path):
+            return seconds
+    return settings.UWSGI_HARAKIRI
+
+
+def max_harakiri():
+    return max([settings.UWSGI_HARAKIRI, *(seconds for _, seconds in settings.UWSGI_HARAKIRI_ROUTES)])  # noqa: E501
+
+
+def set_harakiri(seconds):
+    """Kill the worker if the current request runs longer (0 >> off)."""
+    if uwsgi_api is not None:
+        uwsgi_api.set_user_harakiri(seconds)
+
+
+def clear_harakiri(**kwargs):
+    """`request_finished` (after a streaming response is sent too)."""
+    set_harakiri(0)
+
+
+# Stats (Prometheus) ---------------------------------------------------------
+
+
+def read_stats(address=None, timeout=1):
+    """JSON of the uWSGI stats socket (None if not running under uWSGI)."""
+    host, _, port = (address or settings.UWSGI_STATS).rpartition(':')
+    try:
+        with socket.create_connection((host or '127.0.0.1', int(port)), timeout=timeout) as stats_socket:  # noqa: E501
+            data = b''
+            while True:
+                chunk = stats_socket.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        return json.loads(data)
+    except (OSError, ValueError):
+        return None
+
+
+def collect(stats):
+    """Prometheus metric families of a uWSGI stats document."""
+    listen_queue = GaugeMetricFamily('uwsgi_listen_queue', 'Requests waiting for a worker.')  # noqa: E501
+    listen_queue.add_metric([], stats.get('listen_queue', 0))
+    listen_errors = CounterMetricFamily('uwsgi_listen_queue_errors', 'Connections refused, the listen queue was full.')  # noqa: E501
+    listen_errors.add_metric([], stats.get('listen_queue_errors', 0))
+
+    workers = GaugeMetricFamily('uwsgi_workers', 'Workers by status.', labels=['status'])  # noqa: E501
+    rss = GaugeMetricFamily('uwsgi_worker_rss_bytes', 'Resident memory of a worker.', labels=['worker'])  # noqa: E501
+    requests = CounterMetricFamily('uwsgi_worker_requests', 'Requests served by a worker.', labels=['worker'])  # noqa: E501
+    harakiri = CounterMetricFamily('uwsgi_worker_harakiri', 'Requests killed by harakiri.', labels=['worker'])  # noqa: E501
+
+    statuses = {'idle': 0, 'busy': 0, 'cheap': 0}
+    for worker in stats.get('workers', []):
+        status = worker.get('status', 'idle')
+        statuses[status] = statuses.get(status, 0) + 1
+        worker_id = str(worker['id'])
+        rss.add_metric([worker_id], worker.get('rss', 0))  # 0 without `memory-report` # noqa: E501
+        requests.add_metric([worker_id], worker.get('requests', 0))
+        harakiri.add_metric([worker_id], worker.get('harakiri_count', 0))
+    for status, count in statuses.items():
+        workers.add_metric([status], count)
+
+    return [listen_queue, listen_errors, workers, rss, requests, harakiri]
@@ -4,8 +4,11 @@ Serializer for recipe APIs
 # SERIALIZER >> Convert a Model Instance to a Python Data Type
 
 
+from django.conf import settings
+
 from rest_framework import serializers
 
+from core import similarity
 from core.models import (
     Recipe,
     Tag,
@@ -91,6 +94,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         self._get_or_create_ingredients(ingredients, recipe)  # ^Adding Ingredients to Recipe Object  (Internal Function)
 
+        similarity.mark_stale(recipe.user_id)  # ^The user's similar recipes index gets rebuilt in the background (core/similarity.py)
+
         return recipe
     
     # Overriding default 'update' method of `serializers.ModelSerializer` - To make them capable to update Recipe Objects with Tags
@@ -108,6 +113,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             instance.ingredients.clear()  # ^Clearing Ingredients from Recipe Object
             self._get_or_create_ingredients(ingredients, instance)  # ^Adding Ingredients to Recipe Object  (Internal Function)
 
+        if tags is not None or ingredients is not None:
+            similarity.mark_stale(instance.user_id)  # ^New links >> the similar recipes index gets rebuilt in the background
+
         # Everything else in validated_data (other than tags and ingredients) is going to be updated in the Recipe Object (i.e. title, time_minutes, price, link)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)  # ^Updating Attributes of Recipe Object
@@ -127,6 +135,43 @@ class RecipeDetailSerializer(RecipeSerializer):
         # ^Adding 'description' field to Meta Values provided to RecipeSerializer
 
 
+class SimilarRecipeSerializer(RecipeSerializer):
+    """Serializer for similar recipes (schema of the `similar` action, see RecipeViewSet)"""
+
+    similarity = serializers.FloatField(read_only=True)  # Jaccard / cosine score, 1 >> same tags & ingredients
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('similarity',)
+
+
+class CookableRecipeSerializer(RecipeSerializer):
+    """Serializer for recipes that can be cooked from a pantry (schema of the `cookable` action)"""
+
+    missing = serializers.ListField(child=serializers.IntegerField(), read_only=True)  # IDs of the ingredients not in the pantry
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('missing',)
+
+
+class ShoppingListRequestSerializer(serializers.Serializer):
+    """Serializer for the recipes of a shopping list"""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.SHOPPING_LIST_MAX_RECIPES,
+    )
+    # ^Recipe IDs (i.e. a week's recipes). IDs of other users' recipes are ignored
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Serializer for one ingredient of a shopping list"""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipes = serializers.ListField(child=serializers.IntegerField())  # IDs of the requested recipes using it
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
 
@@ -144,6 +189,86 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         # Other fields can be changed/updated
         # ^We are only going to update the image field of Recipe Object
 
-       
 
-    
+class RecipeValuesSerializer:
+    """Read-only, much faster `RecipeSerializer(queryset, many=True).data` (list endpoint)"""  # noqa: E501
+
+    # RecipeSerializer creates a model instance + field objects for every recipe, tag & ingredient.
+    # This reads plain `.values_list()` tuples instead (1 query for recipes + 1 per nested list, like prefetch_related)
+    # and builds the dicts directly. The field list is taken from RecipeSerializer once ("compiled"),
+    # so both always produce the same output (see recipe/tests/test_values_serializer.py).
+
+    serializer_class = RecipeSerializer
+    passthrough_fields = (serializers.IntegerField, serializers.CharField)
+    # ^to_representation() of these returns the database value unchanged >> skip the call
+
+    _compiled = None
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    @classmethod
+    def compile(cls):
+        """Work out columns, converters & nested relations from serializer_class (once)."""  # noqa: E501
+        if cls._compiled is not None:
+            return cls._compiled
+
+        fields = cls.serializer_class().fields
+        model = cls.serializer_class.Meta.model
+        names, columns, converters, nested = [], [], [], []
+
+        for name, field in fields.items():
+            if isinstance(field, serializers.ListSerializer):  # Nested many=True (ManyToMany)
+                relation = model._meta.get_field(field.source)
+                child_names = list(field.child.fields)
+                nested.append((
+                    name,
+                    relation.remote_field.through,
+                    relation.m2m_field_name(),  # i.e. `recipe`
+                    relation.m2m_reverse_field_name(),  # i.e. `tag`
+                    child_names,
+                ))
+                continue
+
+            if nested:
+                raise TypeError(f'{name}: nested fields must come last in {cls.serializer_class.__name__}')  # noqa: E501
+            names.append(name)
+            columns.append(field.source)
+            if type(field) not in cls.passthrough_fields:
+                converters.append((name, field.to_representation))  # i.e. price (Decimal >> '5.50')
+
+        cls._compiled = names, columns, converters, nested
+        return cls._compiled
+
+    @property
+    def data(self):
+        names, columns, converters, nested = self.compile()
+        nested_names = [relation[0] for relation in nested]
+
+        data = []
+        by_id = {}
+        for row in self.queryset.prefetch_related(None).values_list(*columns):
+            item = dict(zip(names, row))
+            for name, convert in converters:
+                item[name] = convert(item[name])
+            for name in nested_names:
+                item[name] = []
+            data.append(item)
+            by_id[item['id']] = item
+
+        if not by_id:
+            return data
+
+        for name, through, source, target, child_names in nested:
+            links = (
+                through.objects
+                .using(self.queryset.db)  # Same database as the recipes (replica / shard)
+                .filter(**{f'{source}_id__in': list(by_id)})
+                .order_by(f'{target}_id')  # Same order as the prefetch in RecipeViewSet
+                .values_list(f'{source}_id', *[f'{target}__{child}' for child in child_names])  # noqa: E501
+            )
+            for recipe_id, *values in links:
+                by_id[recipe_id][name].append(dict(zip(child_names, values)))
+
+        return data
+
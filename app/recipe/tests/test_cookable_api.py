@@ -0,0 +1,110 @@
+"""
+Tests for the "what can I cook" API
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import similarity
+from core.models import Ingredient, Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+
+
+class CookableRecipesApiTests(TestCase):
+    """Test finding the recipes a pantry is enough for"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.salad = self.create_recipe('Salad', ['Carrot'])
+        self.soup = self.create_recipe('Soup', ['Carrot', 'Onion'])
+        self.stew = self.create_recipe('Stew', ['Carrot', 'Onion', 'Beef'])
+        self.ids = dict(Ingredient.objects.values_list('name', 'id'))
+
+    def create_recipe(self, title, ingredients):
+        payload = {
+            'title': title,
+            'time_minutes': 10,
+            'price': Decimal('2.50'),
+            'ingredients': [{'name': name} for name in ingredients],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def pantry(self, *names):
+        return ','.join(str(self.ids[name]) for name in names)
+
+    def test_all_ingredients_at_hand(self):
+        """Test only recipes needing nothing else are returned"""
+        res = self.client.get(COOKABLE_URL, {'pantry': self.pantry('Carrot', 'Onion')})  # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in res.data], ['Soup', 'Salad'])  # noqa: E501
+        self.assertEqual(res.data[0]['missing'], [])
+
+    def test_missing(self):
+        """Test `?missing=` adds recipes lacking that many, with what they lack"""  # noqa: E501
+        res = self.client.get(COOKABLE_URL, {'pantry': self.pantry('Carrot'), 'missing': 1})  # noqa: E501
+
+        self.assertEqual([item['title'] for item in res.data], ['Salad', 'Soup'])  # noqa: E501
+        self.assertEqual(res.data[1]['missing'], [self.ids['Onion']])
+
+    def test_follows_writes(self):
+        """Test a recipe changed through the API is matched by its new ingredients"""  # noqa: E501
+        pantry = self.pantry('Carrot', 'Onion')
+        self.client.get(COOKABLE_URL, {'pantry': pantry})  # Builds the index
+
+        self.client.patch(reverse('recipe:recipe-detail', args=[self.stew]), {'ingredients': [{'name': 'Onion'}]}, format='json')  # noqa: E501
+        res = self.client.get(COOKABLE_URL, {'pantry': pantry})
+
+        self.assertEqual([item['title'] for item in res.data], ['Stew', 'Soup', 'Salad'])  # noqa: E501
+
+    def test_invalid_params(self):
+        """Test a missing pantry or bad `missing` is a 400"""
+        for params in ({}, {'pantry': 'carrot'}, {'pantry': '1', 'missing': 99}):  # noqa: E501
+            res = self.client.get(COOKABLE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_and_query_agree(self):
+        """Test the bitsets (fresh index) & the grouped query (none yet) give the same answers"""  # noqa: E501
+        cases = [(('Carrot',), 0), (('Carrot',), 1), (('Onion', 'Beef'), 1), ((), 3)]  # noqa: E501
+        by_query = [self.client.get(COOKABLE_URL, {'pantry': self.pantry(*names), 'missing': missing}).data for names, missing in cases]  # noqa: E501
+        similarity.build(self.user)
+
+        by_index = [self.client.get(COOKABLE_URL, {'pantry': self.pantry(*names), 'missing': missing}).data for names, missing in cases]  # noqa: E501
+
+        self.assertEqual(by_index, by_query)
+
+    def test_without_ingredients(self):
+        """Test recipes without ingredients are never cookable (nothing tells what they need)"""  # noqa: E501
+        res = self.client.post(RECIPES_URL, {'title': 'Toast', 'time_minutes': 1, 'price': '1.00', 'tags': [{'name': 'Quick'}]}, format='json')  # noqa: E501
+        toast = res.data['id']
+
+        for build in (False, True):
+            if build:
+                similarity.build(self.user)
+            res = self.client.get(COOKABLE_URL, {'pantry': self.pantry('Carrot'), 'missing': 5})  # noqa: E501
+
+            self.assertNotIn(toast, [item['id'] for item in res.data], build)  # noqa: E501
+
+    def test_stale_index_not_used(self):
+        """Test links changed behind the index' back are answered by the query until the rebuild"""  # noqa: E501
+        similarity.build(self.user)
+        Recipe.objects.get(id=self.stew).ingredients.remove(self.ids['Beef'])  # i.e. in the admin # noqa: E501
+        similarity.mark_stale(self.user.id)
+
+        res = self.client.get(COOKABLE_URL, {'pantry': self.pantry('Carrot', 'Onion')})  # noqa: E501
+
+        self.assertEqual([item['title'] for item in res.data], ['Stew', 'Soup', 'Salad'])  # noqa: E501
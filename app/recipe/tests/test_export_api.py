@@ -0,0 +1,75 @@
+"""
+Tests for the streaming recipe export
+"""
+
+import gzip
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipe.views import RecipeViewSet
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportApiTests(TestCase):
+    """Test exporting recipes as NDJSON"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        for number in range(7):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {number}',
+                time_minutes=number,
+                price=Decimal('2.50'),
+            )
+            if number % 2:
+                recipe.tags.add(self.tag)
+
+    def export(self, params=None, **headers):
+        res = self.client.get(EXPORT_URL, params, **headers)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return res, b''.join(res.streaming_content)
+
+    def test_export_same_as_list(self):
+        """Test every line is a recipe of the list endpoint, in order"""
+        with patch.object(RecipeViewSet, 'export_batch_size', 3):  # 3 chunks
+            res, body = self.export()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(res['X-Accel-Buffering'], 'no')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(lines, self.client.get(RECIPES_URL).json())
+
+    def test_export_filtered(self):
+        """Test the list filters apply to the export"""
+        _, body = self.export({'tags': self.tag.id})
+
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_export_compressed(self):
+        """Test the export is compressed while streaming"""
+        res, body = self.export(HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        self.assertEqual(len(gzip.decompress(body).splitlines()), 7)
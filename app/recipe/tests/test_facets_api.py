@@ -0,0 +1,108 @@
+"""
+Tests for facet counts of the recipe list
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import similarity
+from core.models import SimilarityIndex, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeFacetsApiTests(TestCase):
+    """Test `?facets=` counts the tags & ingredients of the filtered recipes"""  # noqa: E501
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.create_recipe('Soup', ['Dinner', 'Vegan'], ['Carrot'])
+        self.create_recipe('Stew', ['Dinner'], ['Carrot', 'Beef'])
+        self.create_recipe('Cake', ['Dessert'], ['Sugar'])
+
+    def create_recipe(self, title, tags, ingredients):
+        payload = {
+            'title': title,
+            'time_minutes': 10,
+            'price': Decimal('2.50'),
+            'tags': [{'name': name} for name in tags],
+            'ingredients': [{'name': name} for name in ingredients],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def counts(self, facet):
+        return [(item['name'], item['count']) for item in facet]
+
+    def test_counts_of_filtered_recipes(self):
+        """Test counts cover the filtered recipes only, most frequent first"""
+        dinner = Tag.objects.get(name='Dinner')
+
+        res = self.client.get(RECIPES_URL, {'tags': dinner.id, 'facets': 'tags,ingredients'})  # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in res.data['results']], ['Stew', 'Soup'])  # noqa: E501
+        self.assertEqual(self.counts(res.data['facets']['tags']), [('Dinner', 2), ('Vegan', 1)])  # noqa: E501
+        self.assertEqual(self.counts(res.data['facets']['ingredients']), [('Carrot', 2), ('Beef', 1)])  # noqa: E501
+
+    def test_without_facets(self):
+        """Test the list keeps its plain shape without `?facets=`"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 3)
+
+    @override_settings(FACETS_TOP_N=1)
+    def test_top_n(self):
+        """Test only the most frequent values of a facet are counted"""
+        res = self.client.get(RECIPES_URL, {'facets': 'ingredients'})
+
+        self.assertEqual(self.counts(res.data['facets']['ingredients']), [('Carrot', 2)])  # noqa: E501
+        self.assertNotIn('tags', res.data['facets'])
+
+    def test_cached_until_write(self):
+        """Test repeated filters reuse their counts (fresh index), a write recounts them"""  # noqa: E501
+        similarity.build(self.user)
+        self.client.get(RECIPES_URL, {'facets': 'tags'})
+        with self.assertNumQueries(5):  # Recipes, tags, ingredients, index version, tag names # noqa: E501
+            self.client.get(RECIPES_URL, {'facets': 'tags'})
+        self.create_recipe('Pie', ['Dessert'], ['Sugar'])
+
+        res = self.client.get(RECIPES_URL, {'facets': 'tags'})
+
+        self.assertIn(('Dessert', 2), self.counts(res.data['facets']['tags']))
+
+    def test_no_build_in_request(self):
+        """Test a user without an index is counted by query, the build is left to the background"""  # noqa: E501
+        res = self.client.get(RECIPES_URL, {'facets': 'tags'})
+
+        self.assertEqual(self.counts(res.data['facets']['tags']), [('Dinner', 2), ('Vegan', 1), ('Dessert', 1)])  # noqa: E501
+        stored = SimilarityIndex.objects.get(user=self.user)
+        self.assertTrue(stored.stale)
+        self.assertEqual(stored.recipes, 0)  # Requested, not built
+
+    def test_index_and_query_agree(self):
+        """Test counts from a fresh index equal the grouped query's (ties by ID)"""
+        dinner = Tag.objects.get(name='Dinner')
+        params = {'tags': dinner.id, 'facets': 'tags,ingredients'}
+        by_query = self.client.get(RECIPES_URL, params).data['facets']
+        similarity.build(self.user)
+
+        by_index = self.client.get(RECIPES_URL, params).data['facets']
+
+        self.assertEqual(by_index, by_query)
+
+    def test_unknown_facet(self):
+        """Test an unknown facet is a 400"""
+        res = self.client.get(RECIPES_URL, {'facets': 'tags,colour'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,119 @@
+"""
+Tests for MessagePack requests & responses of the recipe APIs
+"""
+
+from decimal import Decimal
+
+import msgpack
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+MSGPACK = 'application/msgpack'
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class MessagePackRecipeApiTests(TestCase):
+    """Test negotiating MessagePack with the recipe APIs"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('5.50'),
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+    def post(self, url, payload, method='post'):
+        return getattr(self.client, method)(
+            url,
+            msgpack.packb(payload),
+            content_type=MSGPACK,
+            HTTP_ACCEPT=MSGPACK,
+        )
+
+    def test_list_recipes(self):
+        """Test the list is the JSON structure, encoded as MessagePack"""
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT=MSGPACK)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], MSGPACK)
+        self.assertEqual(msgpack.unpackb(res.content), self.client.get(RECIPES_URL).json())  # noqa: E501
+
+    def test_price_and_image_encoding(self):
+        """Test the price is an exact string & the image an absolute URL"""
+        self.recipe.image = 'uploads/recipe/soup.jpg'
+        self.recipe.save()
+
+        res = self.client.get(detail_url(self.recipe.id), {'format': 'msgpack'})  # noqa: E501
+
+        data = msgpack.unpackb(res.content)
+        self.assertEqual(data['price'], '5.50')
+        self.assertEqual(data['image'], f'http://testserver{settings.MEDIA_URL}uploads/recipe/soup.jpg')  # noqa: E501
+
+    def test_create_recipe(self):
+        """Test creating a recipe from a MessagePack body"""
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': 12.25,  # Floats are accepted, like in JSON
+            'tags': [{'name': 'Dinner'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+
+        res = self.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data = msgpack.unpackb(res.content)
+        self.assertEqual(data['price'], '12.25')
+        recipe = Recipe.objects.get(id=data['id'])
+        self.assertEqual(recipe.price, Decimal('12.25'))
+        self.assertEqual(recipe.tags.get().name, 'Dinner')
+
+    def test_update_recipe(self):
+        """Test updating a recipe from a MessagePack body"""
+        res = self.post(detail_url(self.recipe.id), {'title': 'Stew'}, method='patch')  # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Stew')
+
+    def test_tags_and_ingredients(self):
+        """Test the tag & ingredient APIs negotiate MessagePack"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        tag = Tag.objects.get(name='Vegan')
+
+        tags = self.client.get(TAGS_URL, HTTP_ACCEPT=MSGPACK)
+        ingredients = self.client.get(INGREDIENTS_URL, HTTP_ACCEPT=MSGPACK)
+        update = self.post(reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Plant based'}, method='patch')  # noqa: E501
+
+        self.assertEqual(msgpack.unpackb(tags.content), [{'id': tag.id, 'name': 'Vegan'}])  # noqa: E501
+        self.assertEqual(msgpack.unpackb(ingredients.content)[0]['name'], 'Salt')  # noqa: E501
+        self.assertEqual(msgpack.unpackb(update.content)['name'], 'Plant based')  # noqa: E501
+
+    def test_invalid_body(self):
+        """Test a malformed body is a 400 (rendered as MessagePack)"""
+        res = self.client.post(RECIPES_URL, b'\xc1', content_type=MSGPACK, HTTP_ACCEPT=MSGPACK)  # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('detail', msgpack.unpackb(res.content))
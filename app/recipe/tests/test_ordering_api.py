@@ -0,0 +1,147 @@
+"""
+Tests for range filters, ordering & cursor pages of the recipe list
+"""
+
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+from recipe.views import RecipeViewSet
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+ORDERINGS = [prefix + field for field in RecipeViewSet.orderable_fields for prefix in ('', '-')]  # noqa: E501
+
+
+class RecipeOrderingApiTests(TestCase):
+    """Test filtering & sorting by price / time, page by page"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for number in range(11):
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {number % 4}',  # Equal titles, prices & times >> ties # noqa: E501
+                time_minutes=10 * (number % 3),
+                price=Decimal(number % 5),
+            )
+
+    def expected(self, ordering, **filters):
+        field = ordering.lstrip('-')
+        fields = [ordering] if field == 'id' else [ordering, '-id' if ordering.startswith('-') else 'id']  # noqa: E501
+        return list(Recipe.objects.filter(user=self.user, **filters).order_by(*fields).values_list('id', flat=True))  # noqa: E501
+
+    def test_range_filters(self):
+        """Test min_price, max_price & max_time"""
+        res = self.client.get(RECIPES_URL, {'min_price': '1.00', 'max_price': '3', 'max_time': 10})  # noqa: E501
+
+        self.assertEqual(
+            [item['id'] for item in res.data],
+            self.expected('-id', price__gte=1, price__lte=3, time_minutes__lte=10),  # noqa: E501
+        )
+
+    def test_orderings(self):
+        """Test every allowed ordering, ties by id in the same direction"""
+        for ordering in ORDERINGS:
+            res = self.client.get(RECIPES_URL, {'ordering': ordering})
+
+            self.assertEqual([item['id'] for item in res.data], self.expected(ordering), ordering)  # noqa: E501
+
+    def test_rejected(self):
+        """Test orderings without an index & bad numbers are a 400"""
+        for params in (
+            {'ordering': 'description'},
+            {'ordering': 'price,title'},  # Combinations have no index
+            {'ordering': '--price'},
+            {'min_price': 'cheap'},
+            {'max_price': 'NaN'},
+            {'max_time': '1.5'},
+            {'page_size': 0},
+        ):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)  # noqa: E501
+
+    def test_cursor_pages(self):
+        """Test walking every ordering forwards & back gives the whole list once"""  # noqa: E501
+        for ordering in ORDERINGS:
+            pages, url = [], RECIPES_URL + f'?ordering={ordering}&page_size=3&max_time=20'  # noqa: E501
+            while url:
+                res = self.client.get(url)
+                pages.append([item['id'] for item in res.data['results']])
+                url = res.data['next']
+            self.assertEqual(sum(pages, []), self.expected(ordering, time_minutes__lte=20), ordering)  # noqa: E501
+            self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+
+            backwards, url = [], res.data['previous']
+            while url:
+                res = self.client.get(url)
+                backwards.insert(0, [item['id'] for item in res.data['results']])  # noqa: E501
+                url = res.data['previous']
+            self.assertEqual(backwards, pages[:-1], ordering)
+
+    def test_pages_stable_across_writes(self):
+        """Test a recipe added before the cursor doesn't shift the next page"""
+        res = self.client.get(RECIPES_URL, {'ordering': 'price', 'page_size': 4})  # noqa: E501
+        Recipe.objects.create(user=self.user, title='Cheap', time_minutes=1, price=Decimal('0.00'))  # noqa: E501
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual([item['id'] for item in res.data['results']], self.expected('price')[5:9])  # noqa: E501
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is a 404"""
+        res = self.client.get(RECIPES_URL, {'page_size': 2, 'cursor': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pages_with_filter_and_facets(self):
+        """Test pages of a tag filter (join) carry the facets of all results"""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        for recipe in Recipe.objects.all():
+            recipe.tags.add(tag)
+
+        res = self.client.get(RECIPES_URL, {'tags': tag.id, 'ordering': '-price', 'page_size': 5, 'facets': 'tags'})  # noqa: E501
+
+        self.assertEqual(len(res.data['results']), 5)
+        self.assertEqual(res.data['facets']['tags'][0]['count'], 11)
+
+    def test_facets_follow_price_edits(self):
+        """Test facets of a range filter follow a PATCH of the price"""
+        Recipe.objects.all().delete()
+        res = self.client.post(RECIPES_URL, {'title': 'Salad', 'time_minutes': 5, 'price': '5.00', 'tags': [{'name': 'Veg'}]}, format='json')  # noqa: E501
+        params = {'max_price': 10, 'facets': 'tags'}
+        self.client.get(RECIPES_URL, params)
+
+        self.client.patch(reverse('recipe:recipe-detail', args=[res.data['id']]), {'price': '50.00'})  # noqa: E501
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.data['results'], [])
+        self.assertEqual(res.data['facets']['tags'], [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Query plan of SQLite.')
+    def test_pages_read_from_index(self):
+        """Test a page is read in the order of its index (no sort)"""
+        for ordering in ORDERINGS:
+            view = RecipeViewSet(request=None, action='list')
+            view.request = type('Request', (), {'user': self.user, 'query_params': {'ordering': ordering}})  # noqa: E501
+            queryset = view.get_queryset().prefetch_related(None).values_list('id')[:10]  # noqa: E501
+            sql, params = queryset.query.sql_with_params()
+
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+            self.assertIn('recipe_user_', plan, ordering)
+            self.assertNotIn('TEMP B-TREE', plan, ordering)
@@ -0,0 +1,232 @@
+"""
+Query budgets for the Recipe, Tag & Ingredient APIs
+"""
+
+import tempfile
+from decimal import Decimal
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.tests.query_budget import QueryBudgetMixin
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+_sequence = count()
+
+
+def create_recipe(user):
+    """Create and return a recipe with a tag & an ingredient."""
+    number = next(_sequence)
+    recipe = Recipe.objects.create(
+        user=user,
+        title=f'Recipe {number}',
+        time_minutes=10,
+        price=Decimal('5.50'),
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name=f'Tag {number}'))
+    recipe.ingredients.add(
+        Ingredient.objects.create(user=user, name=f'Ingredient {number}')
+    )
+    return recipe
+
+
+class BudgetTestCase(QueryBudgetMixin, TestCase):
+    """Authenticated with a real token (its lookup counts towards the budget)"""  # noqa: E501
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def grow(self, times=5):
+        """Return a function adding `times` recipes (with tags & ingredients)."""  # noqa: E501
+        def grow():
+            for _ in range(times):
+                create_recipe(self.user)
+        return grow
+
+
+class RecipeQueryBudgetTests(BudgetTestCase):
+    """Test the queries made by the recipe endpoints"""
+
+    def test_list_recipes(self):
+        """Test listing recipes doesn't make a query per recipe"""
+        res = self.assertQueryBudget(
+            4,
+            lambda: self.client.get(RECIPES_URL),
+            grow=self.grow(),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+
+    def test_list_recipes_filtered(self):
+        """Test filtering recipes doesn't make a query per recipe"""
+        tag = Tag.objects.create(user=self.user, name='Shared')
+
+        def grow():
+            for _ in range(5):
+                create_recipe(self.user).tags.add(tag)
+
+        self.assertQueryBudget(
+            4,
+            lambda: self.client.get(RECIPES_URL, {'tags': tag.id}),
+            grow=grow,
+        )
+
+    def test_export_recipes(self):
+        """Test the streaming export makes a constant number of queries per batch"""  # noqa: E501
+        body = self.assertQueryBudget(
+            5,  # Token, IDs, recipes, tags, ingredients
+            lambda: b''.join(self.client.get(EXPORT_URL).streaming_content),
+            grow=self.grow(),
+        )
+
+        self.assertEqual(len(body.splitlines()), 10)
+
+    def test_retrieve_recipe(self):
+        """Test retrieving a recipe"""
+        recipe = create_recipe(self.user)
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+
+        self.assertQueryBudget(
+            4,
+            lambda: self.client.get(url),
+            grow=self.grow(),
+        )
+
+    def test_create_recipe(self):
+        """Test creating a recipe (with a tag & an ingredient)"""
+        payload = {
+            'title': 'New recipe',
+            'time_minutes': 5,
+            'price': Decimal('2.50'),
+            'tags': [{'name': 'Dinner'}],
+            'ingredients': [{'name': 'Salt'}],
+        }
+        Tag.objects.create(user=self.user, name='Dinner')
+        Ingredient.objects.create(user=self.user, name='Salt')
+        # ^Existing >> every call does the same work (get, not create)
+
+        self.assertQueryBudget(
+            9,  # +1: marks the similar recipes index stale (core/similarity.py)
+            lambda: self.client.post(RECIPES_URL, payload, format='json'),
+            grow=self.grow(),
+        )
+
+    def test_update_recipe(self):
+        """Test fully & partially updating a recipe"""
+        recipe = create_recipe(self.user)
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        payload = {
+            'title': 'Updated',
+            'time_minutes': 5,
+            'price': Decimal('2.50'),
+            'tags': [{'name': 'Lunch'}],
+        }
+        Tag.objects.create(user=self.user, name='Lunch')
+
+        self.assertQueryBudget(
+            11,  # +1: marks the similar recipes index stale
+            lambda: self.client.put(url, payload, format='json'),
+            grow=self.grow(),
+        )
+        self.assertQueryBudget(
+            7,
+            lambda: self.client.patch(url, {'title': 'Patched'}),
+            grow=self.grow(),
+        )
+
+    def test_delete_recipe(self):
+        """Test deleting a recipe"""
+        recipes = [create_recipe(self.user) for _ in range(3)]
+
+        def delete():
+            recipe = recipes.pop()
+            url = reverse('recipe:recipe-detail', args=[recipe.id])
+            return self.client.delete(url)
+
+        res = self.assertQueryBudget(8, delete, grow=self.grow())  # +1: marks the similar recipes index stale # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_upload_image(self):
+        """Test uploading an image"""
+        recipe = create_recipe(self.user)
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+
+        def upload():
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+                Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+                image_file.seek(0)
+                return self.client.post(
+                    url,
+                    {'image': image_file},
+                    format='multipart',
+                )
+
+        res = self.assertQueryBudget(3, upload, grow=self.grow())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        recipe.image.delete()
+
+
+class RecipeAttrQueryBudgetTests(BudgetTestCase):
+    """Test the queries made by the tag & ingredient endpoints"""
+
+    def test_list_tags_and_ingredients(self):
+        """Test listing tags & ingredients"""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            self.assertQueryBudget(
+                2,
+                lambda: self.client.get(url),
+                grow=self.grow(),
+            )
+            self.assertQueryBudget(
+                2,
+                lambda: self.client.get(url, {'assigned_only': 1}),
+                grow=self.grow(),
+            )
+
+    def test_update_tag_and_ingredient(self):
+        """Test updating a tag & an ingredient"""
+        recipe = create_recipe(self.user)
+        for name in ('tag', 'ingredient'):
+            obj = getattr(recipe, f'{name}s').first()
+            url = reverse(f'recipe:{name}-detail', args=[obj.id])
+
+            self.assertQueryBudget(
+                3,
+                lambda: self.client.patch(url, {'name': 'Updated'}),
+                grow=self.grow(),
+            )
+
+    def test_delete_tag_and_ingredient(self):
+        """Test deleting tags & ingredients"""
+        recipes = [create_recipe(self.user) for _ in range(3)]
+        for name in ('tag', 'ingredient'):
+            objects = [getattr(r, f'{name}s').first() for r in recipes]
+
+            def delete():
+                url = reverse(f'recipe:{name}-detail', args=[objects.pop().id])
+                return self.client.delete(url)
+
+            self.assertQueryBudget(5, delete, grow=self.grow())  # +1: marks the similar recipes index stale # noqa: E501
@@ -0,0 +1,70 @@
+"""
+Tests for the shopping list API
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+
+
+SHOPPING_LIST_URL = reverse('recipe:shopping-list')
+
+
+class ShoppingListApiTests(TestCase):
+    """Test merging the ingredients of several recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.carrot = Ingredient.objects.create(user=self.user, name='Carrot')
+        self.onion = Ingredient.objects.create(user=self.user, name='Onion')
+        self.soup = self.create_recipe(self.user, [self.carrot, self.onion])
+        self.salad = self.create_recipe(self.user, [self.carrot])
+
+    def create_recipe(self, user, ingredients):
+        recipe = Recipe.objects.create(user=user, title='Recipe', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def test_merged_ingredients(self):
+        """Test every ingredient comes once, with the recipes using it"""
+        res = self.client.post(SHOPPING_LIST_URL, {'recipes': [self.soup.id, self.salad.id]}, format='json')  # noqa: E501
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.carrot.id, 'name': 'Carrot', 'recipes': sorted([self.soup.id, self.salad.id])},  # noqa: E501
+            {'id': self.onion.id, 'name': 'Onion', 'recipes': [self.soup.id]},  # noqa: E501
+        ])
+
+    def test_one_query(self):
+        """Test thousands of recipe IDs take one query"""
+        ids = [self.soup.id, self.salad.id] + list(range(10 ** 6, 10 ** 6 + 3000))  # noqa: E501
+
+        with self.assertNumQueries(1):
+            res = self.client.post(SHOPPING_LIST_URL, {'recipes': ids}, format='json')  # noqa: E501
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_other_users_recipes_ignored(self):
+        """Test the ingredients of other users' recipes aren't listed"""
+        other = get_user_model().objects.create_user(email='other@example.com', password='testpass123')  # noqa: E501
+        recipe = self.create_recipe(other, [Ingredient.objects.create(user=other, name='Secret')])  # noqa: E501
+
+        res = self.client.post(SHOPPING_LIST_URL, {'recipes': [recipe.id]}, format='json')  # noqa: E501
+
+        self.assertEqual(res.data, [])
+
+    def test_invalid(self):
+        """Test an empty or malformed list is a 400"""
+        for payload in ({'recipes': []}, {'recipes': ['soup']}, {}):
+            res = self.client.post(SHOPPING_LIST_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
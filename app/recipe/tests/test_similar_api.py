@@ -0,0 +1,114 @@
+"""
+Tests for the similar recipes API
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import similarity
+from core.models import Recipe, SimilarityIndex
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SimilarRecipesApiTests(TestCase):
+    """Test listing the recipes sharing the most tags & ingredients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')  # noqa: E501
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.soup = self.create_recipe('Soup', ['Dinner', 'Vegan'], ['Carrot', 'Onion'])  # noqa: E501
+        self.stew = self.create_recipe('Stew', ['Dinner', 'Vegan'], ['Carrot', 'Beef'])  # noqa: E501
+        self.salad = self.create_recipe('Salad', ['Lunch'], ['Carrot'])
+        self.cake = self.create_recipe('Cake', ['Dessert'], ['Sugar'])
+
+    def create_recipe(self, title, tags, ingredients):
+        payload = {
+            'title': title,
+            'time_minutes': 10,
+            'price': Decimal('2.50'),
+            'tags': [{'name': name} for name in tags],
+            'ingredients': [{'name': name} for name in ingredients],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def test_ranked_by_overlap(self):
+        """Test recipes come best first with their Jaccard score, unrelated ones not at all"""  # noqa: E501
+        res = self.client.get(similar_url(self.soup))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in res.data], ['Stew', 'Salad'])  # noqa: E501
+        self.assertEqual(res.data[0]['similarity'], 3 / 5)  # Dinner, Vegan, Carrot of 5 # noqa: E501
+        self.assertEqual(res.data[1]['similarity'], 1 / 5)
+        self.assertEqual([tag['name'] for tag in res.data[0]['tags']], ['Dinner', 'Vegan'])  # noqa: E501
+
+    def test_k_and_cosine(self):
+        """Test `?k=` limits the recipes & `?metric=cosine` scores them"""
+        res = self.client.get(similar_url(self.soup), {'k': 1, 'metric': 'cosine'})  # noqa: E501
+
+        self.assertEqual([item['title'] for item in res.data], ['Stew'])
+        self.assertAlmostEqual(res.data[0]['similarity'], 3 / 4)
+
+    def test_invalid_params(self):
+        """Test a bad `k` or `metric` is a 400"""
+        for params in ({'k': 0}, {'k': 'all'}, {'metric': 'euclid'}):
+            res = self.client.get(similar_url(self.soup), params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_recipe(self):
+        """Test the recipe of another user is a 404"""
+        other = get_user_model().objects.create_user(email='other@example.com', password='testpass123')  # noqa: E501
+        recipe = Recipe.objects.create(user=other, title='Other', time_minutes=5, price=Decimal('1.00'))  # noqa: E501
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_writes_mark_stale(self):
+        """Test updates & deletes leave the index to the background rebuild, answers follow them"""  # noqa: E501
+        similarity.build(self.user)
+
+        self.client.patch(detail_url(self.cake), {'tags': [{'name': 'Dinner'}], 'ingredients': [{'name': 'Onion'}]}, format='json')  # noqa: E501
+        self.assertTrue(SimilarityIndex.objects.get(user=self.user).stale)
+        similarity.build(self.user)
+        self.client.delete(detail_url(self.stew))
+        self.assertTrue(SimilarityIndex.objects.get(user=self.user).stale)
+
+        res = self.client.get(similar_url(self.soup))  # From the links
+        self.assertEqual([item['title'] for item in res.data], ['Cake', 'Salad'])  # noqa: E501
+        self.assertEqual(res.data[0]['similarity'], 2 / 4)
+
+        self.assertEqual(similarity.rebuild_due(), 1)
+        self.assertFalse(SimilarityIndex.objects.get(user=self.user).stale)
+        self.assertEqual(self.client.get(similar_url(self.soup)).data, res.data)  # noqa: E501
+
+    def test_deleted_tag_marks_stale(self):
+        """Test deleting a tag leaves the index to the background rebuild"""
+        similarity.build(self.user)
+        tag_id = Recipe.objects.get(id=self.soup).tags.get(name='Vegan').id
+
+        self.client.delete(reverse('recipe:tag-detail', args=[tag_id]))
+
+        self.assertTrue(SimilarityIndex.objects.get(user=self.user).stale)
+        self.assertEqual(similarity.rebuild_due(), 1)
+        res = self.client.get(similar_url(self.soup))
+        self.assertEqual(res.data[0]['similarity'], 2 / 4)  # Dinner, Carrot of Dinner, Carrot, Onion, Beef # noqa: E501
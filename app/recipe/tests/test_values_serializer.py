@@ -0,0 +1,100 @@
+"""
+Tests for the fast (values based) recipe list serializer
+"""
+
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Prefetch
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.serializers import RecipeSerializer, RecipeValuesSerializer
+from recipe.views import RecipeViewSet
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class RecipeValuesSerializerTests(TestCase):
+    """Test the fast serializer produces the same output as RecipeSerializer"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        tags = [Tag.objects.create(user=self.user, name=name) for name in ('Vegan', 'Dinner', 'Ümlaut')]  # noqa: E501
+        ingredients = [Ingredient.objects.create(user=self.user, name=name) for name in ('Salt', 'Kale')]  # noqa: E501
+        for number, price in enumerate(['0', '5.5', '999.99', '0.01']):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {number} “quoted” \\ ✓',
+                time_minutes=number,
+                price=Decimal(price),
+                link='' if number % 2 else f'https://example.com/{number}',
+                description='Not in the list output',
+            )
+            recipe.tags.add(*reversed(tags[:number]))  # Linked out of ID order
+            recipe.ingredients.add(*ingredients[:number])
+
+    def assertSameOutput(self, queryset):
+        expected = RecipeSerializer(
+            queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('id')),
+                Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),  # noqa: E501
+            ),
+            many=True,
+        ).data
+
+        data = RecipeValuesSerializer(queryset).data
+
+        self.assertEqual(data, expected)
+        self.assertEqual(render(data), render(expected))  # Byte identical
+
+    def test_same_output(self):
+        """Test prices, empty links, unicode & nested lists match"""
+        self.assertSameOutput(Recipe.objects.order_by('-id'))
+
+    def test_same_output_filtered(self):
+        """Test filtered & distinct querysets match"""
+        tag = Tag.objects.get(name='Vegan')
+
+        self.assertSameOutput(Recipe.objects.filter(tags=tag).order_by('id').distinct())  # noqa: E501
+
+    def test_empty(self):
+        """Test an empty queryset"""
+        self.assertEqual(RecipeValuesSerializer(Recipe.objects.none()).data, [])  # noqa: E501
+
+    def test_endpoint_same_bytes(self):
+        """Test the list endpoint returns the same bytes with & without the fast path"""  # noqa: E501
+        for params in ({}, {'tags': '1,2'}, {'ingredients': '2'}):
+            fast = self.client.get(RECIPES_URL, params)
+            with patch.object(RecipeViewSet, 'fast_list', False):
+                slow = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(fast.content, slow.content)
+            self.assertTrue(fast.json())
+
+    def test_benchmark(self):
+        """Test the serializer benchmark runs"""
+        out = StringIO()
+
+        call_command('benchmark', 'serializer', '--size', '20', '--repeat', '1', stdout=out)  # noqa: E501
+
+        self.assertIn('RecipeValuesSerializer', out.getvalue())
@@ -27,4 +27,5 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 urlpatterns = [
     path('', include(router.urls)),  # ^Include all of the URLs that were automatically generated by the `DefaultRouter`
+    path('shopping-list/', views.ShoppingListView.as_view(), name='shopping-list'),  # POST recipe IDs >> ingredients
 ]
\ No newline at end of file
@@ -11,6 +11,14 @@ Views for the Recipe APIs
 #             partial_update (Update one or more fields of a model instance)
 #             destroy (Delete a model instance)
 
+from contextlib import nullcontext
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -25,10 +33,12 @@ from rest_framework import (
 )
 
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 
 from core.models import Recipe
 from core.models import Tag
@@ -37,31 +47,133 @@ from core.models import Ingredient
 
 
 
+from core import db_routers, facets, pantry, sharding, similarity
+from core.aggregates import IdList
+from core.pagination import KeysetCursorPagination
+from core.renderers import FastJSONRenderer
+
 from recipe import serializers
 
 
+class ReplicaReadMixin:
+    """Serve read-only actions from a read replica (with read-your-writes stickiness)."""
+
+    replica_actions = ('list', 'retrieve')
+    # ^Only these actions read from a replica. Everything else (incl. authentication) reads from `default`
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # Authentication & Permissions are checked against `default`
+
+        if self.action in self.replica_actions and not db_routers.is_pinned(request):
+            # ^Client has not written anything recently, a slightly stale replica is fine
+            self._read_alias_token = db_routers.set_read_alias(
+                db_routers.choose_replica()
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_read_alias_token', None)
+        if token is not None:
+            db_routers.reset_read_alias(token)  # Never leak the replica into the next request on this thread
+            self._read_alias_token = None
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            db_routers.pin_to_primary(response)  # Following reads must see this write
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class UserMoving(APIException):
+    """The user's data is being moved to another shard (core/sharding.py)."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved, try again shortly.'
+    default_code = 'user_moving'
+    wait = 10  # Retry-After (seconds)
+
+
+class UserShardMixin:
+    """Send the request's recipe, tag & ingredient queries to the shard of the user (core/sharding.py)."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # Authenticates (the user is on `default`)
+        user = request.user
+        if self.fenced:
+            user = sharding.lock_user(user.pk)  # Until the response: a move of the user waits for this write
+            if user.moving:
+                raise UserMoving()  # Written now, the rows could miss the copy
+        self._shard_token = sharding.set_shard(sharding.user_shard(user))
+
+    def dispatch(self, request, *args, **kwargs):
+        self.fenced = bool(settings.DATABASE_SHARDS) and request.method not in SAFE_METHODS
+        # ^Writes, only moves (shards) need the fence
+        try:
+            with transaction.atomic(using='default') if self.fenced else nullcontext():
+                return super().dispatch(request, *args, **kwargs)
+        finally:
+            token = getattr(self, '_shard_token', None)
+            if token is not None:
+                sharding.reset_shard(token)  # Never leak the shard into the next request on this thread (errors too)
+                self._shard_token = None
+
+
+RECIPE_FILTER_PARAMETERS = [
+    # These are parameters that can be passed to requests that are made to list-API for this view.
+    OpenApiParameter(
+        # Specifying details of parameters that can be accepted in API request.
+        'tags',
+        OpenApiTypes.STR, # Type is a string (i.e. Comma Separated List)
+        description='Comma separated list of tag IDs to filter',  # User-defined Description
+    ),
+    OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma separated list of ingredient IDs to filter',
+    ),
+    OpenApiParameter('min_price', OpenApiTypes.DECIMAL, description='Recipes costing at least this much'),
+    OpenApiParameter('max_price', OpenApiTypes.DECIMAL, description='Recipes costing at most this much'),
+    OpenApiParameter('max_time', OpenApiTypes.INT, description='Recipes taking at most this many minutes'),
+    OpenApiParameter(
+        'ordering',
+        OpenApiTypes.STR,
+        enum=[prefix + field for field in ('id', 'price', 'time_minutes', 'title') for prefix in ('', '-')],
+        description='Sort by one field (`-` >> descending), default -id. Ties are sorted by id',
+    ),
+]
+
+
 # Decorator that extend auto-generated schema that is created by drf_spectacular.
 @extend_schema_view(
     # Extend schema for the `list` endpoint.
     # i.e. we are adding below filters to the auto-generated schema for the `list` endpoint.
-    list=extend_schema(
-        parameters=[
-            # These are parameters that can be passed to requests that are made to list-API for this view.
-            OpenApiParameter(
-                # Specifying details of parameters that can be accepted in API request.
-                'tags',
-                OpenApiTypes.STR, # Type is a string (i.e. Comma Separated List)
-                description='Comma separated list of tag IDs to filter',  # User-defined Description
+    list=extend_schema(parameters=RECIPE_FILTER_PARAMETERS + [
+        OpenApiParameter(
+            'facets',
+            OpenApiTypes.STR,
+            description=(
+                'Comma separated list of facets to count (tags, ingredients). '
+                'The response becomes {"results": [...], "facets": {"tags": [{"id", "name", "count"}], ...}}'
             ),
-            OpenApiParameter(
-                'ingredients',
-                OpenApiTypes.STR,
-                description='Comma separated list of ingredient IDs to filter',
-            )
-        ]
-    )
+        ),
+    ]),
+    export=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS,  # Same filters as `list`
+        responses={(200, 'application/x-ndjson'): OpenApiTypes.STR},
+    ),
+    similar=extend_schema(
+        parameters=[
+            OpenApiParameter('k', OpenApiTypes.INT, description=f'Number of recipes (default {settings.SIMILARITY_TOP_K}, at most {settings.SIMILARITY_MAX_K})'),
+            OpenApiParameter('metric', OpenApiTypes.STR, enum=similarity.METRICS, description='Score of the shared tags & ingredients (default jaccard)'),
+        ],
+        responses=serializers.SimilarRecipeSerializer(many=True),
+    ),
+    cookable=extend_schema(
+        parameters=[
+            OpenApiParameter('pantry', OpenApiTypes.STR, required=True, description='Comma separated list of ingredient IDs at hand'),
+            OpenApiParameter('missing', OpenApiTypes.INT, description=f'Ingredients a recipe may lack (default 0, at most {settings.PANTRY_MAX_MISSING})'),
+        ],
+        responses=serializers.CookableRecipeSerializer(many=True),
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(UserShardMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     # Model View Set >> Specifically setup to work directly with a django Model
     # We can use a lot of Existing logic provided by Model Serializer to perform CRUD operations
     """View for manage recipe APIs."""
@@ -78,6 +190,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     # ^You have to be authenticated in order to use any endpoint provided by this view.
 
+    pagination_class = KeysetCursorPagination
+    # ^`?page_size=` >> cursor pages (next / previous links), for every `ordering` (core/pagination.py)
+
+    orderable_fields = ('id', 'price', 'time_minutes', 'title')
+    # ^Each has a (user, field, id) index (Recipe.Meta.indexes), other orderings (& combinations) would sort all of a user's recipes
+
+    range_filters = {  # Query parameter >> (lookup, type)
+        'min_price': ('price__gte', Decimal),
+        'max_price': ('price__lte', Decimal),
+        'max_time': ('time_minutes__lte', int),
+    }
+
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
@@ -104,13 +228,102 @@ class RecipeViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
             # ^Filter the `queryset` based on the `ingredients` that are provided.
 
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+        queryset = queryset.filter(user=self.request.user, **self._range_filters()).order_by(*self._ordering())
+        if tags or ingredients:
+            queryset = queryset.distinct()
         # distinct() > to avoid duplicate results if multiple recipes assinged to same tags/ingredients
+        # (only then: without the join every recipe comes once, and the order comes straight from the index)
     
         # Only return recipes that belong to the authenticated user. (NOT All of the recipes)
         # We are filtering the `queryset` (i.e. all recipes returned above) based on the `user` that is authenticated.
+
+        if self.action not in ('upload_image', 'similar', 'cookable'):  # Image serializer has no tags / ingredients, the others read an index
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('id')),
+                Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+            )
+            # prefetch_related() > 1 query for ALL the tags + 1 for ALL the ingredients (instead of 2 per recipe)
+            # order_by('id') > stable order of nested tags/ingredients (same as RecipeValuesSerializer)
+
+        return queryset
     
 
+    def _range_filters(self):
+        """{lookup: value} of min_price / max_price / max_time."""
+        filters = {}
+        for param, (lookup, convert) in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                filters[lookup] = convert(value)
+            except (ValueError, InvalidOperation):
+                raise ValidationError({param: 'A number.'})
+            if convert is Decimal and not filters[lookup].is_finite():
+                raise ValidationError({param: 'A number.'})
+        return filters
+
+    def _ordering(self):
+        """`?ordering=` as `field, id` (same direction), the order of the field's index."""
+        value = self.request.query_params.get('ordering') or '-id'
+        descending = value.startswith('-')
+        field = value[1:] if descending else value
+        if field not in self.orderable_fields:
+            raise ValidationError({'ordering': f'One of {", ".join(self.orderable_fields)} (`-` for descending), one field only.'})
+        if field == 'id':
+            return [value]
+        return [value, '-id' if descending else 'id']
+
+    fast_list = True
+    # ^`list` is serialized by RecipeValuesSerializer (same output as RecipeSerializer, several times faster)
+
+    def list(self, request, *args, **kwargs):
+        """List recipes (fast path, see serializers.RecipeValuesSerializer)."""
+        try:
+            facet_names = facets.parse(request.query_params.get('facets', ''))
+        except ValueError as error:
+            raise ValidationError({'facets': str(error)})
+
+        if not self.fast_list:
+            response = super().list(request, *args, **kwargs)
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)  # None without `?page_size=`
+            if page is not None:
+                response = self.get_paginated_response(serializers.RecipeValuesSerializer(page).data)
+            else:
+                response = Response(serializers.RecipeValuesSerializer(queryset).data)
+
+        if facet_names:
+            data = response.data if isinstance(response.data, dict) else {'results': response.data}  # Paginated: a dict already
+            data['facets'] = facets.facet_counts(
+                request.user,
+                self.filter_queryset(self.get_queryset()),  # Whole filtered list, not just the page
+                self._filter_signature(),
+                facet_names,
+            )
+            response.data = data
+        return response
+
+    not_filter_params = ('facets', 'format', 'cursor', 'ordering', 'page_size')
+
+    facet_cached_filters = ('tags', 'ingredients')
+    # ^Facet counts are cached per version of the similar recipes index (core/facets.py),
+    # which only changes on writes to tags / ingredients & created / deleted recipes.
+    # Only filters whose matches change with those writes can reuse counts: any other filter
+    # (price, time...) is counted on every request, a new filter too until it's listed here.
+
+    def _filter_signature(self):
+        """The filters of the request, as a hashable key (facet counts are cached per filters), None: not cacheable."""
+        filters = tuple(sorted(
+            (name, value) for name, value in self.request.query_params.items()
+            if name not in self.not_filter_params
+        ))
+        if any(name not in self.facet_cached_filters for name, _ in filters):
+            return None
+        return filters
+
+
     def get_serializer_class(self):
         """Return the serializer class for request."""
 
@@ -136,7 +349,98 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         # This ensure that new recipes created have the User ID Assigned.
 
+    def perform_destroy(self, instance):
+        """Delete a recipe (its user's similar recipes index gets rebuilt in the background)."""
+        instance.delete()
+        similarity.mark_stale(instance.user_id)
+
     
+    export_batch_size = 500  # Recipes per streamed chunk
+
+    def _export_lines(self, queryset):
+        """Yield the recipes as NDJSON, one chunk per batch (never all in memory)."""
+        ids = list(queryset.prefetch_related(None).values_list('id', flat=True))  # 1 small query, same filters & order as `list`
+        renderer = FastJSONRenderer()
+
+        for start in range(0, len(ids), self.export_batch_size):
+            batch = Recipe.objects.using(queryset.db).filter(id__in=ids[start:start + self.export_batch_size]).order_by(*queryset.query.order_by)
+            yield b''.join(
+                renderer.render(recipe) + b'\n'
+                for recipe in serializers.RecipeValuesSerializer(batch).data
+            )
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all (filtered) recipes as NDJSON, one recipe per line."""
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            self._export_lines(queryset.using(queryset.db)),
+            # ^Database chosen now: the lines are produced after the request's shard / replica is reset
+            content_type='application/x-ndjson',
+        )
+        response['X-Accel-Buffering'] = 'no'  # nginx passes every chunk on right away (no buffering)
+        return response
+
+    def _similar_params(self):
+        """(k, metric) of the `similar` query string."""
+        params = self.request.query_params
+        metric = params.get('metric', 'jaccard')
+        if metric not in similarity.METRICS:
+            raise ValidationError({'metric': f'One of: {", ".join(similarity.METRICS)}.'})
+        try:
+            k = int(params.get('k', settings.SIMILARITY_TOP_K))
+        except ValueError:
+            raise ValidationError({'k': 'A whole number.'})
+        if not 1 <= k <= settings.SIMILARITY_MAX_K:
+            raise ValidationError({'k': f'Between 1 and {settings.SIMILARITY_MAX_K}.'})
+        return k, metric
+
+    @action(methods=['GET'], detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        """Recipes with the most tags & ingredients in common with this one, best first."""
+        k, metric = self._similar_params()
+        recipe = self.get_object()  # 404 for recipes of other users
+        scores = dict(similarity.similar_recipes(request.user, recipe, k, metric))
+        # ^{recipe ID: score} from the user's in-memory index (core/similarity.py), the sharing recipes' links while it's stale
+
+        recipes = serializers.RecipeValuesSerializer(self.queryset.filter(user=request.user, id__in=list(scores))).data
+        for item in recipes:
+            item['similarity'] = scores[item['id']]
+        ranks = {recipe_id: rank for rank, recipe_id in enumerate(scores)}
+        recipes.sort(key=lambda item: ranks[item['id']])  # Order of the scores (best first)
+        return Response(recipes)
+
+    def _cookable_params(self):
+        """(pantry ingredient IDs, missing) of the `cookable` query string."""
+        params = self.request.query_params
+        if 'pantry' not in params:
+            raise ValidationError({'pantry': 'Required (may be empty).'})
+        try:
+            ingredient_ids = set(self._params_to_ints(params['pantry'])) if params['pantry'] else set()
+        except ValueError:
+            raise ValidationError({'pantry': 'Comma separated ingredient IDs.'})
+        try:
+            missing = int(params.get('missing', 0))
+        except ValueError:
+            raise ValidationError({'missing': 'A whole number.'})
+        if not 0 <= missing <= settings.PANTRY_MAX_MISSING:
+            raise ValidationError({'missing': f'Between 0 and {settings.PANTRY_MAX_MISSING}.'})
+        return ingredient_ids, missing
+
+    @action(methods=['GET'], detail=False, url_path='cookable')
+    def cookable(self, request):
+        """Recipes whose ingredients are all (or all but `missing`) in the pantry, fewest missing first."""
+        ingredient_ids, missing = self._cookable_params()
+        matches = pantry.cookable_recipes(request.user, ingredient_ids, missing)[:settings.PANTRY_MAX_RESULTS]
+        # ^[(recipe ID, ingredients missing)] from the user's in-memory bitsets (core/pantry.py), one grouped query while they're stale
+        ranks = {recipe_id: rank for rank, (recipe_id, _) in enumerate(matches)}
+
+        recipes = serializers.RecipeValuesSerializer(self.queryset.filter(user=request.user, id__in=list(ranks))).data
+        for item in recipes:
+            item['missing'] = [ingredient['id'] for ingredient in item['ingredients'] if ingredient['id'] not in ingredient_ids]
+        recipes.sort(key=lambda item: ranks[item['id']])
+        return Response(recipes)
+
     @action(methods=['POST'], detail=True, url_path='upload-image') # Added custom @action decorator 
     # It specify different HTTP methods supported by custom action.
     # In this case, we are only supporting POST requests.
@@ -181,7 +485,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
 )
 # NOTE: Mixins to be defined BEFORE GenericViewSet
 # This class is used to add additional functionality to tags/ingrediets viewset.
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(UserShardMixin,
+                            ReplicaReadMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
@@ -223,6 +529,11 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
         # ^This ensures that the tags are sorted in alphabetical order.
         # ^This is important because we want to display the tags in alphabetical order.
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        similarity.mark_stale(instance.user_id)
+        # ^Its links are gone, the user's similar recipes index gets rebuilt in the background (core/similarity.py)
+
 
 # Below classes Inherit from BaseRecipeAttrViewSet.
 # All functions are defined in BaseRecipeAttrViewSet.
@@ -243,5 +554,31 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     queryset = Ingredient.objects.all()
     # ^Specify which model to use
 
-   
 
+class ShoppingListView(UserShardMixin, APIView):
+    """Ingredients needed for a set of recipes (i.e. a week's menu)."""
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        request=serializers.ShoppingListRequestSerializer,
+        responses=serializers.ShoppingListItemSerializer(many=True),
+    )
+    def post(self, request):
+        """Distinct ingredients of the recipes, each with the recipes it appears in."""
+        serializer = serializers.ShoppingListRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = (
+            Recipe.ingredients.through.objects
+            .filter(recipe__user=request.user, recipe_id__in=set(serializer.validated_data['recipes']))
+            .values('ingredient_id', 'ingredient__name')  # GROUP BY ingredient
+            .annotate(recipes=IdList('recipe_id'))
+            .order_by('ingredient__name', 'ingredient_id')
+        )
+        # ^ONE grouped query over the link table (no query per recipe, no merging in the client)
+        return Response([
+            {'id': item['ingredient_id'], 'name': item['ingredient__name'], 'recipes': item['recipes']}
+            for item in items
+        ])
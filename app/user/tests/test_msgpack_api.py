@@ -0,0 +1,52 @@
+"""
+Tests for MessagePack requests & responses of the user API
+"""
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+MSGPACK = 'application/msgpack'
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class MessagePackUserApiTests(TestCase):
+    """Test negotiating MessagePack with the user API"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def post(self, url, payload, method='post'):
+        res = getattr(self.client, method)(
+            url,
+            msgpack.packb(payload),
+            content_type=MSGPACK,
+            HTTP_ACCEPT=MSGPACK,
+        )
+        self.assertEqual(res['Content-Type'], MSGPACK)
+        return res, msgpack.unpackb(res.content)
+
+    def test_create_user_token_and_me(self):
+        """Test signing up, logging in & updating the profile"""
+        payload = {'email': 'test@example.com', 'password': 'testpass123', 'name': 'Test'}  # noqa: E501
+
+        res, data = self.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(data, {'email': 'test@example.com', 'name': 'Test'})
+
+        res, data = self.post(TOKEN_URL, {'email': payload['email'], 'password': payload['password']})  # noqa: E501
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', data)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {data['token']}")
+        res, data = self.post(ME_URL, {'name': 'New name'}, method='patch')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['name'], 'New name')
+        self.assertEqual(get_user_model().objects.get().name, 'New name')
@@ -0,0 +1,84 @@
+"""
+Query budgets for the User API
+"""
+
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.tests.query_budget import QueryBudgetMixin
+
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+_sequence = count()
+
+
+def grow():
+    """Add a few more users to the system."""
+    for _ in range(5):
+        get_user_model().objects.create_user(
+            email=f'other{next(_sequence)}@example.com',
+            password='testpass123',
+        )
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the queries made by the user endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.client = APIClient()
+
+    def test_create_user(self):
+        """Test creating a user"""
+        emails = (f'new{number}@example.com' for number in count())
+
+        res = self.assertQueryBudget(
+            2,
+            lambda: self.client.post(CREATE_USER_URL, {
+                'email': next(emails),
+                'password': 'testpass123',
+                'name': 'New',
+            }),
+            grow=grow,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_token(self):
+        """Test logging in"""
+        payload = {'email': 'user@example.com', 'password': 'testpass123'}
+        Token.objects.create(user=self.user)  # Every call gets (not creates) the token # noqa: E501
+
+        res = self.assertQueryBudget(
+            2,
+            lambda: self.client.post(TOKEN_URL, payload),
+            grow=grow,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_and_update_me(self):
+        """Test retrieving & updating the authenticated user"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertQueryBudget(1, lambda: self.client.get(ME_URL), grow=grow)
+        self.assertQueryBudget(
+            2,
+            lambda: self.client.patch(ME_URL, {'name': 'Updated'}),
+            grow=grow,
+        )
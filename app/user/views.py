@@ -30,6 +30,8 @@ class CreateTokenView(ObtainAuthToken):  # ObtainAuthToken view uses the usernam
     serializer_class = AuthTokenSerializer  # Customizing Serializer to use custom Serializer that we created
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES  # (Optional)
     # ^To Show Browesable API
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    # ^ObtainAuthToken only accepts form & JSON by default (this adds MessagePack)
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
@@ -1,13 +1,80 @@
+# Pre-generated OpenAPI schema (`manage.py build_schema`), `?format=json` for JSON
+map $arg_format $schema_file {
+    default /schema.yml;
+    json    /schema.json;
+}
+
 server {
     listen ${LISTEN_PORT};
 
+    gzip off;
+    # ^API responses are compressed by Django (core/compression.py: Accept-Encoding, size threshold,
+    #  content types, streaming). nginx must NOT compress them again
+
     location /static {
-        alias /vol/static;
+        alias       /vol/static;
+        gzip_static on;  # Send the `.gz` sibling written at build time (if any & the client accepts gzip)
+        gzip_vary   on;
+    }
+
+    location ~ "^/static/static/(?<asset>.+\.[0-9a-f]{12}\.[A-Za-z0-9]+)$" {
+        # Hashed static files (`collectstatic`, core/storage.py): a changed file gets a new name
+        alias       /vol/static/static/$asset;
+        gzip_static on;
+        gzip_vary   on;
+        # ^.br siblings are written too, sending them needs the ngx_brotli module (`brotli_static on`)
+        add_header  Cache-Control "public, max-age=31536000, immutable";
+        # ^Browsers & CDNs keep them for a year without ever revalidating
+    }
+
+    location /static/media {
+        return 404;
+        # ^Recipe images are private: only reachable through Django (`/media/`, checks the owner)
+    }
+
+    location /static/profiles {
+        return 404;
+        # ^Request profiles live in their own volume (/vol/profiles, app only), this guards old deployments
+        #  that stored them in the static volume: only reachable through Django (staff only)
+    }
+
+    location /protected-media/ {
+        internal;  # Only reachable through `X-Accel-Redirect` from Django (core/media.py)
+        alias /vol/static/media/;
+        # ^nginx sends the file (Range, If-Range, conditional requests), not a uWSGI worker
+    }
+
+    location = /api/schema/ {
+        root        /vol/static/static/openapi;
+        try_files   $schema_file @app;
+        # ^Served from disk (with ETag), falls back to Django if the schema hasn't been built
+        gzip_static on;  # schema.yml.gz / schema.json.gz written by `build_schema`
+        gzip_vary   on;
+        types {
+            application/vnd.oai.openapi         yml;
+            application/vnd.oai.openapi+json    json;
+        }
+        add_header  Cache-Control "no-cache";
+    }
+
+    location = /metrics {
+        # Prometheus scrape endpoint >> only reachable from inside the private network
+        allow                   127.0.0.1;
+        allow                   10.0.0.0/8;
+        allow                   172.16.0.0/12;
+        allow                   192.168.0.0/16;
+        deny                    all;
+        include                 /etc/nginx/app.conf;
     }
 
     location / {
-        uwsgi_pass              ${APP_HOST}:${APP_PORT};
-        include                 /etc/nginx/uwsgi_params;
+        include                 /etc/nginx/app.conf;  # uWSGI or ASGI (APP_SERVER, see run.sh)
         client_max_body_size    10M;
+        # ^The whole body is buffered by NGiNX (default) before it is passed on: slow uploads cost the app nothing
+        #  here, ASGI mode protects the app from slow clients when nothing buffers in front of it
+    }
+
+    location @app {
+        include                 /etc/nginx/app.conf;
     }
 }
\ No newline at end of file
@@ -2,7 +2,11 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+envsubst '${LISTEN_PORT} ${APP_HOST} ${APP_PORT}' < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+# ^Only substitute our own variables (NGiNX variables like $arg_format must stay as they are)
+
+envsubst '${APP_HOST} ${APP_PORT}' < "/etc/nginx/app_${APP_SERVER:-uwsgi}.conf" > /etc/nginx/app.conf
+# ^How requests are passed to the app, must match the app's APP_SERVER (uWSGI protocol or HTTP to uvicorn)
 
 nginx -g 'daemon off;'
 
@@ -13,16 +13,44 @@ python manage.py collectstatic --noinput
 # Static files are put in configured static file directory.
 # All static files of all different apps in our project are copied in same directory
 # This directory will be made accessible by NGiNX Reverese Proxy.
+# Files are also copied under a hashed name (i.e. base.5af66c1b1797.css) & compressed (.gz / .br), see core/storage.py
+# NGiNX lets browsers cache hashed files forever and sends the compressed copies as they are.
+
+python manage.py build_schema
+# ^ Pre-generate the OpenAPI schema into the static directory (Skipped if the code hasn't changed).
+# `api/schema/` then serves it from disk (via NGiNX) instead of introspecting every view on each request.
 
 python manage.py migrate
 # Run migrations automatically when App starts. 
 # So that database migrated to correct state. (If there are changes in App)
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
-#^ Running uWSGI server.
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/vol/run/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+# ^ Metrics of all uWSGI workers are shared through files in this directory (see core/metrics.py).
+# Emptied on every start, values from a previous run must not be added to the new ones.
+# /vol/run is created for django-user in the Dockerfile (the image has no /tmp).
+
+if [ "${APP_SERVER:-uwsgi}" = "asgi" ]; then
+    python manage.py similarity_index --watch &
+    #^ Rebuilds similar recipes indexes in the background (core/similarity.py). uWSGI starts it itself (attach-daemon).
+    exec uvicorn app.asgi:application --host 0.0.0.0 --port 9000 --workers "$(python manage.py uwsgi_config --workers)" \
+        --no-access-log --proxy-headers --forwarded-allow-ips '*'
+    #^ ASGI mode (APP_SERVER=asgi): uvicorn worker processes, each with an event loop.
+    # As many workers as uWSGI would get: sized from the cgroup CPU quota / memory limit, or APP_WORKERS (see core/uwsgi.py).
+    # Request bodies (i.e. slow image uploads) are read by the event loop, views run in a thread per request (see core/asgi.py).
+    # Speaks HTTP, NGiNX must be started with the same APP_SERVER (proxy_pass instead of uwsgi_pass).
+    # --proxy-headers > client address & scheme come from NGiNX's X-Forwarded-* headers (only NGiNX can reach port 9000).
+fi
+
+python manage.py uwsgi_config --output /vol/run/uwsgi.ini
+# ^ Size uWSGI for this container: workers & threads from the cgroup CPU quota / memory limit, cheaper (idle workers
+# are stopped), reload-on-rss (leaking workers are recycled), harakiri, listen queue & stats socket (see core/uwsgi.py).
+# Every value can be overridden with APP_* variables (i.e. APP_WORKERS=8).
+
+uwsgi --ini /vol/run/uwsgi.ini
+#^ Running uWSGI server. (Options from the generated file)
 # Creating a TCP socket on port 9000. (This is the port on which NGiNX will listen.)
-# 4 WSGI workers are created.
-# --master > this will make uWSGI / running application as master thread.
-# --enable-threads > this will enable threads (multi-threading) in uWSGI.
-# --module > this will tell uWSGI which WSGI module to run. (i.e. app/wsgi.py)
-# app.wsgi.py > this is the entry point to Application. (app.wsgi > auto generated by Django)
\ No newline at end of file
+# master > this will make uWSGI / running application as master thread.
+# enable-threads > this will enable threads (multi-threading) in uWSGI.
+# module > this will tell uWSGI which WSGI module to run. (i.e. app/wsgi.py)
+# app.wsgi.py > this is the entry point to Application. (app.wsgi > auto generated by Django)